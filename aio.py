@@ -0,0 +1,198 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from datadough.engine import DataBase
+
+
+class AsyncDataBase(object):
+    """asyncio facade of DataBase.
+
+    Reads run in a thread pool, at most `max_concurrency` at a time; writes
+    are queued to a single writer task and run one after another, in the
+    order they were submitted. Every call takes a `timeout`, after which
+    it is cancelled: a call still waiting for its turn never starts, while
+    one already running completes in its thread but its result is dropped.
+    The store itself serializes access by threads (see HDFBackend), so the
+    gain is not parallel I/O but an event loop never blocked on it.
+
+    Parameters
+    ----------
+    database : DataBase or None
+        the synchronous database to delegate to; None for a new one
+    max_concurrency : int
+        largest number of reads running at the same time
+    timeout : float or None
+        default timeout of every call, in seconds; None for no timeout
+
+    """
+    def __init__(self, database=None, max_concurrency=4, timeout=None):
+        """
+        """
+        self.database = DataBase() if database is None else database
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="datadough-read")
+        self._write_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="datadough-write")
+
+        # created in the running loop, on first use
+        self._semaphore = None
+        self._queue = None
+        self._writer = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _timeout(self, timeout):
+        return self.timeout if timeout is None else timeout
+
+    async def _read(self, func, *args, **kwargs):
+        """Run `func` in the read pool once a slot is free."""
+        loop = asyncio.get_running_loop()
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        await self._semaphore.acquire()
+
+        future = self._read_executor.submit(
+            functools.partial(func, *args, **kwargs))
+
+        # the slot is freed when the thread is done, not when the caller
+        #   gives up waiting for it
+        future.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(self._semaphore.release))
+
+        return await asyncio.wrap_future(future)
+
+    async def get_data(self, header, date_from, date_to, freq, timeout=None,
+                       **kwargs):
+        """Asynchronous DataBase.get_data().
+
+        Parameters
+        ----------
+        header, date_from, date_to, freq, kwargs
+            as in DataBase.get_data()
+        timeout : float or None
+            seconds; None for the default of this instance
+
+        Returns
+        -------
+        res : pandas.DataFrame
+
+        Raises
+        ------
+        asyncio.TimeoutError
+
+        """
+        res = await asyncio.wait_for(
+            self._read(self.database.get_data, header, date_from, date_to,
+                       freq, **kwargs),
+            self._timeout(timeout))
+
+        return res
+
+    async def iter_data(self, header, date_from, date_to, freq,
+                        batch_size=100, timeout=None, as_of=None):
+        """Asynchronous DataBase.iter_data(), one batch read at a time.
+
+        `timeout` applies to every batch.
+        """
+        batches = self.database.iter_data(header, date_from, date_to, freq,
+                                          batch_size=batch_size, as_of=as_of)
+        done = object()
+
+        while True:
+            res = await asyncio.wait_for(
+                self._read(next, batches, done), self._timeout(timeout))
+
+            if res is done:
+                return
+
+            yield res
+
+    async def _write_loop(self):
+        """Run the queued writes, one at a time."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            func, args, kwargs, result = await self._queue.get()
+
+            try:
+                # given up on while queued
+                if result.cancelled():
+                    continue
+
+                try:
+                    res = await loop.run_in_executor(
+                        self._write_executor,
+                        functools.partial(func, *args, **kwargs))
+                except Exception as e:
+                    if not result.done():
+                        result.set_exception(e)
+                else:
+                    if not result.done():
+                        result.set_result(res)
+
+            finally:
+                self._queue.task_done()
+
+    async def _write(self, func, *args, **kwargs):
+        """Queue `func` to the writer task and wait for its result."""
+        if self._writer is None:
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.get_running_loop().create_task(
+                self._write_loop())
+
+        result = asyncio.get_running_loop().create_future()
+        await self._queue.put((func, args, kwargs, result))
+
+        return await result
+
+    async def save_data(self, data_to_save, timeout=None, **kwargs):
+        """Asynchronous DataBase.save_data(), serialized with other writes.
+
+        Parameters
+        ----------
+        data_to_save, kwargs
+            as in DataBase.save_data()
+        timeout : float or None
+            seconds; None for the default of this instance
+
+        Returns
+        -------
+        res : dict
+
+        Raises
+        ------
+        asyncio.TimeoutError
+
+        """
+        res = await asyncio.wait_for(
+            self._write(self.database.save_data, data_to_save, **kwargs),
+            self._timeout(timeout))
+
+        return res
+
+    async def close(self):
+        """Finish the queued writes and stop the writer and the pools."""
+        if self._writer is not None:
+            await self._queue.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._read_executor.shutdown)
+        await loop.run_in_executor(None, self._write_executor.shutdown)
+
+        self.database.close()
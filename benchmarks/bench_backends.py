@@ -0,0 +1,73 @@
+"""The hdf and the parquet backend of DataHangar on the same workload.
+
+Run as `python -m datadough.benchmarks.bench_backends`.
+"""
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from datadough import engine
+from datadough.hangar import DataHangar
+
+
+def make_data(n_headers=500, n_dates=5000):
+    """Long-format synthetic observations."""
+    dates = pd.date_range("1990-01-01", periods=n_dates, freq='D')
+
+    res = pd.DataFrame({
+        "header_id": np.repeat(np.arange(n_headers), n_dates),
+        "obs_date": np.tile(dates.values, n_headers),
+        "obs_value": np.random.normal(size=n_headers * n_dates)
+    })
+
+    return res
+
+
+def run(n_headers=500, n_dates=5000):
+    """Time a bulk load, single-series and cross-sectional reads.
+
+    Returns
+    -------
+    res : pandas.DataFrame
+        seconds, indexed by operation, columned by backend
+
+    """
+    data = make_data(n_headers, n_dates)
+    tmp_dir = tempfile.mkdtemp()
+
+    res = dict()
+    default_hangar = engine.hangar
+
+    for backend, path in (("hdf", "bench.h5"), ("parquet", "bench_pq")):
+        engine.hangar = DataHangar(os.path.join(tmp_dir, path),
+                                   keep_open=True, backend=backend)
+        ts = engine.Timeseries()
+
+        def one_series():
+            for p in range(0, n_headers, n_headers // 10):
+                ts.get_data([p], "2000-01-01", "2004-12-31")
+
+        def cross_section():
+            ts.get_data(np.arange(0, n_headers, 5), "2000-01-01",
+                        "2000-12-31")
+
+        res[backend] = {
+            "save": timeit.timeit(lambda: ts.save(data), number=1),
+            "one series (x10)": min(
+                timeit.repeat(one_series, number=1, repeat=3)),
+            "cross section": min(
+                timeit.repeat(cross_section, number=1, repeat=3)),
+        }
+
+        engine.hangar.close()
+
+    engine.hangar = default_hangar
+
+    return pd.DataFrame(res)
+
+
+if __name__ == "__main__":
+    print(run().round(3))
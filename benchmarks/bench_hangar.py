@@ -0,0 +1,69 @@
+"""Per-call HDFStore opening vs. a pooled handle in DataHangar.
+
+Run as `python -m datadough.benchmarks.bench_hangar`.
+"""
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from datadough.hangar import DataHangar
+
+
+def make_store(path, n_rows=1000):
+    """Write a small dimension-like table to `path`."""
+    df = pd.DataFrame({
+        "short_name": ["name_{}".format(p) for p in range(n_rows)],
+        "nature": np.random.choice(["float", "int"], size=n_rows)
+    })
+
+    with pd.HDFStore(path, mode='w') as h:
+        h.put("data_type", df, format='t', data_columns=True)
+
+
+def run(n_calls=200):
+    """Time `n_calls` small selects in each of the hangar modes.
+
+    Returns
+    -------
+    res : pandas.Series
+        seconds per call, indexed by mode
+
+    """
+    path = os.path.join(tempfile.mkdtemp(), "bench_hangar.h5")
+    make_store(path)
+
+    where = "short_name == 'name_10'"
+
+    def per_call():
+        hangar = DataHangar(path)
+        for _ in range(n_calls):
+            hangar.select("data_type", where=where)
+
+    def keep_open():
+        hangar = DataHangar(path, keep_open=True)
+        for _ in range(n_calls):
+            hangar.select("data_type", where=where)
+        hangar.close()
+
+    def session():
+        hangar = DataHangar(path)
+        with hangar.session():
+            for _ in range(n_calls):
+                hangar.select("data_type", where=where)
+
+    res = pd.Series({
+        k: min(timeit.repeat(f, number=1, repeat=3)) / n_calls
+        for k, f in (("per_call", per_call), ("keep_open", keep_open),
+                     ("session", session))
+    })
+
+    os.remove(path)
+
+    return res
+
+
+if __name__ == "__main__":
+    print((run() * 1e3).round(3).rename("ms per select"))
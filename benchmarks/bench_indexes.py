@@ -0,0 +1,77 @@
+"""Query latency on a synthetic timeseries table, by kind of index.
+
+Run as `python -m datadough.benchmarks.bench_indexes`.
+"""
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from datadough.hangar import DataHangar
+
+
+def make_store(path, n_headers=1000, n_dates=2000, index=True):
+    """Write a synthetic timeseries table to `path`.
+
+    Headers are interleaved (as after many small appends) so that no
+    column is physically sorted.
+    """
+    dates = pd.date_range("1990-01-01", periods=n_dates, freq='D')
+
+    df = pd.DataFrame({
+        "header_id": np.tile(np.arange(n_headers, dtype=np.int32), n_dates),
+        "obs_date": np.repeat(dates.values, n_headers),
+        "obs_value": np.random.normal(size=n_headers * n_dates)
+    })
+
+    with pd.HDFStore(path, mode='w') as h:
+        h.append("timeseries", df, format='t', data_columns=True,
+                 index=index)
+
+
+def run(n_queries=20):
+    """Time selects of one header over one year with different indexes.
+
+    Returns
+    -------
+    res : pandas.Series
+        seconds per query, indexed by kind of index
+
+    """
+    path = os.path.join(tempfile.mkdtemp(), "bench_indexes.h5")
+
+    where = "(header_id == {}) & (obs_date >= Timestamp('1995-01-01')) & " \
+            "(obs_date <= Timestamp('1995-12-31'))"
+
+    def query(hangar):
+        def fun():
+            for p in range(n_queries):
+                hangar.select("timeseries", where=where.format(p * 37))
+        return fun
+
+    res = dict()
+
+    make_store(path, index=False)
+    hangar = DataHangar(path, keep_open=True)
+    res["none"] = min(timeit.repeat(query(hangar), number=1, repeat=3))
+    hangar.close()
+
+    make_store(path, index=True)
+    hangar = DataHangar(path, keep_open=True)
+    res["pandas default"] = min(timeit.repeat(query(hangar), number=1,
+                                              repeat=3))
+
+    hangar.declare_index_columns("timeseries", ("header_id", "obs_date"))
+    hangar.rebuild_indexes(force=True)
+    res["csi"] = min(timeit.repeat(query(hangar), number=1, repeat=3))
+    hangar.close()
+
+    os.remove(path)
+
+    return pd.Series(res) / n_queries
+
+
+if __name__ == "__main__":
+    print((run() * 1e3).round(2).rename("ms per query"))
@@ -0,0 +1,61 @@
+"""Serial and parallel reads of a large cross section.
+
+Run as `python -m datadough.benchmarks.bench_parallel`.
+"""
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from datadough import engine
+from datadough.hangar import DataHangar
+from datadough.benchmarks.bench_backends import make_data
+
+
+def run(n_headers=1000, n_dates=5000, n_workers=(2, 4), batch_size=100):
+    """Time `get_data()` of all headers, serially and in worker processes.
+
+    Returns
+    -------
+    res : pandas.Series
+        seconds, indexed by the number of workers (0 for serial)
+
+    """
+    tmp_dir = tempfile.mkdtemp()
+
+    default_hangar = engine.hangar
+    engine.hangar = DataHangar(os.path.join(tmp_dir, "bench.h5"),
+                               keep_open=True)
+
+    engine.hangar.append("data_version", pd.DataFrame({
+        "concept_header_id": [0],
+        "date_created": [pd.Timestamp("2018-01-01")],
+        "description": ["default"]}), data_columns=True)
+
+    db = engine.DataBase()
+    db._timeseries.save(make_data(n_headers, n_dates))
+
+    header = pd.Series(np.arange(n_headers))
+
+    def get(n):
+        db.get_data(header, "1995-01-01", "2003-12-31", 'D', n_workers=n,
+                    batch_size=batch_size)
+
+    res = {0: min(timeit.repeat(lambda: get(None), number=1, repeat=3))}
+
+    for n in n_workers:
+        # start the workers before timing
+        get(n)
+        res[n] = min(timeit.repeat(lambda: get(n), number=1, repeat=3))
+
+    db.close()
+    engine.hangar.close()
+    engine.hangar = default_hangar
+
+    return pd.Series(res, name="seconds").rename_axis("n_workers")
+
+
+if __name__ == "__main__":
+    print(run().round(3))
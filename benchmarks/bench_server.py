@@ -0,0 +1,107 @@
+"""Queries of a short-lived analyst process: on its own vs via a server.
+
+Run as `python -m datadough.benchmarks.bench_server`. A fresh interpreter
+either opens the store and queries it itself, or asks a QueryServer that
+has been serving the store for a while; both times include the imports
+the process needs.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+import pandas as pd
+
+from datadough.hangar import DataHangar
+from datadough.synthetic import generate
+
+# run in a fresh interpreter; prints the seconds taken by every step
+SCRIPT = """
+import json, time
+t_0 = time.perf_counter()
+
+import numpy as np, pandas as pd
+{setup}
+t_setup = time.perf_counter()
+
+header = pd.Series(np.arange({width}))
+header.index = header.index.astype(str)
+db.get_data(header, None, None, 'B')
+t_query = time.perf_counter()
+
+db.get_data(header, None, None, 'B')
+t_again = time.perf_counter()
+
+print(json.dumps({{"setup": t_setup - t_0, "first_query": t_query - t_setup,
+                  "second_query": t_again - t_query}}))
+"""
+
+OWN = """
+from datadough import engine
+from datadough.hangar import DataHangar
+db = engine.DataBase(hangar=DataHangar({path!r}, keep_open=True))
+"""
+
+CLIENT = """
+from datadough.server import Client
+db = Client({address!r})
+"""
+
+
+def run(repeat=5, width=100, n_objects=100, n_types=5, n_dates=2500):
+    """Time a query of `width` series in `repeat` fresh interpreters.
+
+    Returns
+    -------
+    res : pandas.DataFrame
+        best seconds, indexed by step, columned by 'own' and 'server'
+
+    """
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, "server.h5")
+    address = os.path.join(tmp_dir, "server.sock")
+
+    hangar = DataHangar(path)
+    generate(hangar, n_objects=n_objects, n_types=n_types, n_dates=n_dates)
+    hangar.close()
+
+    # the package is imported from the directory containing it
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=root)
+
+    server = subprocess.Popen([sys.executable, "-m", "datadough.server",
+                               path, "--socket", address], env=env)
+
+    try:
+        while not os.path.exists(address):
+            time.sleep(0.05)
+
+        res = dict()
+        for name, setup in (("own", OWN.format(path=path)),
+                            ("server", CLIENT.format(address=address))):
+            script = SCRIPT.format(setup=setup, width=width)
+
+            timings = []
+            for _ in range(repeat):
+                out = subprocess.run([sys.executable, "-c", script], env=env,
+                                     check=True, capture_output=True,
+                                     text=True).stdout
+                timings.append(json.loads(out.strip().splitlines()[-1]))
+
+            res[name] = pd.DataFrame(timings).min()
+
+    finally:
+        server.terminate()
+        server.wait()
+
+    res = pd.DataFrame(res).rename_axis("step")
+    res.loc["total"] = res.sum()
+
+    return res
+
+
+if __name__ == "__main__":
+    print(run().round(4))
@@ -0,0 +1,71 @@
+"""Startup costs: importing the engine, creating a DataBase, first query.
+
+Run as `python -m datadough.benchmarks.bench_startup`. Every step is timed
+in a fresh interpreter, as a short command line job would pay for it.
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+import pandas as pd
+
+from datadough.hangar import DataHangar
+from datadough.synthetic import generate
+
+# run in a fresh interpreter; prints the seconds taken by every step
+SCRIPT = """
+import json, time
+t_0 = time.perf_counter()
+
+from datadough import engine
+from datadough.hangar import DataHangar
+t_import = time.perf_counter()
+
+engine.hangar = DataHangar({path!r})
+db = engine.DataBase()
+t_init = time.perf_counter()
+
+db.get_data(__import__("pandas").Series({{"a": 0}}), None, None, 'B')
+t_query = time.perf_counter()
+
+print(json.dumps({{"import": t_import - t_0, "init": t_init - t_import,
+                  "first_query": t_query - t_init}}))
+"""
+
+
+def run(repeat=5):
+    """Time the startup steps in `repeat` fresh interpreters.
+
+    Returns
+    -------
+    res : pandas.Series
+        best seconds, indexed by step
+
+    """
+    path = os.path.join(tempfile.mkdtemp(), "startup.h5")
+
+    hangar = DataHangar(path)
+    generate(hangar, n_objects=10, n_types=2, n_dates=100)
+    hangar.close()
+
+    # the package is imported from the directory containing it
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=root)
+
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", SCRIPT.format(path=path)],
+                             env=env, check=True, capture_output=True,
+                             text=True).stdout
+        timings.append(json.loads(out.strip().splitlines()[-1]))
+
+    res = pd.DataFrame(timings).min().rename("seconds").rename_axis("step")
+
+    return res
+
+
+if __name__ == "__main__":
+    print(run().round(4))
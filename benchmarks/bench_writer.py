@@ -0,0 +1,91 @@
+"""Concurrent loaders: saves serialized by a lock vs through the write queue.
+
+Run as `python -m datadough.benchmarks.bench_writer`. Every loader process
+saves many small frames; they either write to the store themselves, one
+at a time under a file lock, or submit the frames to a WriteQueue drained
+by one writer process.
+"""
+import os
+import time
+import tempfile
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+from datadough.hangar import DataHangar
+from datadough.synthetic import generate
+
+
+def _load(mode, path, spool_dir, loader, n_saves, n_dates):
+    """Save `n_saves` frames of one loader, in the way `mode` says."""
+    from datadough import engine
+    from datadough.writer import WriteQueue, _locked
+
+    dates = pd.date_range("1990-01-01", periods=n_dates, freq='B')
+    frames = [pd.DataFrame({"header_id": 10**6 + loader * n_saves + p,
+                            "obs_date": dates,
+                            "obs_value": np.random.normal(size=n_dates)})
+              for p in range(n_saves)]
+
+    if mode == "lock":
+        timeseries = engine.Timeseries(hangar=DataHangar(path))
+        for df in frames:
+            with _locked(os.path.join(spool_dir, "store.lock")):
+                timeseries.save(df)
+    else:
+        queue = WriteQueue(spool_dir)
+        tickets = [queue.save(df) for df in frames]
+        for p in tickets:
+            queue.result(p)
+
+
+def run(n_loaders=4, n_saves=50, n_dates=250):
+    """Time `n_loaders` concurrent loaders in both ways.
+
+    Returns
+    -------
+    res : pandas.Series
+        seconds until everything was saved, indexed by mode
+
+    """
+    from datadough.writer import WriteQueue, start_writer
+
+    ctx = multiprocessing.get_context("spawn")
+    res = dict()
+
+    for mode in ("lock", "queue"):
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, "writer.h5")
+        spool_dir = os.path.join(tmp_dir, "spool")
+        os.makedirs(spool_dir)
+
+        hangar = DataHangar(path)
+        generate(hangar, n_objects=10, n_types=2, n_dates=n_dates)
+        n_rows = hangar.nrows("timeseries")
+        hangar.close()
+
+        if mode == "queue":
+            writer = start_writer(path, spool_dir, poll=0.01)
+
+        t_start = time.perf_counter()
+        with ctx.Pool(n_loaders) as pool:
+            pool.starmap(_load, [(mode, path, spool_dir, p, n_saves, n_dates)
+                                 for p in range(n_loaders)])
+        res[mode] = time.perf_counter() - t_start
+
+        if mode == "queue":
+            WriteQueue(spool_dir).stop()
+            writer.join()
+
+        # nothing lost
+        n_new = DataHangar(path).nrows("timeseries") - n_rows
+        assert n_new == n_loaders * n_saves * n_dates
+
+    res = pd.Series(res, name="seconds").rename_axis("mode")
+
+    return res
+
+
+if __name__ == "__main__":
+    print(run().round(3))
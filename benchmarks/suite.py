@@ -0,0 +1,325 @@
+"""Benchmark suite on a synthetic database, with machine-readable output.
+
+Run as `python -m datadough.benchmarks.suite [--out results.json] ...`;
+results are one JSON document, see `run()`.
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import tempfile
+
+import numpy as np
+import pandas as pd
+import tables
+
+from datadough import engine
+from datadough.hangar import DataHangar
+from datadough.query import TableQuery
+from datadough.synthetic import generate, using
+
+
+class Suite(object):
+    """Benchmarks of the main code paths against one store.
+
+    Parameters
+    ----------
+    hangar : DataHangar
+        populated by `datadough.synthetic.generate()`
+    params : dict
+        arguments `generate()` was called with
+    repeat : int
+        timings are the best of this many runs
+
+    """
+    def __init__(self, hangar, params, repeat=3):
+        """
+        """
+        self.hangar = hangar
+        self.params = params
+        self.repeat = repeat
+
+        self.results = []
+
+    def time(self, name, func, rows=None, repeat=None, **params):
+        """Time `func` and record the result under `name` and `params`."""
+        repeat = self.repeat if repeat is None else repeat
+        seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+
+        self.results.append({
+            "name": name,
+            "params": params,
+            "seconds": seconds,
+            "rows": rows,
+            "rows_per_sec": None if rows is None else rows / seconds
+        })
+
+        return seconds
+
+    def header_resolution(self):
+        n_objects, n_types = self.params["n_objects"], self.params["n_types"]
+        ch = engine.ConceptHeader()
+
+        for n in sorted({1, min(100, n_objects), n_objects}):
+            obj, typ = np.divmod(np.arange(n * n_types), n_types)
+            info = pd.MultiIndex.from_arrays(
+                [["synthetic object {:07d}".format(p) for p in obj],
+                 ["type_{:04d}".format(p) for p in typ],
+                 obj % self.params["n_providers"],
+                 obj % self.params["n_currencies"]],
+                names=ch._required_columns)
+
+            self.time("header_resolution", lambda: ch.get_id(info),
+                      rows=len(info), headers=len(info))
+
+    def version_resolution(self):
+        n_concepts = self.params["n_objects"] * self.params["n_types"]
+        version = engine.DataVersion()
+        ts_header = engine.TSHeader()
+
+        for n in sorted({1, min(100, n_concepts), n_concepts}):
+            ids = np.arange(n)
+            self.time("version_resolution",
+                      lambda: version.resolve(ids, "newest"), rows=n,
+                      headers=n, kind="bulk")
+
+        # one round trip per concept header, for comparison
+        def one_by_one(ids):
+            for p in ids:
+                ts_header.filter(TableQuery(
+                    "(concept_header_id == {}) & (data_version_id == {})"
+                    .format(p, version.default_version)))
+
+        n = min(100, n_concepts)
+        self.time("version_resolution", lambda: one_by_one(range(n)),
+                  rows=n, headers=n, kind="one_by_one")
+
+    def get_data(self):
+        db = engine.DataBase()
+        n_headers = self.params["n_objects"] * self.params["n_types"] * \
+            self.params["n_versions"]
+
+        dates = pd.date_range(self.params["start"],
+                              periods=self.params["n_dates"],
+                              freq=self.params["freq"])
+
+        for width in sorted({1, min(10, n_headers), min(100, n_headers),
+                             n_headers}):
+            header = pd.Series(np.linspace(0, n_headers - 1, width)
+                               .astype(int))
+            header.index = header.index.astype(str)
+
+            for years in (1, 5, None):
+                date_from = dates[0] if years is None else \
+                    dates[-1] - pd.DateOffset(years=years)
+
+                self.time("get_data",
+                          lambda: db.get_data(header, date_from, dates[-1],
+                                              'D'),
+                          width=width,
+                          years="all" if years is None else years)
+
+    def rollups(self, width=100):
+        """Monthly and quarterly reads, from rollups and from raw data."""
+        n_headers = self.params["n_objects"] * self.params["n_types"] * \
+            self.params["n_versions"]
+        width = min(width, n_headers)
+
+        db = engine.DataBase()
+        header = pd.Series(np.arange(width))
+        header.index = header.index.astype(str)
+
+        for freq in ("ME", "QE"):
+            for rollups in (True, False):
+                self.time("get_data_freq",
+                          lambda: db.get_data(header, None, None, freq,
+                                              rollups=rollups),
+                          width=width, freq=freq, rollups=rollups)
+
+    def save_data(self, n_new=100):
+        n_dates = self.params["n_dates"]
+        dates = pd.date_range("1900-01-01", periods=n_dates, freq='D')
+        timeseries = engine.Timeseries()
+
+        start = [10**9]
+
+        def save():
+            ids = np.arange(start[0], start[0] + n_new)
+            start[0] += n_new
+
+            timeseries.save(pd.DataFrame({
+                "header_id": np.repeat(ids, n_dates),
+                "obs_date": np.tile(dates.values, n_new),
+                "obs_value": np.random.normal(size=n_new * n_dates)
+            }))
+
+        self.time("save_data", save, rows=n_new * n_dates, repeat=1,
+                  headers=n_new)
+
+    def as_of(self, width=100, n_revised=10):
+        """Latest and as-of reads, before and after revising half the series.
+        """
+        n_headers = self.params["n_objects"] * self.params["n_types"] * \
+            self.params["n_versions"]
+        width = min(width, n_headers)
+
+        db = engine.DataBase()
+        header = pd.Series(np.arange(width))
+        header.index = header.index.astype(str)
+
+        dates = pd.date_range(self.params["start"],
+                              periods=self.params["n_dates"],
+                              freq=self.params["freq"])
+        as_of = pd.Timestamp.now()
+
+        for revised in (0, width // 2):
+            if revised > 0:
+                ids = np.arange(revised)
+                db._timeseries.save(pd.DataFrame({
+                    "header_id": np.repeat(ids, n_revised),
+                    "obs_date": np.tile(dates[-n_revised:].values, revised),
+                    "obs_value": np.random.normal(size=revised * n_revised)
+                }))
+
+            self.time("get_data_latest",
+                      lambda: db.get_data(header, None, None, 'D'),
+                      width=width, revised=revised)
+            self.time("get_data_as_of",
+                      lambda: db.get_data(header, None, None, 'D',
+                                          as_of=as_of),
+                      width=width, revised=revised)
+
+    def rows_in_db(self):
+        ch = engine.ConceptHeader()
+        stored = self.hangar.select("concept_header")
+
+        # half stored, half new
+        new = stored.copy()
+        new["data_object_id"] += self.params["n_objects"]
+        rows = pd.concat((stored, new), ignore_index=True)
+
+        self.time("rows_in_db", lambda: ch.rows_in_db(rows), rows=len(rows))
+
+    def column_operators(self):
+        do = engine.DataObject()
+        ch = engine.ConceptHeader()
+        n_objects = self.params["n_objects"]
+
+        names = ["synthetic object {:07d}".format(p)
+                 for p in range(0, n_objects, 10)]
+        half = n_objects // 2
+
+        self.time("column_like",
+                  lambda: do.columns["long_name"].like("object 00000"))
+        self.time("column_in", lambda: do.columns["long_name"].in_(names),
+                  values=len(names))
+        self.time("column_gt", lambda: ch.columns["data_object_id"] > half)
+
+    def run(self):
+        with using(self.hangar):
+            with self.hangar.session():
+                self.header_resolution()
+                self.version_resolution()
+                self.get_data()
+                self.rollups()
+                self.rows_in_db()
+                self.column_operators()
+
+            self.save_data()
+            self.as_of()
+
+        return self.results
+
+
+def run(path=None, n_objects=100, n_types=5, n_versions=2, n_dates=2500,
+        repeat=3, backend="hdf"):
+    """Generate a synthetic store and run the suite against it.
+
+    Parameters
+    ----------
+    path : str or None
+        of the store; None for a temporary one
+    n_objects, n_types, n_versions, n_dates : int
+        size of the store, see `datadough.synthetic.generate()`
+    repeat : int
+    backend : str
+
+    Returns
+    -------
+    res : dict
+        {'meta': {...}, 'results': [{'name', 'params', 'seconds', 'rows',
+        'rows_per_sec'}, ...]}
+
+    """
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "suite.h5")
+
+    params = {"n_objects": n_objects, "n_types": n_types,
+              "n_versions": n_versions, "n_dates": n_dates,
+              "n_providers": 2, "n_currencies": 5,
+              "start": "1990-01-01", "freq": 'B'}
+
+    hangar = DataHangar(path, keep_open=True, backend=backend)
+    generated = generate(hangar, **params)
+
+    suite = Suite(hangar, params, repeat=repeat)
+    suite.results.append({
+        "name": "generate", "params": {}, "seconds": generated["seconds"],
+        "rows": generated["rows"],
+        "rows_per_sec": generated["rows"] / generated["seconds"]
+    })
+    suite.run()
+
+    hangar.close()
+
+    meta = {
+        "timestamp": pd.Timestamp.now().isoformat(),
+        "backend": backend,
+        "store": params,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "tables": tables.__version__
+    }
+
+    return {"meta": meta, "results": suite.results}
+
+
+def main(argv=None):
+    """Command line entry."""
+    parser = argparse.ArgumentParser(
+        description="Run the datadough benchmark suite.")
+    parser.add_argument("--path", default=None,
+                        help="store to create; a temporary one by default")
+    parser.add_argument("--objects", type=int, default=100)
+    parser.add_argument("--types", type=int, default=5)
+    parser.add_argument("--versions", type=int, default=2)
+    parser.add_argument("--dates", type=int, default=2500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", default="hdf")
+    parser.add_argument("--out", default=None,
+                        help="file to write the results to; stdout if none")
+
+    args = parser.parse_args(argv)
+
+    t_start = time.perf_counter()
+    res = run(path=args.path, n_objects=args.objects, n_types=args.types,
+              n_versions=args.versions, n_dates=args.dates,
+              repeat=args.repeat, backend=args.backend)
+    res["meta"]["seconds"] = time.perf_counter() - t_start
+
+    if args.out is None:
+        json.dump(res, sys.stdout, indent=2)
+    else:
+        with open(args.out, 'w') as f:
+            json.dump(res, f, indent=2)
+
+    return res
+
+
+if __name__ == "__main__":
+    main()
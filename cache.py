@@ -0,0 +1,318 @@
+import os
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class TableCache(object):
+    """In-memory mirror of small (dimension) tables.
+
+    Tables are loaded in full on first access and kept up to date by
+    `append()`; a table with more than `max_rows` rows is not cached and
+    queries against it go to the store as usual.
+
+    Parameters
+    ----------
+    max_rows : int
+        size limit, in rows, of one cached table
+
+    """
+    def __init__(self, max_rows=100000):
+        """
+        """
+        self.max_rows = max_rows
+
+        # {(path_to_hdf, key): pandas.DataFrame}
+        self._frames = dict()
+
+        # tables known to exceed `max_rows`
+        self._too_large = set()
+
+    def __contains__(self, item):
+        return item in self._frames
+
+    def get(self, hangar, key):
+        """Fetch the mirror of table `key`, loading it if needed.
+
+        Parameters
+        ----------
+        hangar : DataHangar
+        key : str
+
+        Returns
+        -------
+        res : pandas.DataFrame or None
+            None if the table is too large to be cached
+
+        """
+        cache_key = (hangar.path_to_hdf, key)
+
+        if cache_key in self._too_large:
+            return None
+
+        if cache_key not in self._frames:
+            if hangar.nrows(key) > self.max_rows:
+                self._too_large.add(cache_key)
+                return None
+
+            self._frames[cache_key] = hangar.get(key)
+
+        return self._frames[cache_key]
+
+    def append(self, hangar, key, new):
+        """Incrementally update the mirror of `key` with appended rows.
+
+        Parameters
+        ----------
+        hangar : DataHangar
+        key : str
+        new : pandas.DataFrame
+            rows just appended to the store
+
+        """
+        cache_key = (hangar.path_to_hdf, key)
+
+        if cache_key not in self._frames:
+            return
+
+        frame = pd.concat((self._frames[cache_key], new), axis=0, sort=False)
+
+        if len(frame) > self.max_rows:
+            self.invalidate(hangar, key)
+            self._too_large.add(cache_key)
+        else:
+            self._frames[cache_key] = frame
+
+    def invalidate(self, hangar=None, key=None):
+        """Drop cached tables.
+
+        Parameters
+        ----------
+        hangar : DataHangar or None
+            None to drop tables of all stores
+        key : str or None
+            None to drop all tables of `hangar`
+
+        """
+        def matches(cache_key):
+            path, k = cache_key
+            return ((hangar is None) or (path == hangar.path_to_hdf)) and \
+                ((key is None) or (k == key))
+
+        for cache_key in [p for p in self._frames if matches(p)]:
+            del self._frames[cache_key]
+
+        self._too_large = set(p for p in self._too_large if not matches(p))
+
+    @staticmethod
+    def filter(frame, query):
+        """Evaluate `query` on a cached table.
+
+        Parameters
+        ----------
+        frame : pandas.DataFrame
+        query : TableQuery
+
+        Returns
+        -------
+        res : pandas.DataFrame
+
+        Raises
+        ------
+        UnsupportedQuery
+            if part of `query` is kept verbatim (see `query.Raw`) and
+            pandas cannot evaluate it; the store might
+
+        """
+        return frame.loc[query.mask(frame), :]
+
+
+class ResultCache(object):
+    """Memoize raw `get_data()` results, keyed on header ids and frequency.
+
+    Every entry holds the raw (not resampled) data of a set of headers over
+    a covered date interval. A request inside the interval is a hit; a
+    request extending it is a partial hit, for which only the missing
+    ranges have to be fetched. Entries of data which cannot be cut or
+    extended this way, e.g. last values per period, are only hits for the
+    very interval they were fetched for (see `get()`). Entries are evicted least-recently-used
+    first once `max_bytes` is exceeded; if `cache_dir` is given, evicted
+    entries are spilled there, up to `max_disk_bytes`.
+
+    Parameters
+    ----------
+    max_bytes : int
+        memory budget
+    cache_dir : str or None
+        directory to spill evicted entries to; None to drop them
+    max_disk_bytes : int
+        disk budget
+
+    """
+    def __init__(self, max_bytes=2**28, cache_dir=None, max_disk_bytes=2**30):
+        """
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        # {key: (date_from, date_to, pandas.DataFrame)}, oldest first
+        self._memory = OrderedDict()
+
+        # {key: (date_from, date_to, path, n_bytes)}, oldest first
+        self._disk = OrderedDict()
+
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def stats(self):
+        """dict: hit and miss counters."""
+        return {"hits": self.hits, "partial_hits": self.partial_hits,
+                "misses": self.misses}
+
+    @staticmethod
+    def make_key(header_id, freq, exact=False):
+        return frozenset(int(p) for p in header_id), str(freq), exact
+
+    @staticmethod
+    def _bounds(date_from, date_to):
+        lo = pd.Timestamp.min if date_from is None else pd.Timestamp(date_from)
+        hi = pd.Timestamp.max if date_to is None else pd.Timestamp(date_to)
+        return lo, hi
+
+    @staticmethod
+    def _nbytes(frame):
+        return int(frame.memory_usage(index=True, deep=False).sum())
+
+    def get(self, header_id, freq, date_from, date_to, fetch, exact=False):
+        """Fetch raw data, going to the store only for what is not cached.
+
+        Parameters
+        ----------
+        header_id : list-like
+            of int
+        freq : str
+        date_from, date_to : str or pandas.Timestamp or None
+        fetch : callable
+            fetch(date_from, date_to) -> pandas.DataFrame of raw data
+            indexed by date and columned by header id
+        exact : bool
+            True if what `fetch` returns is only valid for the interval it
+            was fetched for, as are the last values per period of
+            Timeseries.get_rollup(): a hit then takes the same interval,
+            and anything else is fetched anew
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            raw data between `date_from` and `date_to`
+
+        """
+        key = self.make_key(header_id, freq, exact)
+        lo, hi = self._bounds(date_from, date_to)
+
+        entry = self._lookup(key)
+
+        if (entry is None) or (exact and (entry[:2] != (lo, hi))):
+            self.misses += 1
+            frame = fetch(date_from, date_to)
+            self._put(key, lo, hi, frame)
+            return frame
+
+        c_lo, c_hi, frame = entry
+
+        if exact:
+            self.hits += 1
+            self._memory.move_to_end(key)
+            return frame
+
+        if (lo >= c_lo) and (hi <= c_hi):
+            self.hits += 1
+            self._memory.move_to_end(key)
+            return frame.loc[lo:hi]
+
+        # extend the covered interval by the missing ranges only
+        self.partial_hits += 1
+        pieces = [frame]
+
+        if lo < c_lo:
+            pieces.insert(0, fetch(date_from, c_lo - pd.Timedelta(1)))
+        if hi > c_hi:
+            pieces.append(fetch(c_hi + pd.Timedelta(1), date_to))
+
+        frame = pd.concat(pieces, axis=0, sort=False)
+        frame = frame.loc[~frame.index.duplicated(keep="last")].sort_index()
+
+        self._put(key, min(lo, c_lo), max(hi, c_hi), frame)
+
+        return frame.loc[lo:hi]
+
+    def _lookup(self, key):
+        """Find an entry in memory or, failing that, on disk."""
+        if key in self._memory:
+            return self._memory[key]
+
+        if key in self._disk:
+            lo, hi, path, _ = self._disk.pop(key)
+            frame = pd.read_pickle(path)
+            os.remove(path)
+            self._put(key, lo, hi, frame)
+            return self._memory[key]
+
+        return None
+
+    def _put(self, key, lo, hi, frame):
+        self._memory[key] = (lo, hi, frame)
+        self._memory.move_to_end(key)
+
+        # evict least recently used entries, but not the new one
+        n_bytes = sum(self._nbytes(p[2]) for p in self._memory.values())
+
+        while (n_bytes > self.max_bytes) and (len(self._memory) > 1):
+            old_key, (old_lo, old_hi, old_frame) = \
+                self._memory.popitem(last=False)
+            n_bytes -= self._nbytes(old_frame)
+            self._spill(old_key, old_lo, old_hi, old_frame)
+
+    def _spill(self, key, lo, hi, frame):
+        """Move an evicted entry to disk, if there is a disk budget."""
+        if self.cache_dir is None:
+            return
+
+        path = os.path.join(self.cache_dir, uuid.uuid4().hex + ".pkl")
+        frame.to_pickle(path)
+        self._disk[key] = (lo, hi, path, os.path.getsize(path))
+
+        n_bytes = sum(p[3] for p in self._disk.values())
+
+        while n_bytes > self.max_disk_bytes:
+            _, (_, _, old_path, old_bytes) = self._disk.popitem(last=False)
+            os.remove(old_path)
+            n_bytes -= old_bytes
+
+    def invalidate(self, header_id=None):
+        """Drop entries involving any of `header_id`.
+
+        Parameters
+        ----------
+        header_id : list-like or None
+            of int; None to drop everything
+
+        """
+        if header_id is not None:
+            header_id = set(int(p) for p in header_id)
+
+        def matches(key):
+            return (header_id is None) or bool(key[0] & header_id)
+
+        for key in [p for p in self._memory if matches(p)]:
+            del self._memory[key]
+
+        for key in [p for p in self._disk if matches(p)]:
+            os.remove(self._disk.pop(key)[2])
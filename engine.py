@@ -1,27 +1,207 @@
+import time
+import functools
+
 import pandas as pd
 import numpy as np
-from datadough.query import TableQuery
+from pandas.tseries.frequencies import to_offset
+from datadough.query import TableQuery, In, And, UnsupportedQuery, \
+    encode_ids
 from datadough.hangar import DataHangar
+from datadough.cache import TableCache
+from datadough.string_index import StringIndex
+from datadough.instrument import traced
+
+# path of the store used by tables not given one; the store itself, module
+#   attribute `hangar`, is created on first use (see `get_hangar()`)
+default_path = "c:/temp/test_hdf.h5"
+
+# opt-in mirror of the dimension tables, see `enable_table_cache()`
+table_cache = None
+
+# tables small enough to be mirrored in memory
+DIMENSION_TABLES = ("data_object", "data_type", "data_provider", "currency",
+                    "data_version", "concept_header")
+
+# string columns with secondary indexes, see `Table.string_index()`
+STRING_INDEX_COLUMNS = ("short_name", "long_name", "iso", "description")
+
+# {(path_to_hdf, key, column): StringIndex}
+string_indexes = dict()
+
+# schemas of the tables of the engine classes, by key; also what stores
+#   hold in their root node attributes (see `Table(schema=None)`)
+SCHEMAS = {
+    "data_object": {
+        "required_columns": ("long_name", ),
+        "default_column": "long_name"
+    },
+    "data_type": {
+        "required_columns": ("short_name", "long_name", "nature", ),
+        "default_column": "short_name",
+    },
+    "data_provider": {
+        "required_columns": ("long_name", ),
+        "default_column": "long_name"
+    },
+    "currency": {
+        "required_columns": ("iso", ),
+        "optional_columns": ("long_name", ),
+        "default_column": "iso"
+    },
+    "data_version": {
+        "required_columns": ("concept_header_id", "date_created",
+                             "description"),
+        "default_column": "description"
+    },
+    "concept_header": {
+        "required_columns": ("data_object_id", "data_type_id",
+                             "data_provider_id", "currency_id"),
+        "default_column": "data_object_id"
+    },
+    "ts_header": {
+        "required_columns": ("concept_header_id", "data_version_id"),
+        "default_column": "concept_header_id"
+    },
+    "timeseries": {
+        "required_columns": ("header_id", "obs_date", "obs_value", ),
+        "optional_columns": ("date_inserted", ),
+        "default_column": "header_id",
+        "index_columns": ("header_id", "obs_date"),
+    },
+}
+
+
+def get_hangar():
+    """The module-wide store `hangar`, created at `default_path` on first use.
+
+    Assign `engine.hangar` to point tables without a store of their own
+    elsewhere.
+
+    Returns
+    -------
+    DataHangar
+
+    """
+    res = globals().get("hangar")
+
+    if res is None:
+        res = DataHangar(default_path)
+        globals()["hangar"] = res
+
+    return res
+
+
+def __getattr__(name):
+    # `engine.hangar` before anything has used or set it
+    if name == "hangar":
+        return get_hangar()
+
+    raise AttributeError("module {!r} has no attribute {!r}"
+                         .format(__name__, name))
+
+
+def enable_table_cache(max_rows=100000):
+    """Answer queries to the dimension tables from memory.
+
+    Parameters
+    ----------
+    max_rows : int
+        tables larger than this are still queried from the store
+
+    Returns
+    -------
+    TableCache
+
+    """
+    global table_cache
+    table_cache = TableCache(max_rows=max_rows)
 
-hangar = DataHangar("c:/temp/test_hdf.h5")
+    return table_cache
+
+
+def disable_table_cache():
+    """Go back to querying the store for every request."""
+    global table_cache
+    table_cache = None
 
 
 class DataBase(object):
-    """docstring for DataBase."""
-    def __init__(self):
+    """docstring for DataBase.
+
+    Tables are created on first access, so that constructing a DataBase
+    costs nothing and a job touching one table pays for that one only.
+
+    Parameters
+    ----------
+    result_cache : ResultCache or None
+        to memoize the raw data fetched by `get_data()`
+    mmap_store : MmapStore or None
+        read-optimized copy of hot series, served instead of the store
+    hangar : DataHangar or None
+        store to use; None for the module-wide one (see `get_hangar()`)
+    """
+    def __init__(self, result_cache=None, mmap_store=None, hangar=None):
         """
         """
-        self._data_object = DataObject()
-        self._data_type = DataType()
-        self._data_provider = DataProvider()
-        self._currency = Currency()
-        self._data_version = DataVersion()
-        self._tsheader = TSHeader()
-        self._conceptheader = ConceptHeader()
+        self.result_cache = result_cache
+        self.mmap_store = mmap_store
+
+        self._hangar = hangar
+
+        # {attribute name: Table}, filled on first access
+        self._tables = dict()
+
+        # worker processes of parallel reads, see `get_data()`
+        self._fetcher = None
+
+    @property
+    def hangar(self):
+        return get_hangar() if self._hangar is None else self._hangar
+
+    def _table(self, name, cls, **kwargs):
+        """Table `cls` of this database, created on first access."""
+        if name not in self._tables:
+            self._tables[name] = cls(hangar=self._hangar, **kwargs)
+
+        return self._tables[name]
+
+    @property
+    def _data_object(self):
+        return self._table("data_object", DataObject)
 
-        self._timeseries = Timeseries()
+    @property
+    def _data_type(self):
+        return self._table("data_type", DataType)
+
+    @property
+    def _data_provider(self):
+        return self._table("data_provider", DataProvider)
+
+    @property
+    def _currency(self):
+        return self._table("currency", Currency)
+
+    @property
+    def _data_version(self):
+        return self._table("data_version", DataVersion)
+
+    @property
+    def _tsheader(self):
+        return self._table("ts_header", TSHeader)
+
+    @property
+    def _conceptheader(self):
+        return self._table("concept_header", ConceptHeader)
 
-    def get_data(self, header, date_from, date_to, freq):
+    @property
+    def _timeseries(self):
+        return self._table("timeseries", Timeseries,
+                           mmap_store=self.mmap_store)
+
+    @traced
+    def get_data(self, header, date_from, date_to, freq, n_workers=None,
+                 batch_size=100, as_of=None, version="default",
+                 rollups=True):
         """
 
         Parameters
@@ -34,33 +214,180 @@ class DataBase(object):
         date_from
         date_to
         freq
+        n_workers : int or None
+            if set, batches of headers are read concurrently by this many
+            worker processes (see ParallelFetcher); None to read serially
+        batch_size : int
+            number of headers per batch of a worker
+        as_of : str or pandas.Timestamp, optional
+            to get the data as it was at this time (see Timeseries.get_data)
+        version : str or int
+            for a DataFrame `header`, the data version of headers without a
+            'data_version_id': 'default', 'newest' or a version id or
+            description (see TSHeader.get_id())
+        rollups : bool
+            False to always resample the raw data, even if `freq` can be
+            served from pre-aggregated rollups (see Timeseries.get_rollup());
+            with a `result_cache`, what is read from rollups is cached for
+            the interval asked for only
 
         Returns
         -------
 
         """
-        if isinstance(header, pd.Series):
-            dh = header.copy()
+        if n_workers is None:
+            def read(ids, lo, hi):
+                return self._timeseries.get_data(ids, lo, hi, as_of=as_of)
         else:
-            dh = self._tsheader.get_id(header)
+            fetcher = self._parallel_fetcher(n_workers)
+
+            def read(ids, lo, hi):
+                return fetcher.get_data(ids, lo, hi, batch_size=batch_size,
+                                        as_of=as_of)
+
+        # one handle for all the queries below
+        with self.hangar.session():
+            dh = self._header_id(header, version)
+
+            # last values per period, pre-aggregated if a rollup serves
+            #   `freq`; rollups and the cache hold the latest data only
+            from_rollup = rollups and (as_of is None) and \
+                (self._timeseries._rollup_for(freq) is not None)
 
-        data = self._timeseries.get_data(dh, date_from, date_to)
+            if from_rollup:
+                def fetch(lo, hi):
+                    return self._timeseries.get_rollup(pd.unique(dh.values),
+                                                       freq, lo, hi)
+            else:
+                def fetch(lo, hi):
+                    return read(pd.unique(dh.values), lo, hi)
+
+            if (self.result_cache is None) or (as_of is not None):
+                data = fetch(date_from, date_to)
+            else:
+                data = self.result_cache.get(dh.values, freq, date_from,
+                                             date_to, fetch,
+                                             exact=from_rollup)
+
+            data = data.reindex(columns=dh.values)
+
+        # names to use on the retrieved data
+        data.columns = dh.index
 
         # implement freq
         data = data.resample(freq).last()
 
         return data
 
-    def save_data(self, data_to_save):
+    def _parallel_fetcher(self, n_workers):
+        """Pool of `n_workers` reader processes, started on first use."""
+        fetcher = self._fetcher
+
+        if (fetcher is not None) and \
+                ((fetcher.n_workers != n_workers) or
+                 (fetcher.path_to_hdf != self.hangar.path_to_hdf)):
+            fetcher.close()
+            fetcher = None
+
+        if fetcher is None:
+            # optional: only needed for parallel reads
+            from datadough.parallel import ParallelFetcher
+            fetcher = ParallelFetcher(self.hangar, n_workers=n_workers,
+                                      mmap_store=self._timeseries.mmap_store)
+            self._fetcher = fetcher
+
+        return fetcher
+
+    def close(self):
+        """Stop the worker processes of parallel reads, if any."""
+        if self._fetcher is not None:
+            self._fetcher.close()
+            self._fetcher = None
+
+    def iter_data(self, header, date_from, date_to, freq, batch_size=100,
+                  as_of=None, version="default"):
+        """Stream the data of `get_data()` in batches of headers.
+
+        Every batch is read and resampled separately, so that peak memory
+        is bounded by `batch_size` series regardless of the total size of
+        the query; concatenating the batches along the columns gives the
+        result of `get_data()`.
+
+        Parameters
+        ----------
+        header : pandas.Series or pandas.DataFrame
+            as in `get_data()`
+        date_from
+        date_to
+        freq
+        batch_size : int
+            number of headers per batch
+        as_of : str or pandas.Timestamp, optional
+            as in `get_data()`
+        version : str or int
+            as in `get_data()`
+
+        Yields
+        ------
+        data : pandas.DataFrame
+            resampled to `freq`, columned by names of (some of the) headers
+
+        """
+        with self.hangar.session():
+            dh = self._header_id(header, version)
+
+        for p in range(0, len(dh), batch_size):
+            dh_batch = dh.iloc[p:(p + batch_size)]
+
+            with self.hangar.session():
+                data = self._timeseries.get_data(dh_batch, date_from, date_to,
+                                                 as_of=as_of)
+
+            data.columns = dh_batch.index
+
+            yield data.resample(freq).last()
+
+    def _header_id(self, header, version="default"):
+        """Integer header ids to fetch data of.
+
+        Parameters
+        ----------
+        header : pandas.Series or pandas.DataFrame
+            as in `get_data()`
+        version : str or int
+            as in `get_data()`
+
+        Returns
+        -------
+        res : pandas.Series
+            of integer header ids, indexed by names to use on the data
+
+        """
+        if isinstance(header, pd.Series):
+            res = header.copy()
+        else:
+            res = self._tsheader.get_id(header, version=version)
+
+            if res.isnull().any():
+                raise ValueError("No time series found for the headers " +
+                                 "{}.".format(list(res.index[res.isnull()])))
+
+        return res
+
+    @traced
+    def save_data(self, data_to_save, **kwargs):
         """
 
         Parameters
         ----------
         data_to_save : pandas.Series or pandas.DataFrame
+        kwargs
+            passed to Timeseries.save(), e.g. `chunksize`
 
         Returns
         -------
-        None
+        res : dict
+            write statistics as reported by Timeseries.save()
 
         """
         df = data_to_save.copy()
@@ -70,7 +397,8 @@ class DataBase(object):
         if not isinstance(df.columns, pd.MultiIndex):
             cols = df.columns
         else:
-            cols = self._conceptheader.get_id(df.columns, create=True)
+            with self.hangar.session():
+                cols = self._conceptheader.get_id(df.columns, create=True)
 
         df.columns = cols
 
@@ -85,9 +413,12 @@ class DataBase(object):
                                    value_name="obs_value")
 
         # ready to save
-        Timeseries().save(data=df)
+        res = self._timeseries.save(data=df, **kwargs)
 
-        return
+        if self.result_cache is not None:
+            self.result_cache.invalidate(df["header_id"].unique())
+
+        return res
 
 
 class Table(object):
@@ -99,24 +430,34 @@ class Table(object):
         key to locate the table in the DataHangar
     schema : dict or None
         if None, the value is taken from HDFStore attributes from `hangar`
+    hangar : DataHangar or None
+        store holding the table; None for the module-wide one (see
+        `get_hangar()`), looked up on every call
     """
-    def __init__(self, key, schema=None):
+    # longest literal id list to put into a `where` expression
+    max_literals = 30
+
+    def __init__(self, key, schema=None, hangar=None):
         """
         """
         self.key = key
+        self.cacheable = key in DIMENSION_TABLES
+
+        self._hangar = hangar
 
         if schema is None:
-            with pd.HDFStore(hangar.path_to_hdf, mode='r') as h:
-                for k, v in h.root._v_attrs[key].items():
-                    setattr(self, ('_' + k), v)
-        else:
-            self._required_columns = schema.get(
-                "required_columns", tuple())
-            # TODO: watch out for empty list of keys!
-            self._optional_columns = schema.get(
-                "optional_columns", tuple())
-            self._default_column = schema.get(
-                "default_column", tuple())
+            schema = self.hangar.get_attrs(key)
+
+        self._required_columns = schema.get(
+            "required_columns", tuple())
+        # TODO: watch out for empty list of keys!
+        self._optional_columns = schema.get(
+            "optional_columns", tuple())
+        self._default_column = schema.get(
+            "default_column", tuple())
+        # columns to keep completely sorted indexes on; None for all
+        self._index_columns = schema.get(
+            "index_columns", None)
 
         # columns
         columns = dict()
@@ -146,13 +487,61 @@ class Table(object):
     #     return idx
 
     @property
+    def hangar(self):
+        return get_hangar() if self._hangar is None else self._hangar
+
+    @property
+    @traced
     def index(self):
-        res = hangar.select_column(self.key, "index").index
+        frame = self._cached_frame()
+        if frame is not None:
+            return frame.index
+
+        res = pd.Index(self.hangar.select_column(self.key, "index").values)
         return res
 
+    def _cached_frame(self):
+        """In-memory mirror of this table, if there is one.
+
+        Returns
+        -------
+        pandas.DataFrame or None
+
+        """
+        if (table_cache is None) or not self.cacheable:
+            return None
+
+        return table_cache.get(self.hangar, self.key)
+
+    def string_index(self, column):
+        """Secondary index of string column `column`, if it has one.
+
+        Returns
+        -------
+        StringIndex or None
+
+        """
+        if column not in STRING_INDEX_COLUMNS:
+            return None
+
+        cache_key = (self.hangar.path_to_hdf, self.key, column)
+        if cache_key not in string_indexes:
+            string_indexes[cache_key] = StringIndex(self.hangar, self.key,
+                                                    column)
+
+        res = string_indexes[cache_key]
+        res.hangar = self.hangar
+
+        return res
+
+    @traced
     def filter(self, query):
         """Find the row(s) meeting the search criterion in `query`.
 
+        A membership in more than `max_literals` values, alone or as a
+        conjunct (e.g. `And(In, Range)`), is answered by row coordinates;
+        the other conjuncts are then evaluated on the rows fetched.
+
         Parameters
         ----------
         query : TableQuery
@@ -162,11 +551,40 @@ class Table(object):
         res : pandas.DataFrame
             row(s) meeting the criterion
         """
+        query = query.optimize()
+
+        # simple predicates are answered by the in-memory mirror
+        frame = self._cached_frame()
+        if frame is not None:
+            try:
+                return table_cache.filter(frame, query)
+            except UnsupportedQuery:
+                # whatever pandas cannot evaluate, pytables might
+                pass
+
+        # long literal lists: fetch by row coordinates instead
+        conjuncts = query.node.children if isinstance(query.node, And) \
+            else [query.node]
+        long_in = [p for p in conjuncts if isinstance(p, In) and
+                   (len(p.values) > self.max_literals)]
+
+        if len(long_in) > 0:
+            res = self.hangar.select_isin(self.key, long_in[0].column,
+                                          long_in[0].values)
+
+            rest = [p for p in conjuncts if p is not long_in[0]]
+            try:
+                return res.loc[And(*rest).mask(res), :]
+            except UnsupportedQuery:
+                # whatever pandas cannot evaluate, pytables might
+                pass
+
         # TODO integrate pandas.HDFStore start, stop things?
-        res = hangar.select(key=self.key, where=query.expression)
+        res = self.hangar.select(key=self.key, where=query.expression)
 
         return res
 
+    @traced
     def get_unique_id(self, query):
         """Find one row that meets the search criterion in `query`.
 
@@ -194,6 +612,7 @@ class Table(object):
         else:
             return res.index[0]
 
+    @traced
     def add_new(self, new):
         """
         Parameters
@@ -214,27 +633,30 @@ class Table(object):
                    "'{}', " * (len(missing)-1) + "'{}'.").format(*missing)
             raise ValueError(msg)
 
-        # rows that are not in db already
-        not_in_db = ~self.rows_in_db(new_reix)
+        with self.hangar.session():
+            # rows that are not in db already
+            if self.key in self.hangar:
+                not_in_db = ~self.rows_in_db(new_reix)
+            else:
+                not_in_db = pd.Series(True, index=new_reix.index)
 
-        # add truly new rows
-        # need to reindex first: watch out that the index in the HDFStore is
-        #   unique!
-        max_idx = self.index.max()
+            # add truly new rows, with unique ids from the table's sequence
+            df_to_save = new.loc[not_in_db, :]
+            unq_idx = self.hangar.reserve_ids(self.key, len(df_to_save))
+            df_to_save.index = unq_idx
 
-        # construct new index with unique values
-        n_rows_to_save = not_in_db.sum()
-        unq_idx = range(max_idx+1, max_idx+1+n_rows_to_save)
+            # append
+            self.hangar.append(self.key, df_to_save, data_columns=True)
 
-        # combine to a DataFrame
-        df_to_save = new.loc[not_in_db, :]
-        df_to_save.index = unq_idx
+            for p in df_to_save.columns.intersection(STRING_INDEX_COLUMNS):
+                self.string_index(p).update(df_to_save[p])
 
-        # append
-        hangar.append(self.key, df_to_save)
+        if self.cacheable and (table_cache is not None):
+            table_cache.append(self.hangar, self.key, df_to_save)
 
         return list(unq_idx)
 
+    @traced
     def rows_in_db(self, rows):
         """
         Parameters
@@ -250,23 +672,62 @@ class Table(object):
         if isinstance(rows, pd.Series):
             rows = rows.to_frame()
 
-        # function to apply: will load rows where the entries match perfectly
-        #   and calculate the number of such rows
-        def apply_fun(row):
-            res = len(self.filter(TableQuery(row)))
-            return res
+        columns = list(rows.columns)
+
+        if rows.empty or (len(columns) < 1):
+            return pd.Series(False, index=rows.index, dtype=bool)
+
+        stored = self._select_candidates(rows)
+
+        # hash join of the incoming rows against the stored ones
+        stored_keys = pd.MultiIndex.from_frame(
+            stored[columns].drop_duplicates())
+        flag = pd.MultiIndex.from_frame(rows).isin(stored_keys)
+
+        # missing values never compare equal in the store
+        res = pd.Series(flag, index=rows.index) & rows.notnull().all(axis=1)
+
+        return res
+
+    def _select_candidates(self, rows):
+        """Load the stored rows that can possibly match those in `rows`.
+
+        Only the columns of `rows` are loaded; if the first of them is
+        numeric, only the key range thereof spanned by `rows` is.
+
+        Parameters
+        ----------
+        rows : pandas.DataFrame
+
+        Returns
+        -------
+        res : pandas.DataFrame
+
+        """
+        columns = list(rows.columns)
+
+        stored = self._cached_frame()
+        if stored is not None:
+            return stored.loc[:, columns]
 
-        # apply the function over rows
-        flag = rows.apply(apply_fun, axis=1)
+        first = rows[columns[0]]
+        if pd.api.types.is_numeric_dtype(first) and first.notnull().any():
+            where = "({c} >= {lo}) & ({c} <= {hi})".format(
+                c=columns[0], lo=first.min(), hi=first.max())
+        else:
+            where = None
 
-        # whenever there are more than 0 rows matching with `rows`, return True
-        res = flag.gt(0)
+        res = self.hangar.select(self.key, where=where, columns=columns)
 
         return res
 
     def construct_query_by_id(self, idx):
         """Construct valid query to another table with this table's name.
 
+        Ids are encoded as inclusive ranges plus a short literal list; a
+        query on more than `max_literals` scattered ids is left as one
+        membership, which `filter()` answers by row coordinates.
+
         Parameters
         ----------
         idx : list-like
@@ -274,98 +735,85 @@ class Table(object):
 
         Returns
         -------
+        res : TableQuery
 
         """
-        # if nothing was returned, output empty list
+        # if nothing was returned, the query matches nothing
         if len(idx) < 1:
-            expr = []
+            return TableQuery([])
 
-        elif len(idx) == 1:
-            expr = self.key + "_id == " + str(idx.values[0])
+        node = encode_ids(self.key + "_id", idx, max_terms=self.max_literals)
 
-        elif (np.diff(np.array(sorted(idx))) < 2).all():
-            # check if possible to run a shortcut with between
-            expr = (
-                self.key + "_id" + " > {} and " +
-                self.key + "_id" + " < {}").format(min(idx), max(idx))
-
-        else:
-            expr = self.key + "_id" + "in {}".format(tuple(idx))
-            
-        return expr
+        return TableQuery(node)
 
 
 class DataObject(Table):
     """docstring for DataObject."""
 
-    def __init__(self):
+    def __init__(self, hangar=None):
         """
         """
-        schema = {
-            "required_columns": ("long_name", ),
-            "default_column": "long_name"
-        }
-        super(DataObject, self).__init__(key="data_object", schema=schema)
+        schema = SCHEMAS["data_object"]
+        super(DataObject, self).__init__(key="data_object", schema=schema,
+                                         hangar=hangar)
 
 
 class DataType(Table):
     """docstring for DataType."""
 
-    def __init__(self):
+    def __init__(self, hangar=None):
         """
         """
-        schema = {
-            "required_columns": ("short_name", "long_name", "nature", ),
-            "default_column": "short_name",
-        }
-        super(DataType, self).__init__(key="data_type", schema=schema)
+        schema = SCHEMAS["data_type"]
+        super(DataType, self).__init__(key="data_type", schema=schema,
+                                       hangar=hangar)
 
 
 class DataProvider(Table):
     """docstring for DataProvider."""
 
-    def __init__(self):
+    def __init__(self, hangar=None):
         """
         """
-        schema = {
-            "required_columns": ("long_name", ),
-            "default_column": "long_name"
-        }
-        super(DataProvider, self).__init__(key="data_provider", schema=schema)
+        schema = SCHEMAS["data_provider"]
+        super(DataProvider, self).__init__(key="data_provider",
+                                           schema=schema, hangar=hangar)
 
 
 class Currency(Table):
     """docstring for Currency."""
 
-    def __init__(self):
+    def __init__(self, hangar=None):
         """
         """
-        schema = {
-            "required_columns": ("iso", ),
-            "optional_columns": ("long_name", ),
-            "default_column": "iso"
-        }
+        schema = SCHEMAS["currency"]
 
-        super(Currency, self).__init__(key="currency", schema=schema)
+        super(Currency, self).__init__(key="currency", schema=schema,
+                                       hangar=hangar)
 
 
 class DataVersion(Table):
     """docstring for DataVersion."""
 
-    def __init__(self):
+    def __init__(self, hangar=None):
         """
         """
-        schema = {
-            "required_columns": ("concept_header_id", "date_created",
-                                 "description"),
-            "default_column": "description"
-        }
+        schema = SCHEMAS["data_version"]
+
+        super(DataVersion, self).__init__(key="data_version",
+                                          schema=schema, hangar=hangar)
+
+        self._default_version = None
 
-        super(DataVersion, self).__init__(key="data_version", schema=schema)
+    @property
+    def default_version(self):
+        """Id of the 'default' version, looked up on first access."""
+        if self._default_version is None:
+            self._default_version = self.get_unique_id(
+                query=TableQuery("description == 'default'")
+            )
 
-        self.default_version = self.get_unique_id(
-            query=TableQuery("description == 'default'")
-        )
+        return self._default_version
 
     def add_quick(self, concept_header_id):
         """
@@ -387,83 +835,236 @@ class DataVersion(Table):
         return
 
     def get_default(self, concept_header_id):
-        """
+        """Id of the 'default' version of every concept header.
 
         Parameters
         ----------
-        concept_header_id
+        concept_header_id : int or list-like
 
         Returns
         -------
+        res : int or pandas.Series
+            int (or [] if there is none) for one concept header; otherwise
+            a Series of version ids with NaN where there is none
 
         """
-        # query (leave 'date_added' empty)
-        query = TableQuery({"concept_header_id": concept_header_id,
-                            "description": "default"})
+        return self._picked(concept_header_id, "default", "data_version_id")
 
-        res = self.get_unique_id(query)
+    def get_newest(self, concept_header_id):
+        """Id of the most recently created version of every concept header.
 
-        return res
+        Parameters
+        ----------
+        concept_header_id : int or list-like
+
+        Returns
+        -------
+        res : int or pandas.Series
+            as in `get_default()`
 
-    def get_newest(self, header_id):
         """
+        return self._picked(concept_header_id, "newest", "data_version_id")
+
+    @traced
+    def resolve(self, concept_header_id, policy="default", pinned=None):
+        """Time series headers of many concept headers in one version each.
+
+        Both `ts_header` and `data_version` are queried once, for all the
+        concept headers, however many there are.
 
         Parameters
         ----------
-        header_id : int or pandas.Series
+        concept_header_id : list-like
+            of int
+        policy : str
+            'default' for the version described as 'default', 'newest' for
+            the one created last, 'pinned' for the one in `pinned`
+        pinned : int or str or list-like
+            version id or description; list-like to pin every concept
+            header separately (aligned with `concept_header_id`)
+
+        Returns
+        -------
+        res : pandas.Series
+            of ts header ids, NaN where there is none, aligned with
+            `concept_header_id`
+
+        """
+        res = self._pick(concept_header_id, policy, pinned)["ts_header_id"]
+
+        return res
+
+    def _picked(self, concept_header_id, policy, column):
+        """`column` of `_pick()`, a scalar for a scalar input."""
+        if np.ndim(concept_header_id) > 0:
+            return self._pick(concept_header_id, policy)[column]
+
+        res = self._pick([concept_header_id], policy)[column]
+
+        return [] if res.isnull().iloc[0] else int(res.iloc[0])
+
+    def _pick(self, concept_header_id, policy="default", pinned=None):
+        """Pick one ts header and version for every concept header.
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            columned with 'ts_header_id' and 'data_version_id', in the order
+            of `concept_header_id` (and so with a RangeIndex)
+
+        """
+        wanted = pd.DataFrame({
+            "concept_header_id": np.asarray(concept_header_id,
+                                            dtype=np.int64)})
+
+        # ts headers of all the concept headers, with their versions
+        candidates = self._candidates(wanted["concept_header_id"].values)
+
+        if policy == "default":
+            chosen = candidates.loc[candidates["description"] == "default"]
+        elif policy == "newest":
+            # the larger id, created later, breaks ties
+            chosen = candidates.sort_values(
+                ["date_created", "data_version_id"], kind="mergesort") \
+                .drop_duplicates("concept_header_id", keep="last")
+        elif policy == "pinned":
+            if pinned is None:
+                raise ValueError("Policy 'pinned' needs `pinned`!")
+
+            if np.ndim(pinned) > 0:
+                wanted["pinned"] = list(pinned)
+            else:
+                wanted["pinned"] = pinned
+
+            wanted["pinned"] = wanted["pinned"].astype(object)
+
+            # pinned by description or by id
+            is_label = wanted["pinned"].map(lambda x: isinstance(x, str))
+            by = np.where(is_label, "description", "data_version_id")
+
+            chosen = []
+            for column in np.unique(by):
+                pins = wanted.loc[by == column,
+                                  ["concept_header_id", "pinned"]] \
+                    .drop_duplicates()
+                pins[column] = pins["pinned"].astype(
+                    candidates[column].dtype)
+
+                chosen.append(candidates.merge(
+                    pins, on=["concept_header_id", column]))
+
+            chosen = pd.concat(chosen, ignore_index=True)
+        else:
+            raise ValueError("Unknown policy '{}'!".format(policy))
+
+        chosen = chosen.loc[:, ["concept_header_id", "ts_header_id",
+                                "data_version_id"] +
+                            (["pinned"] if policy == "pinned" else [])]
+
+        if chosen.duplicated(chosen.columns.drop(
+                ["ts_header_id", "data_version_id"])).any():
+            raise ValueError("More than one version matches for some " +
+                             "concept headers; narrow down your search!")
+
+        on = ["concept_header_id"] + \
+            (["pinned"] if policy == "pinned" else [])
+
+        res = wanted.merge(chosen, on=on, how="left")
+        res = res.loc[:, ["ts_header_id", "data_version_id"]]
+
+        if res.notnull().all().all():
+            res = res.astype(np.int64)
+
+        return res
+
+    def _candidates(self, concept_header_id):
+        """Time series headers of `concept_header_id`, with their versions.
 
         Returns
         -------
+        res : pandas.DataFrame
+            columned with 'ts_header_id', 'concept_header_id',
+            'data_version_id', 'description' and 'date_created'
 
         """
-        pass
+        ts_header = TSHeader(hangar=self._hangar)
+
+        found = ts_header.filter(TableQuery(encode_ids(
+            "concept_header_id", concept_header_id,
+            max_terms=ts_header.max_literals)))
+        found = found.rename_axis("ts_header_id").reset_index()
+
+        versions = self.filter(TableQuery(encode_ids(
+            "index", found["data_version_id"].unique(),
+            max_terms=self.max_literals)))
+        versions = versions.loc[:, ["description", "date_created"]]
+
+        res = found.loc[:, ["ts_header_id", "concept_header_id",
+                            "data_version_id"]] \
+            .astype(np.int64) \
+            .join(versions, on="data_version_id", how="inner")
+
+        return res
 
 
 class ConceptHeader(Table):
     """
     data_object, data_type, data_currency, data_provider 4-tuple.
     """
-    def __init__(self):
+    def __init__(self, hangar=None):
         """
         """
-        schema = {
-            "required_columns": ("data_object_id", "data_type_id",
-                                 "data_provider_id", "currency_id"),
-            "default_column": "data_object_id"
-        }
+        schema = SCHEMAS["concept_header"]
 
         super(ConceptHeader, self).__init__(key="concept_header",
-                                            schema=schema)
+                                            schema=schema, hangar=hangar)
 
+    @traced
     def get_id(self, info, create=False):
         """Fetch integer header ids based on query in `info`.
 
+        Many headers (e.g. a MultiIndex of columns) are resolved in one go:
+        every dimension is queried once for all the distinct labels it
+        needs, and the headers are created and looked up in one pass.
+
         Parameters
         ----------
-        info : pandas.Series or pandas.DataFrame or dict
+        info : pandas.Series or pandas.DataFrame or pandas.MultiIndex or dict
+            if DataFrame, index is 'data_object_id', 'data_type_id' etc. and
+            there is one column per header
         create : bool
             True to create a Header if not found
 
         Returns
         -------
         res : int or pandas.Series
+            int (or [] if not found) for one header; otherwise a Series of
+            ids with NaN where no header was found
 
         """
         # to ndframe
         info_ndframe = self._coerce_to_ndframe(info)
 
+        # one header per row
+        if isinstance(info_ndframe, pd.Series):
+            headers = info_ndframe.to_frame().T
+        else:
+            headers = info_ndframe.T
+
         # fetch
-        info_int = self._from_ndframe(info_ndframe)
+        headers_int = self._from_ndframe(headers)
 
-        # add a new entry if asked
+        # add new entries if asked
         if create:
-            self.add_new(info_int)
+            self.add_new(headers_int.drop_duplicates())
 
         # call to db
-        query = TableQuery(info_int)
-        header = self.get_unique_id(query=query)
+        res = self._lookup(headers_int)
+
+        if isinstance(info_ndframe, pd.Series):
+            return [] if res.isnull().iloc[0] else int(res.iloc[0])
 
-        return header
+        return res
 
     @staticmethod
     def _coerce_to_ndframe(what):
@@ -491,60 +1092,120 @@ class ConceptHeader(Table):
 
         return res
 
-    def _from_ndframe(self, info_ndframe):
-        """Helper function operating on dictionaries.
+    def _from_ndframe(self, headers):
+        """Replace labels of the header constituents with their ids.
 
         Parameters
         ----------
-        info_ndframe : pandas.Series
+        headers : pandas.DataFrame
+            one header per row, columned with required columns
 
         Returns
         -------
-        info_series_int : int or pandas.Series
+        res : pandas.DataFrame
             of integers corresponding to ids of the header constituents
 
         """
         # assert all requred columns are in the index entries
-        assert pd.Index(self._required_columns).isin(info_ndframe.index).all()
-
-        # if a series -------------------------------------------------------
-        # if string -> fetch by default columns
-        if info_ndframe.dtype == 'O':
-            # function to apply to (idx, row) pairs in the Series: construct
-            #  a query + get unique id from each query
-            def apply_fun(tup):
-                tbl = Table(key=tup[0], schema=None)
-                q = TableQuery(
-                    ("{} == %r" % tup[1]).format(tbl._default_column))
-                temp_res = tbl.get_unique_id(q)
-                return temp_res
-
-            # fetch entries of the series one by one
-            info_series_int = pd.Series(
-                {k: apply_fun((k, v)) for k, v in info_ndframe.iteritems()}
-            )
+        assert pd.Index(self._required_columns).isin(headers.columns).all()
 
-            # convert to integers
-            info_series_int = info_series_int.astype(int)
+        res = headers.loc[:, list(self._required_columns)].copy()
 
-        else:
-            info_series_int = info_ndframe.copy()
+        for c in res.columns:
+            col = res[c].astype(object)
+            is_label = col.map(lambda x: isinstance(x, str))
+
+            # if string -> fetch by default columns, once per dimension
+            if is_label.any():
+                labels = col[is_label]
+                ids = self._resolve_labels(c, labels.unique())
+                col[is_label] = labels.map(ids)
+
+            res[c] = col.astype(np.int64)
+
+        return res
+
+    @traced
+    def _resolve_labels(self, column, labels):
+        """Fetch ids of `labels` in the default column of a dimension table.
+
+        Parameters
+        ----------
+        column : str
+            e.g. 'data_type_id'
+        labels : list-like
+            of str, unique
+
+        Returns
+        -------
+        res : pandas.Series
+            of ids, indexed by `labels`
+
+        """
+        key = column[:-3] if column.endswith("_id") else column
+        tbl = Table(key=key, schema=None, hangar=self._hangar)
+
+        qry = TableQuery(
+            "{} == {}".format(tbl._default_column, list(labels)))
+        found = tbl.filter(qry)[tbl._default_column]
+
+        if found.duplicated().any():
+            raise ValueError(("More than one rows are found in '{}' for " +
+                              "some of the labels; narrow down your search!")
+                             .format(key))
+
+        res = pd.Series(found.index, index=found.values)
+
+        missing = pd.Index(labels).difference(res.index)
+        if len(missing) > 0:
+            raise ValueError("The following labels are not in '{}': {}."
+                             .format(key, list(missing)))
+
+        return res
+
+    def _lookup(self, headers_int):
+        """Fetch ids of the headers in `headers_int` in one pass.
+
+        Parameters
+        ----------
+        headers_int : pandas.DataFrame
+            one header per row, columned with required columns
+
+        Returns
+        -------
+        res : pandas.Series
+            of ids, NaN where a header is not in the db, indexed as
+            `headers_int`
+
+        """
+        stored = self._select_candidates(headers_int)
 
-        return info_series_int
+        stored_idx = pd.MultiIndex.from_frame(stored)
+        if not stored_idx.is_unique:
+            raise ValueError("More than one rows are found with these " +
+                             "criteria; narrow down your search!")
+
+        pos = stored_idx.get_indexer(pd.MultiIndex.from_frame(headers_int))
+
+        res = pd.Series(stored.index[pos], index=headers_int.index) \
+            .where(pos > -1)
+
+        if res.notnull().all():
+            res = res.astype(np.int64)
+
+        return res
 
 
 class TSHeader(Table):
     """
     """
-    def __init__(self):
+    def __init__(self, hangar=None):
         """
         """
-        schema = {
-            "required_columns": ("concept_header_id", "data_version_id"),
-            "default_column": "concept_header_id"
-        }
+        schema = SCHEMAS["ts_header"]
 
-        super(TSHeader, self).__init__(key="ts_header", schema=schema)
+        super(TSHeader, self).__init__(key="ts_header", schema=schema,
+                                       hangar=hangar)
 
     def add_new(self, new):
         """
@@ -563,79 +1224,1083 @@ class TSHeader(Table):
             new.loc[:, "data_version_id"] = np.nan
 
         # add data versions if needed
+        data_version = DataVersion(hangar=self._hangar)
         for t, row in new.dropna(subset=["data_version_id"]).iterrows():
             new.loc[t, "data_version_id"] = \
-                DataVersion().add_quick(row.loc["concept_header_id"])[0]
+                data_version.add_quick(row.loc["concept_header_id"])[0]
 
         # add rows thorough super
         super(TSHeader, self).add_new(new)
 
-    def get_id(self, info, create=False):
+    @traced
+    def get_id(self, info, create=False, version="default"):
         """Fetch integer ts header ids based on query in `info`.
 
+        Concept headers are resolved as in ConceptHeader.get_id(), their
+        versions in bulk by DataVersion.resolve().
+
         Parameters
         ----------
         info : pandas.Series, pandas.DataFrame or dict
+            as in ConceptHeader.get_id(); an optional 'data_version_id'
+            entry pins the version (id or description) of a header
         create : bool
-            True to create a Header if not found
+            True to create a concept header if not found
+        version : str or int
+            'default' or 'newest' (see DataVersion.resolve()) for headers
+            without a 'data_version_id'; otherwise the version id or
+            description to pin all of them to
 
         Returns
         -------
         res : int or pandas.Series
+            int (or [] if not found) for one header; otherwise a Series of
+            ids with NaN where no header was found
 
         """
         # to ndframe
-        info_ndframe = self._coerce_to_ndframe(info)
+        info_ndframe = ConceptHeader._coerce_to_ndframe(info)
 
+        # one header per row
+        if isinstance(info_ndframe, pd.Series):
+            headers = info_ndframe.to_frame().T
+        else:
+            headers = info_ndframe.T
 
+        concept = ConceptHeader(hangar=self._hangar).get_id(
+            headers.drop(columns="data_version_id", errors="ignore").T,
+            create=create)
 
-class Timeseries(Table):
-    """Time series representation."""
+        # pinned per header, or by `version`
+        if version in ("default", "newest"):
+            pinned = pd.Series(np.nan, index=headers.index, dtype=object)
+        else:
+            pinned = pd.Series(version, index=headers.index, dtype=object)
 
-    def __init__(self):
-        """
-        """
-        schema = {
-            "required_columns": ("header_id", "obs_date", "obs_value", ),
-            "optional_columns": ("date_inserted", ),
-            "default_column": "header_id"
-        }
+        if "data_version_id" in headers.columns:
+            pinned = headers["data_version_id"].astype(object) \
+                .where(headers["data_version_id"].notnull(), pinned)
 
-        super(Timeseries, self).__init__(key="timeseries", schema=schema)
+        res = pd.Series(np.nan, index=headers.index)
+        found = concept.notnull()
 
-    def save(self, data):
-        """
-        """
-        pass
+        data_version = DataVersion(hangar=self._hangar)
+        is_pinned = pinned.notnull() & found
+        if is_pinned.any():
+            res[is_pinned] = data_version.resolve(
+                concept[is_pinned].astype(np.int64), "pinned",
+                pinned[is_pinned]).values
 
-    def get_data(self, header, date_from=None, date_to=None):
-        """Load data based on header and dates."""
-        cond_header = "index == {}".format(list(header.values))
-        cond_date = ("obs_date >= Timestamp('{}') and " +
-                     "obs_date <= Timestamp('{}')").format(date_from, date_to)
+        rest = ~pinned.notnull() & found
+        if rest.any():
+            res[rest] = data_version.resolve(
+                concept[rest].astype(np.int64), version).values
 
-        query = TableQuery(cond_header).and_(TableQuery(cond_date))
+        if isinstance(info_ndframe, pd.Series):
+            return [] if res.isnull().iloc[0] else int(res.iloc[0])
 
-        # call to db
-        res = self.filter(query)
+        if res.notnull().all():
+            res = res.astype(np.int64)
 
         return res
 
 
-class Column:
-    """
-    """
-    def __init__(self, name, table):
-        """
-        """
-        self.table = table
-        self.name = name
 
-    def _operator_generator(self, expr):
-        """
+def period_end(dates, freq):
+    """Label of the period of frequency `freq` each of `dates` falls in.
 
-        Parameters
-        ----------
+    Labels are those of `resample(freq)`: the end of the period, closed on
+    the right; `freq` is anchored at period ends, e.g. 'W', 'ME' or 'QE'.
+
+    Parameters
+    ----------
+    dates : list-like
+        of datetime
+    freq : str
+
+    Returns
+    -------
+    res : pandas.DatetimeIndex
+
+    """
+    # intraday times belong to the period of their day
+    res = pd.DatetimeIndex(dates).normalize() + to_offset(freq) * 0
+
+    return res
+
+
+@functools.lru_cache(maxsize=None)
+def nests(fine, coarse):
+    """Whether every period of frequency `fine` lies within one of `coarse`.
+
+    If so, the last values over `coarse` are the last of those over `fine`.
+    Checked on every day of four years, which covers how weeks, months,
+    quarters and years fall relative to one another.
+
+    Parameters
+    ----------
+    fine : str
+        anchored at period ends, as in `period_end()`
+    coarse : str
+        any frequency `resample()` takes
+
+    Returns
+    -------
+    bool
+
+    """
+    days = pd.date_range("2000-01-01", "2003-12-31", freq='D')
+
+    try:
+        coarse_group = pd.Series(0, index=days) \
+            .groupby(pd.Grouper(freq=coarse)).ngroup()
+    except ValueError:
+        return False
+
+    res = coarse_group.groupby(period_end(days, fine)).nunique().max() == 1
+
+    return bool(res)
+
+
+class Timeseries(Table):
+    """Time series representation.
+
+    Observations live either in one flat table ('flat' layout) or are
+    partitioned into separate nodes, one per header ('header' layout) or one
+    per bucket of hashed headers ('bucket' layout), so that fetching one
+    series touches only its own partition. The layout is stored in the
+    root node attributes; see `migrate_layout()`.
+
+    Alongside, the last value of every closed week, month and quarter is
+    kept in rollup tables, updated by the saves closing them, from which
+    requests for data of a lower frequency are served; see `get_rollup()`.
+    """
+    # prefix of the partition nodes
+    partition_key = "timeseries_part"
+
+    # frequencies of rollups kept by new tables, finest first
+    rollup_freqs = ("W", "ME", "QE")
+
+    def __init__(self, mmap_store=None, hangar=None):
+        """
+        """
+        schema = SCHEMAS["timeseries"]
+
+        super(Timeseries, self).__init__(key="timeseries", schema=schema,
+                                         hangar=hangar)
+
+        self._layout = None
+
+        # read-optimized copy of hot series, see MmapStore
+        self.mmap_store = mmap_store
+
+    @property
+    def layout(self):
+        """dict: storage layout, with 'kind' and, for buckets, 'n_buckets'.
+        """
+        if self._layout is None:
+            self._layout = self.hangar.get_attrs(self.key + "_layout",
+                                                 default={"kind": "flat"})
+        return self._layout
+
+    def _node_key(self, header_id):
+        """Key of the node storing observations of `header_id`.
+
+        Parameters
+        ----------
+        header_id : int or numpy.ndarray
+
+        Returns
+        -------
+        res : str or numpy.ndarray
+
+        """
+        kind = self.layout["kind"]
+        header_id = np.asarray(header_id, dtype=np.int64)
+
+        if kind == "flat":
+            res = np.full(header_id.shape, self.key, dtype=object)
+        elif kind == "header":
+            res = np.array(["{}/h{:d}".format(self.partition_key, x)
+                            for x in header_id.flat], dtype=object)
+        elif kind == "bucket":
+            bucket = header_id % self.layout["n_buckets"]
+            res = np.array(["{}/b{:d}".format(self.partition_key, x)
+                            for x in bucket.flat], dtype=object)
+        else:
+            raise ValueError("Unknown layout '{}'!".format(kind))
+
+        return res.reshape(header_id.shape) if res.ndim > 0 else str(res)
+
+    def _nodes(self):
+        """Keys of all existing nodes of the current layout."""
+        if self.layout["kind"] == "flat":
+            return [self.key] if self.key in self.hangar else []
+
+        prefix = "/" + self.partition_key + "/"
+
+        return [k[1:] for k in self.hangar.keys() if k.startswith(prefix)]
+
+    def _route(self, header_id):
+        """Group header ids by the node storing them.
+
+        Parameters
+        ----------
+        header_id : list-like
+            of int
+
+        Returns
+        -------
+        res : dict
+            {node key: numpy.ndarray of header ids}
+
+        """
+        header_id = pd.unique(np.asarray(header_id, dtype=np.int64))
+
+        if len(header_id) < 1:
+            return dict()
+
+        nodes = pd.Series(self._node_key(header_id), index=header_id)
+
+        res = {k: v.index.values for k, v in nodes.groupby(nodes)}
+
+        return res
+
+    def _append_bulk(self, key, df, chunksize):
+        """Append `df` to node `key` in chunks, with indexing deferred.
+        """
+        for p in range(0, len(df), chunksize):
+            self.hangar.append(key, df.iloc[p:(p + chunksize)],
+                               format="table", data_columns=True,
+                               index=False, expectedrows=len(df))
+
+    @traced
+    def save(self, data, chunksize=500000, value_dtype="float64"):
+        """Append observations in bulk.
+
+        Rows are sorted by ('header_id', 'obs_date') and cast to compact
+        dtypes (those of the stored table if it exists), then appended in
+        chunks. Indexes of tables the save is large next to are rebuilt once
+        at the end; those of others are extended by the rows appended, so
+        that small saves cost in proportion to their size rather than to
+        that of the store (see `DataHangar.deferred_indexing()`). Rows are stamped with the time of insertion unless
+        'date_inserted' is given; observations saved before are never
+        overwritten, but revised (see `revised()`).
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            in long format, columned with 'header_id', 'obs_date',
+            'obs_value' and optionally 'date_inserted'; rows with missing
+            'obs_value' are dropped
+        chunksize : int
+            number of rows per append
+        value_dtype : str
+            dtype of 'obs_value' if the table is created by this call
+
+        Returns
+        -------
+        res : dict
+            with 'rows', 'seconds' and 'rows_per_sec'
+
+        """
+        t_start = time.perf_counter()
+
+        columns = [c for c in self._required_columns +
+                   self._optional_columns if c in data.columns]
+        df = data.loc[:, columns].dropna(subset=["obs_value"])
+
+        with self.hangar.deferred_indexing():
+            # compact dtypes; must match those stored, if any
+            dtypes = self._dtypes(value_dtype)
+
+            # (tables created before insertion dates were kept have none)
+            if ("date_inserted" in dtypes.index) and \
+                    ("date_inserted" not in df.columns):
+                df["date_inserted"] = pd.Timestamp.now()
+
+            df = df.astype(dtypes.reindex(df.columns).to_dict())
+
+            # as they were before this save
+            spans = self._spans(pd.unique(df["header_id"].values))
+
+            # tables created from now on keep rollups; older ones do once
+            #   built, see `build_rollups()`
+            if len(self._nodes()) < 1:
+                self.hangar.set_attrs(self.key + "_rollups",
+                                      list(self.rollup_freqs))
+
+            # clustered by series, which is how the data is read
+            df = df.sort_values(["header_id", "obs_date"], kind="mergesort")
+
+            # unique row ids, whatever the layout
+            df.index = self.hangar.reserve_ids(self.key, len(df))
+
+            nodes = self._node_key(df["header_id"].values) \
+                if len(df) > 0 else np.array([])
+            touched = pd.unique(nodes)
+
+            if len(touched) == 1:
+                self._append_bulk(touched[0], df, chunksize)
+            else:
+                for k, chunk in df.groupby(nodes, sort=False):
+                    self._append_bulk(k, chunk, chunksize)
+
+            # indexes are maintained once on exit, not after every chunk
+            for k in touched:
+                self.hangar.declare_index_columns(k, self._index_columns)
+
+            self._track_revisions(df, spans)
+
+            self._update_rollups(df, self.rollups(), spans)
+
+        seconds = time.perf_counter() - t_start
+
+        res = {"rows": len(df),
+               "seconds": seconds,
+               "rows_per_sec": len(df) / seconds if seconds > 0 else np.nan}
+
+        return res
+
+    def _dtypes(self, value_dtype="float64"):
+        """Dtypes of stored columns, or compact defaults for a new store.
+        """
+        stored = self._nodes()
+
+        if len(stored) > 0:
+            return self.hangar.select(stored[0], stop=0).dtypes
+
+        res = pd.Series({"header_id": np.int32,
+                         "obs_date": "datetime64[ns]",
+                         "obs_value": value_dtype,
+                         "date_inserted": "datetime64[ns]"})
+
+        return res
+
+    def revised(self):
+        """Ids of headers some observations of which were saved again.
+
+        Only for these can a (header, date) have several stored values,
+        the latest of which is returned by reads; the others are read as
+        they are.
+
+        Returns
+        -------
+        res : numpy.ndarray
+
+        """
+        key = self.key + "_revised"
+
+        if key not in self.hangar:
+            return np.array([], dtype=np.int64)
+
+        res = self.hangar.select_column(key, "header_id").values
+
+        return res
+
+    def _spans(self, header_id):
+        """First and last date saved of every header in `header_id`.
+
+        Spans are kept in an append-only table, one row per header and
+        save; observations saved before it existed are scanned once. The
+        rows of `header_id` are looked up by the index on 'header_id', as
+        ranges where the ids run, so that the cost grows with the saves of
+        these headers rather than with the table; many scattered ids are
+        fetched by row coordinates.
+
+        Parameters
+        ----------
+        header_id : numpy.ndarray
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            indexed by header id, columned with 'date_from' and 'date_to'
+
+        """
+        key = self.key + "_batches"
+
+        if (key not in self.hangar) and (len(self._nodes()) > 0):
+            for k in self._nodes():
+                stored = pd.DataFrame({
+                    "header_id": self.hangar.select_column(
+                        k, "header_id").values,
+                    "obs_date": self.hangar.select_column(
+                        k, "obs_date").values})
+                self._append_spans(stored)
+
+        if key not in self.hangar:
+            return pd.DataFrame(
+                {"date_from": pd.Series(dtype="datetime64[ns]"),
+                 "date_to": pd.Series(dtype="datetime64[ns]")},
+                index=pd.Index([], dtype=np.int64, name="header_id"))
+
+        node = encode_ids("header_id", header_id,
+                          max_terms=self.max_literals)
+
+        if isinstance(node, In) and (len(node.values) > self.max_literals):
+            res = self.hangar.select_isin(key, "header_id", node.values)
+        else:
+            res = self.hangar.select(key, where=str(node))
+
+        res = res.groupby("header_id") \
+            .agg({"date_from": "min", "date_to": "max"})
+
+        return res
+
+    def _append_spans(self, df):
+        """Record the span of dates of every header in `df`."""
+        spans = df.groupby("header_id")["obs_date"].agg(["min", "max"])
+
+        batch = pd.DataFrame({
+            "header_id": spans.index.values.astype(np.int64),
+            "date_from": spans["min"].values,
+            "date_to": spans["max"].values})
+
+        key = self.key + "_batches"
+        batch.index = self.hangar.reserve_ids(key, len(batch))
+
+        self.hangar.append(key, batch, format="table", data_columns=True)
+
+    def _track_revisions(self, df, spans):
+        """Record the spans of dates in `df`; flag headers saved over.
+
+        Headers whose new observations fall within the span of those saved
+        before, or with several values of one date in `df`, are flagged as
+        revised; of the latter, the one given last is read (see
+        `_latest()`). Spans are conservative: filling a gap in a series
+        flags it too, which costs a deduplication on read, never a wrong
+        result.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            as appended by `save()`
+        spans : pandas.DataFrame
+            as returned by `_spans()` before `df` was appended
+
+        """
+        if len(df) < 1:
+            return
+
+        new = df.groupby("header_id")["obs_date"].agg(["min", "max"])
+        new.index = new.index.astype(np.int64)
+
+        old = spans.reindex(new.index)
+
+        # NaT, for headers never saved before, compares False
+        overlap = (old["date_from"] <= new["max"]) & \
+            (old["date_to"] >= new["min"])
+
+        # sorted by (header, date) in `save()`: repeats are adjacent
+        repeated = df["header_id"].values[
+            df.duplicated(["header_id", "obs_date"]).values]
+
+        revised = np.setdiff1d(
+            np.union1d(new.index[overlap.values], repeated.astype(np.int64)),
+            self.revised())
+
+        if len(revised) > 0:
+            key = self.key + "_revised"
+            flagged = pd.DataFrame({"header_id": revised},
+                                   index=self.hangar.reserve_ids(
+                                       key, len(revised)))
+            self.hangar.append(key, flagged, format="table",
+                               data_columns=True)
+
+        self._append_spans(df)
+
+    def rollups(self):
+        """Frequencies of the rollups kept up to date.
+
+        Returns
+        -------
+        res : list
+            of str, finest first
+
+        """
+        res = self.hangar.get_attrs(self.key + "_rollups", default=[])
+
+        return list(res)
+
+    def _rollup_key(self, freq):
+        return "{}_rollup_{}".format(self.key, freq)
+
+    @staticmethod
+    def _period_last(df, freq):
+        """Last observation of every header and period of frequency `freq`.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            columned with 'header_id', 'obs_date' and 'obs_value', sorted by
+            the former two (revisions in the order of insertion)
+        freq : str
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            columned with 'header_id', 'obs_date' (the period end),
+            'obs_value' and 'source_date' (the date of the value)
+
+        """
+        res = pd.DataFrame({
+            "header_id": df["header_id"].values,
+            "obs_date": period_end(df["obs_date"].values, freq),
+            "obs_value": df["obs_value"].values,
+            "source_date": df["obs_date"].values})
+
+        return res.drop_duplicates(["header_id", "obs_date"], keep="last")
+
+    def _append_rollup(self, freq, rows):
+        key = self._rollup_key(freq)
+
+        rows = rows.copy()
+        rows.index = self.hangar.reserve_ids(key, len(rows))
+
+        self.hangar.append(key, rows, format="table", data_columns=True,
+                           index=False)
+        self.hangar.declare_index_columns(key, self._index_columns)
+
+    def _update_rollups(self, df, freqs, spans):
+        """Fold observations `df` into the rollups of frequencies `freqs`.
+
+        Only closed periods are kept, those followed by a later one with
+        data of the same header; the open period of every header is read
+        from the raw data (see `get_rollup()`). A save thus writes the
+        periods it closes, which for a series loaded day by day is one row
+        per period, and nothing while a period stays open.
+
+        Rows are appended, never updated: the last value of a closed
+        period is appended again only if revised, or if of a later date
+        than that stored, and reads take the latest row of every period.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            columned with 'header_id', 'obs_date' and 'obs_value', sorted by
+            the former two
+        freqs : list-like
+            of str
+        spans : pandas.DataFrame
+            dates saved of every header before `df`, see `_spans()`
+
+        """
+        if len(df) < 1:
+            return
+
+        # the last date saved before and after this save
+        prev_last = spans["date_to"].reindex(
+            pd.unique(df["header_id"].values))
+        last = df.groupby("header_id")["obs_date"].max() \
+            .reindex(prev_last.index)
+        last = last.where(~(prev_last > last), prev_last)
+
+        for freq in freqs:
+            key = self._rollup_key(freq)
+            new = self._period_last(df, freq)
+
+            # periods open before this save, and closed by it, whose last
+            #   value was saved before: read it back
+            was_open = pd.Series(period_end(prev_last.values, freq),
+                                 index=prev_last.index)
+            closed = prev_last.loc[
+                (was_open < period_end(last.values, freq)).values]
+
+            if len(closed) > 0:
+                known = new.set_index(["header_id", "obs_date"])["source_date"]
+                known = known.reindex(pd.MultiIndex.from_arrays(
+                    [closed.index.values, was_open.loc[closed.index].values]))
+                closed = closed.loc[~(known.values >= closed.values)]
+
+            if len(closed) > 0:
+                raw = self._read_long(closed.index.values, closed.min(),
+                                      closed.max())
+                raw = raw.loc[(raw["obs_date"].values == closed.reindex(
+                    raw["header_id"].values).values)]
+                raw = self._period_last(
+                    raw.sort_values(["header_id", "obs_date"],
+                                    kind="mergesort"), freq)
+
+                new = pd.concat((new, raw), axis=0) \
+                    .sort_values(["header_id", "obs_date", "source_date"],
+                                 kind="mergesort") \
+                    .drop_duplicates(["header_id", "obs_date"], keep="last")
+
+            # the open period of every header is left to the raw data
+            new = new.loc[(new["obs_date"].values < period_end(
+                last.reindex(new["header_id"].values).values, freq))]
+
+            if len(new) < 1:
+                continue
+
+            # periods stored already: from the first one touched on
+            if key in self.hangar:
+                stored = self.hangar.select(
+                    key, where="obs_date >= Timestamp('{}')"
+                    .format(new["obs_date"].min()),
+                    columns=["header_id", "obs_date", "source_date"])
+                stored = stored.loc[stored["header_id"].isin(
+                    new["header_id"].unique())]
+                stored = stored.sort_index() \
+                    .drop_duplicates(["header_id", "obs_date"], keep="last")
+
+                merged = new.merge(stored, on=["header_id", "obs_date"],
+                                   how="left", suffixes=("", "_stored"))
+                new = new.loc[~(merged["source_date_stored"] >
+                                merged["source_date"]).values]
+
+            self._append_rollup(freq, new)
+
+    @traced
+    def build_rollups(self, freqs=None, chunksize=1000000):
+        """Rebuild rollups from all observations stored.
+
+        Needed once for tables created before rollups were kept, and to
+        change the frequencies kept; also compacts them, as superseded
+        rows are not carried over.
+
+        Parameters
+        ----------
+        freqs : list-like or None
+            of str, finest first; None for `rollup_freqs`
+        chunksize : int
+            number of observations to read at once
+
+        Returns
+        -------
+        res : dict
+            with 'rows' read and 'seconds' taken
+
+        """
+        t_start = time.perf_counter()
+
+        freqs = list(self.rollup_freqs if freqs is None else freqs)
+        n_rows = 0
+
+        # {freq: last value of every header and period so far}
+        rows = {p: None for p in freqs}
+
+        with self.hangar.deferred_indexing():
+            for freq in set(self.rollups()) | set(freqs):
+                if self._rollup_key(freq) in self.hangar:
+                    self.hangar.remove(self._rollup_key(freq))
+
+            self.hangar.set_attrs(self.key + "_rollups", freqs)
+
+            for k in self._nodes():
+                for p in range(0, self.hangar.nrows(k), chunksize):
+                    # in the order of insertion, for revisions to win
+                    df = self.hangar.select(k, start=p, stop=p + chunksize) \
+                        .sort_index() \
+                        .sort_values(["header_id", "obs_date"],
+                                     kind="mergesort")
+
+                    for freq in freqs:
+                        rows[freq] = pd.concat(
+                            (rows[freq], self._period_last(df, freq)),
+                            axis=0) \
+                            .sort_values(["header_id", "obs_date",
+                                          "source_date"], kind="mergesort") \
+                            .drop_duplicates(["header_id", "obs_date"],
+                                             keep="last")
+
+                    n_rows += len(df)
+
+            for freq in freqs:
+                if rows[freq] is None:
+                    continue
+
+                # all but the open period of every header
+                newest = rows[freq].groupby("header_id")["obs_date"] \
+                    .transform("max")
+                closed = rows[freq].loc[rows[freq]["obs_date"] < newest]
+
+                if len(closed) > 0:
+                    self._append_rollup(freq, closed)
+
+        return {"rows": n_rows, "seconds": time.perf_counter() - t_start}
+
+    def _rollup_for(self, freq):
+        """Coarsest rollup from which data of frequency `freq` follows."""
+        for p in reversed(self.rollups()):
+            if nests(p, freq):
+                return p
+
+        return None
+
+    @traced
+    def get_rollup(self, header, freq, date_from=None, date_to=None):
+        """Last values per period, from the coarsest rollup serving `freq`.
+
+        Resampling the result to `freq` gives what resampling the raw data
+        does: values are of dates between `date_from` and `date_to`. The
+        periods after the last one of a header in the rollup, its open one
+        at least, are read from the raw data, as is the last period if it
+        ends after `date_to`.
+
+        Parameters
+        ----------
+        header : pandas.Series or list-like
+            of integer header ids
+        freq : str
+        date_from : str or pandas.Timestamp, optional
+        date_to : str or pandas.Timestamp, optional
+
+        Returns
+        -------
+        res : pandas.DataFrame or None
+            indexed by 'obs_date' (period ends), columned by header id (in
+            the order of `header`); None if no rollup serves `freq`
+
+        """
+        rollup = self._rollup_for(freq)
+
+        if rollup is None:
+            return None
+
+        header_id = pd.Series(header).values
+        unique = pd.unique(header_id).astype(np.int64)
+        columns = ["header_id", "obs_date", "obs_value", "source_date"]
+        key = self._rollup_key(rollup)
+
+        cond = ["header_id == {}".format(unique.tolist())]
+        if date_from is not None:
+            cond.append("obs_date >= Timestamp('{}')".format(date_from))
+        if date_to is not None:
+            cond.append("obs_date <= Timestamp('{}')".format(
+                period_end([date_to], rollup)[0]))
+
+        where = " & ".join("({})".format(c) for c in cond)
+
+        with self.hangar.session():
+            if key in self.hangar:
+                long = self.hangar.select(key, where=where, columns=columns)
+            else:
+                long = pd.DataFrame(columns=columns)
+
+            long = long.sort_index() \
+                .drop_duplicates(["header_id", "obs_date"], keep="last")
+
+            if date_from is not None:
+                long = long.loc[long["source_date"] >=
+                                pd.Timestamp(date_from)]
+
+            # the last period, cut short by `date_to`: from the raw data
+            if date_to is not None:
+                long = long.loc[long["source_date"] <= pd.Timestamp(date_to)]
+
+            # the first day after the periods in the rollup (periods are
+            #   made of whole days)
+            start = long.groupby("header_id")["obs_date"].max() \
+                .reindex(unique) + pd.Timedelta(days=1)
+            if date_from is not None:
+                start = start.fillna(pd.Timestamp(date_from)) \
+                    .clip(lower=pd.Timestamp(date_from))
+            if date_to is not None:
+                start = start.loc[~(start > pd.Timestamp(date_to))]
+
+            frames = [long.loc[:, columns[:3]]]
+
+            for lo, ids in start.groupby(start, dropna=False):
+                raw = self._read_long(ids.index.values,
+                                      None if pd.isnull(lo) else lo, date_to)
+                raw = raw.sort_values(["header_id", "obs_date"],
+                                      kind="mergesort")
+                frames.append(self._period_last(raw, rollup)
+                              .loc[:, columns[:3]])
+
+            long = pd.concat(frames, axis=0)
+
+        res = long.pivot(index="obs_date", columns="header_id",
+                         values="obs_value")
+        res = res.reindex(columns=header_id)
+
+        return res
+
+    def _set_layout(self, layout):
+        self.hangar.set_attrs(self.key + "_layout", layout)
+        self._layout = layout
+
+    @traced
+    def get_data(self, header, date_from=None, date_to=None, as_of=None):
+        """Load data based on header and dates.
+
+        Parameters
+        ----------
+        header : pandas.Series or list-like
+            of integer header ids
+        date_from : str or pandas.Timestamp, optional
+        date_to : str or pandas.Timestamp, optional
+        as_of : str or pandas.Timestamp, optional
+            to see the data as it was at this time: the latest value of
+            every observation inserted on or before it
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            indexed by 'obs_date', columned by header id (in the order of
+            `header`)
+
+        """
+        header_id = pd.Series(header).values
+
+        # the read-optimized copy holds the latest values only
+        if (self.mmap_store is not None) and (as_of is None):
+            hot = self.mmap_store.covers(header_id, self)
+        else:
+            hot = np.zeros(len(header_id), dtype=bool)
+
+        res = self._read_long(header_id[~hot], date_from, date_to,
+                              as_of=as_of)
+
+        res = res.pivot(index="obs_date", columns="header_id",
+                        values="obs_value")
+
+        if hot.any():
+            res_hot = self.mmap_store.get_data(header_id[hot], date_from,
+                                               date_to)
+            res = pd.concat((res, res_hot), axis=1).sort_index()
+            res.index.name = "obs_date"
+
+        res = res.reindex(columns=header_id)
+
+        return res
+
+    def version(self):
+        """Number of observations ever saved; changes with every save."""
+        res = self.hangar.get_attrs("id_sequences", default={}) \
+            .get(self.key, 0)
+
+        return res
+
+    def saves(self):
+        """Number of spans recorded, one per header and save, see `_spans()`.
+        """
+        res = self.hangar.get_attrs("id_sequences", default={}) \
+            .get(self.key + "_batches", 0)
+
+        return res
+
+    def saved_since(self, saves):
+        """Ids of headers saved to since `saves()` returned `saves`.
+
+        Read from the spans recorded since, by the index on their row ids.
+
+        Parameters
+        ----------
+        saves : int
+
+        Returns
+        -------
+        res : numpy.ndarray
+
+        """
+        key = self.key + "_batches"
+
+        if key not in self.hangar:
+            return np.array([], dtype=np.int64)
+
+        res = self.hangar.select(key, where="index >= {}".format(int(saves)),
+                                 columns=["header_id"])
+
+        return np.unique(res["header_id"].values)
+
+    @traced
+    def header_ids(self):
+        """Ids of all headers with observations stored.
+
+        Returns
+        -------
+        res : numpy.ndarray
+
+        """
+        with self.hangar.session():
+            res = [self.hangar.select_column(k, "header_id").unique()
+                   for k in self._nodes()]
+
+        if len(res) < 1:
+            return np.array([], dtype=np.int64)
+
+        return np.unique(np.concatenate(res))
+
+    @traced
+    def _read_long(self, header_id, date_from=None, date_to=None,
+                   as_of=None):
+        """Load observations in long format from the relevant nodes.
+
+        Of several values stored for one (header, date), only the latest
+        inserted (on or before `as_of`, if given) is kept. This takes a
+        sort of the rows of revised headers only (see `revised()`); the
+        others have one value per date and are read as they are. Reads as
+        of a date read 'date_inserted' too, but the same rows.
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            columned with 'header_id', 'obs_date' and 'obs_value'
+
+        """
+        columns = ["header_id", "obs_date", "obs_value"]
+
+        cond_date = []
+        if date_from is not None:
+            cond_date.append("obs_date >= Timestamp('{}')".format(date_from))
+        if date_to is not None:
+            cond_date.append("obs_date <= Timestamp('{}')".format(date_to))
+
+        chunks = []
+
+        with self.hangar.session():
+            revised = self.revised()
+            is_revised = np.isin(header_id, revised).any()
+
+            stamped = (is_revised or (as_of is not None)) and \
+                ("date_inserted" in self._dtypes().index)
+
+            if (as_of is not None) and not stamped:
+                raise ValueError("No insertion dates are stored; " +
+                                 "cannot read data as of a date!")
+
+            to_read = columns + ["date_inserted"] if stamped else columns
+
+            for k, ids in self._route(header_id).items():
+                if k not in self.hangar:
+                    continue
+
+                # a per-header partition holds one series only
+                if self.layout["kind"] == "header":
+                    cond = cond_date
+                else:
+                    cond = ["header_id == {}".format(ids.tolist())] + \
+                        cond_date
+
+                where = " & ".join("({})".format(c) for c in cond) or None
+
+                chunks.append(self.hangar.select(k, where=where,
+                                                 columns=to_read))
+
+        if len(chunks) < 1:
+            return pd.DataFrame(columns=columns)
+
+        res = pd.concat(chunks, axis=0)
+
+        # filtered here rather than in `where`: 'date_inserted' has no
+        #   index, and a condition on it turns the read into a full scan
+        if as_of is not None:
+            res = res.loc[res["date_inserted"] <= pd.Timestamp(as_of)]
+
+        if is_revised:
+            res = self._latest(res, revised)
+
+        res = res.loc[:, columns]
+
+        return res
+
+    @staticmethod
+    def _latest(long, revised):
+        """Keep the latest value of every (header, date) of `revised`.
+
+        Values are ordered by 'date_inserted' if there is one, and by row
+        id, which grows with every save, otherwise and on ties.
+        """
+        mask = long["header_id"].isin(revised).values
+
+        latest = long.loc[mask].sort_index(kind="mergesort")
+        if "date_inserted" in latest.columns:
+            latest = latest.sort_values("date_inserted", kind="mergesort")
+
+        latest = latest.drop_duplicates(["header_id", "obs_date"],
+                                        keep="last")
+
+        res = pd.concat((long.loc[~mask], latest), axis=0)
+
+        return res
+
+    @traced
+    def migrate_layout(self, kind="bucket", n_buckets=64, chunksize=1000000):
+        """Move all observations to a different storage layout.
+
+        The nodes of the old layout are removed afterwards. Migrating to
+        the current layout does nothing.
+
+        Parameters
+        ----------
+        kind : str
+            'flat', 'header' or 'bucket'
+        n_buckets : int
+            number of buckets, for kind 'bucket'
+        chunksize : int
+            number of rows to move at once
+
+        Returns
+        -------
+        res : dict
+            with 'rows' moved and 'seconds' taken
+
+        """
+        t_start = time.perf_counter()
+
+        new_layout = {"kind": kind}
+        if kind == "bucket":
+            new_layout["n_buckets"] = n_buckets
+
+        # nodes would be appended to, then removed
+        if new_layout == self.layout:
+            return {"rows": 0, "seconds": time.perf_counter() - t_start}
+
+        if (kind != "flat") and (self.layout["kind"] != "flat"):
+            raise ValueError("Partitioned layouts share node keys; " +
+                             "migrate to 'flat' first!")
+
+        new = Timeseries(hangar=self._hangar)
+        new._layout = new_layout
+
+        n_rows = 0
+
+        with self.hangar.deferred_indexing():
+            # make sure the id sequence outlives the flat table
+            self.hangar.reserve_ids(self.key, 0)
+
+            source = self._nodes()
+            touched = set()
+
+            for src in source:
+                for p in range(0, self.hangar.nrows(src), chunksize):
+                    df = self.hangar.select(src, start=p, stop=p + chunksize)
+                    nodes = new._node_key(df["header_id"].values)
+
+                    for k, chunk in df.groupby(nodes, sort=False):
+                        new._append_bulk(k, chunk, chunksize)
+                        touched.add(k)
+
+                    n_rows += len(df)
+
+            for k in touched:
+                self.hangar.declare_index_columns(k, self._index_columns)
+
+            for src in source:
+                self.hangar.remove(src)
+
+            self._set_layout(new_layout)
+
+        return {"rows": n_rows, "seconds": time.perf_counter() - t_start}
+
+
+class Column:
+    """
+    """
+    def __init__(self, name, table):
+        """
+        """
+        self.table = table
+        self.name = name
+
+    def _operator_generator(self, expr):
+        """
+
+        Parameters
+        ----------
         expr
 
         Returns
@@ -650,6 +2315,7 @@ class Column:
 
         return res
 
+    @traced
     def __lt__(self, other):
         """
         Returns a TableQuery by comparing the values in column of `self` to
@@ -673,6 +2339,7 @@ class Column:
 
         return res
 
+    @traced
     def __eq__(self, other):
         """
         Returns a TableQuery by comparing the default columns of `self` to
@@ -695,6 +2362,7 @@ class Column:
 
         return res
 
+    @traced
     def __gt__(self, other):
         """
         Returns a TableQuery by comparing the default columns of `self` to
@@ -717,6 +2385,7 @@ class Column:
 
         return res
 
+    @traced
     def like(self, other):
         """
         Parameters
@@ -724,20 +2393,29 @@ class Column:
         other : any
             of stuff
 
-        Unlike other operators, this one first fetches the whole table from
-        the store, so beware of memory issues!
+        Indexed string columns (see `Table.string_index()`) are searched in
+        their n-gram index; for others, the whole table is fetched from the
+        store, so beware of memory issues!
         """
-        # fetch the whole table (assuming it is not too large)
-        tbl = hangar.get(self.table.key)
+        index = self.table.string_index(self.name)
+
+        if index is not None:
+            idx = index.contains(other)
+        else:
+            # fetch the whole table (assuming it is not too large)
+            tbl = self.table._cached_frame()
+            if tbl is None:
+                tbl = self.table.hangar.get(self.table.key)
 
-        # get index of rows where `query` is fulfilled
-        idx = tbl.loc[tbl[self.name].str.contains(other), :].index
+            # get index of rows where `query` is fulfilled
+            idx = tbl.loc[tbl[self.name].str.contains(other), :].index
 
         # wrap it in a TableQuery
         res = self.table.construct_query_by_id(idx)
 
         return res
 
+    @traced
     def in_(self, other):
         """
 
@@ -745,15 +2423,23 @@ class Column:
         ----------
         other : iterable
 
-        Unlike other operators, this one first fetches the whole table from
-        the store, so beware of memory issues!
+        Indexed string columns (see `Table.string_index()`) are looked up in
+        their sorted index; for others, the whole table is fetched from the
+        store, so beware of memory issues!
 
         """
-        # fetch the whole table (assuming it is not too large)
-        tbl = hangar.get(self.table.key)
+        index = self.table.string_index(self.name)
+
+        if index is not None:
+            idx = index.equal(other)
+        else:
+            # fetch the whole table (assuming it is not too large)
+            tbl = self.table._cached_frame()
+            if tbl is None:
+                tbl = self.table.hangar.get(self.table.key)
 
-        # query
-        idx = tbl.loc[tbl[self.name].isin(other), :].index
+            # query
+            idx = tbl.loc[tbl[self.name].isin(other), :].index
 
         # wrap in a TableQuery
         res = self.table.construct_query_by_id(idx)
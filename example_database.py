@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 import pandas as pd
 import numpy as np
 from datadough.hangar import DataHangar
@@ -5,9 +8,25 @@ from datadough.engine import *
 from datadough.query import TableQuery
 
 
-def create_example_database():
+def create_example_database(path=None):
     """
+
+    Parameters
+    ----------
+    path : str or None
+        of the store to create; None for 'temp_hdf.h5' in the temporary
+        directory of the system. For stores of any size, see
+        `datadough.synthetic.generate()`.
+
+    Returns
+    -------
+    str
+        the path
+
     """
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), "temp_hdf.h5")
+
     # data object -----------------------------------------------------------
     data_object = pd.DataFrame(
         {
@@ -68,7 +87,7 @@ def create_example_database():
                               index=[0, ])
 
     # populate
-    with pd.HDFStore("c:/temp/temp_hdf.h5", mode='w') as hangar:
+    with pd.HDFStore(path, mode='w') as hangar:
         # tables ------------------------------------------------------------
         # columns=True ensures that columns are indexed and can be used in
         #   select expressions
@@ -120,9 +139,10 @@ def create_example_database():
             "default_column": "header_id",
         }
 
+    # completely sorted indexes on all queryable columns
+    DataHangar(path).rebuild_indexes()
 
-        # for k in hangar.keys():
-        #     hangar.create_table_index(k, columns=hangar, kind="full")
+    return path
 
 
 def upload_rows():
@@ -1,20 +1,397 @@
+import os
+import abc
+import argparse
+import threading
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
 
+from datadough import instrument
+
 
 class DataHangar(object):
-    """Implement context managers for a bunch of pandas.HDFStore methods.
+    """Store holding the tables, with a pluggable backend.
+
+    The backend is picked by the constructor; everything else goes through
+    the interface of `Backend`, which is what `Table` and `Timeseries` use.
 
     Parameters
     ----------
     path_to_hdf : str
-        path to the hdf storage
+        path to the hdf storage, or to the root directory of the parquet
+        dataset
+    keep_open : bool
+        True to reuse a read-only handle across calls (hdf only)
+    backend : str or Backend
+        'hdf' or 'parquet', or an instance of a Backend subclass
 
     """
+    def __init__(self, path_to_hdf, keep_open=False, backend="hdf"):
+        """
+        """
+        if backend == "hdf":
+            backend = HDFBackend(path_to_hdf, keep_open=keep_open)
+        elif backend == "parquet":
+            # optional dependency: pyarrow
+            from datadough.parquet import ParquetBackend
+            backend = ParquetBackend(path_to_hdf)
+        elif not isinstance(backend, Backend):
+            raise ValueError("Unknown backend '{}'!".format(backend))
+
+        self.backend = backend
+
+    def __getattr__(self, item):
+        # avoid infinite recursion before `backend` is set (e.g. unpickling)
+        if item == "backend":
+            raise AttributeError(item)
+
+        res = getattr(self.backend, item)
+
+        if (instrument.recorder is not None) and \
+                (item in instrument.STORE_CALLS):
+            res = instrument.wrap(res, item)
+
+        return res
+
+    def __contains__(self, key):
+        return key in self.backend
+
+    def __enter__(self):
+        self.backend.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.backend.__exit__(exc_type, exc_val, exc_tb)
+
+
+class Backend(abc.ABC):
+    """Interface of a store backend.
+
+    Subclasses must implement `select`, `select_column`, `get`, `append`,
+    `nrows`, `keys`, `remove`, `get_attrs`, `set_attrs` and `__contains__`
+    with the semantics of their pandas.HDFStore namesakes: tables are
+    addressed by key, rows are indexed by integer ids and `where` is a
+    pytables-like expression. Sessions and index management default to
+    no-ops.
+
+    Parameters
+    ----------
+    path_to_hdf : str
+        location of the store
+
+    """
+    # value of arg `backend` of DataHangar creating this kind of backend
+    name = None
+
     def __init__(self, path_to_hdf):
         """
         """
         self.path_to_hdf = path_to_hdf
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    @property
+    def is_open(self):
+        return False
+
+    @contextmanager
+    def session(self):
+        """Group many operations together."""
+        with self:
+            yield self
+
+    @contextmanager
+    def deferred_indexing(self):
+        """Defer index maintenance of appended-to tables to the exit."""
+        with self.session():
+            yield self
+
+    def close(self):
+        pass
+
+    @abc.abstractmethod
+    def select(self, key, where=None, columns=None, start=None, stop=None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def select_column(self, key, column):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get(self, key):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def append(self, key, value, **kwargs):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def nrows(self, key):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def keys(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def remove(self, key):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_attrs(self, key, default=None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_attrs(self, key, value):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def __contains__(self, key):
+        raise NotImplementedError
+
+    def reserve_ids(self, key, n):
+        """Reserve `n` consecutive row ids of table `key`.
+
+        Sequences live in the 'id_sequences' root attribute, so that this
+        is O(1); the sequence of a table which has none yet starts after the
+        largest id stored (found with one scan of its index).
+
+        Parameters
+        ----------
+        key : str
+        n : int
+
+        Returns
+        -------
+        res : pandas.RangeIndex
+
+        """
+        with self.session():
+            sequences = dict(self.get_attrs("id_sequences", default={}))
+
+            if key not in sequences:
+                if (key in self) and (self.nrows(key) > 0):
+                    sequences[key] = int(
+                        self.select_column(key, "index").max()) + 1
+                else:
+                    sequences[key] = 0
+
+            start = sequences[key]
+            sequences[key] = start + n
+
+            self.set_attrs("id_sequences", sequences)
+
+        return pd.RangeIndex(start, start + n)
+
+    def select_isin(self, key, column, values, columns=None):
+        """Read rows of table `key` whose `column` takes one of `values`.
+
+        Meant for value lists too long for a `where` expression.
+
+        Parameters
+        ----------
+        key : str
+        column : str
+            'index' for row ids
+        values : list-like
+        columns : list-like or None
+            columns to return, None for all
+
+        Returns
+        -------
+        res : pandas.DataFrame
+
+        """
+        res = self.select(key)
+
+        if column == "index":
+            res = res.loc[res.index.isin(values)]
+        else:
+            res = res.loc[res[column].isin(values)]
+
+        if columns is not None:
+            res = res.loc[:, list(columns)]
+
+        return res
+
+    def declare_index_columns(self, key, columns):
+        pass
+
+    def create_index(self, key, columns=None):
+        pass
+
+    def verify_indexes(self, keys=None):
+        return pd.DataFrame(
+            columns=["key", "column", "indexed", "csi", "dirty", "ok"]) \
+            .set_index(["key", "column"])
+
+    def rebuild_indexes(self, keys=None, force=False):
+        return self.verify_indexes(keys)
+
+
+class HDFBackend(Backend):
+    """Implement context managers for a bunch of pandas.HDFStore methods.
+
+    By default every call opens and closes its own pandas.HDFStore. With
+    `keep_open=True` reads go through one long-lived read-only handle, which
+    is closed before each write and lazily reopened on the next read (also
+    when the file has been modified by another process in the meantime).
+    Many operations can be grouped on one handle with `session()`.
+
+    Parameters
+    ----------
+    path_to_hdf : str
+        path to the hdf storage
+    keep_open : bool
+        True to reuse a read-only handle across calls
+
+    """
+    name = "hdf"
+
+    # within `deferred_indexing()`, appends of fewer rows than this fraction
+    #   of the table are indexed as they come instead of deferred
+    defer_ratio = 0.1
+
+    def __init__(self, path_to_hdf, keep_open=False):
+        """
+        """
+        super(HDFBackend, self).__init__(path_to_hdf)
+
+        self.keep_open = keep_open
+
+        # the shared handle, its mode and the file mtime when it was opened
+        self._handle = None
+        self._handle_mode = None
+        self._handle_mtime = None
+
+        # number of nested sessions currently open
+        self._session_depth = 0
+
+        # while indexing is deferred: {key: autoindex setting to restore,
+        #   None for tables indexed as appended to}
+        self._deferred = None
+
+        # pytables is not thread-safe: one thread at a time uses the store,
+        #   for a single operation or for a whole session
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._session_depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self._session_depth -= 1
+
+            if (self._session_depth < 1) and not self.keep_open:
+                self.close()
+
+        finally:
+            self._lock.release()
+
+    @property
+    def is_open(self):
+        return (self._handle is not None) and self._handle.is_open
+
+    @contextmanager
+    def session(self):
+        """Group many operations on one handle.
+
+        The handle is opened read-only and upgraded to mode 'a' on the first
+        write; it is closed when the outermost session exits, unless
+        `keep_open` is set.
+
+        Yields
+        ------
+        HDFBackend
+            self
+        """
+        with self:
+            yield self
+
+    def close(self):
+        """Close the shared handle, if any."""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+
+            self._handle = None
+            self._handle_mode = None
+            self._handle_mtime = None
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.path_to_hdf)
+        except OSError:
+            return None
+
+    def _shared_handle(self, mode):
+        """Return the shared handle, (re)opening it if needed.
+
+        Parameters
+        ----------
+        mode : str
+            'r' for reading, anything else for writing
+
+        Returns
+        -------
+        pandas.HDFStore
+
+        """
+        writable = mode != 'r'
+
+        if self.is_open:
+            if writable and (self._handle_mode == 'r'):
+                # upgrade: pytables refuses to open a file twice in
+                #   different modes
+                self.close()
+            elif (not writable) and (self._handle_mode == 'r') and \
+                    (self._mtime() != self._handle_mtime):
+                # modified elsewhere since opened: metadata may be stale
+                self.close()
+            else:
+                return self._handle
+
+        self._handle_mode = 'a' if writable else 'r'
+        self._handle = pd.HDFStore(self.path_to_hdf, mode=self._handle_mode)
+        self._handle_mtime = self._mtime()
+
+        return self._handle
+
+    @contextmanager
+    def _store(self, mode='r'):
+        """Yield a store to run one operation on.
+
+        Parameters
+        ----------
+        mode : str
+            'r' for reading, 'a' for writing
+
+        Yields
+        ------
+        pandas.HDFStore
+
+        """
+        with self._lock:
+            if self._session_depth > 0:
+                yield self._shared_handle(mode)
+
+            elif self.keep_open and (mode == 'r'):
+                yield self._shared_handle(mode)
+
+            else:
+                # a write outside of a session closes the long-lived reader,
+                #   which will be reopened on the next read
+                self.close()
+                with pd.HDFStore(self.path_to_hdf, mode=mode) as h:
+                    yield h
+
     def select_column(self, *args, **kwargs):
         """Wrapper for pandas.HDFStore.get.select_column.
 
@@ -28,7 +405,7 @@ class DataHangar(object):
         res
 
         """
-        with pd.HDFStore(self.path_to_hdf, mode='r') as h:
+        with self._store('r') as h:
             res = h.select_column(*args, **kwargs)
 
         return res
@@ -36,17 +413,353 @@ class DataHangar(object):
     def get(self, *args, **kwargs):
         """Wrapper for pandas.HDFStore.get.
         """
-        with pd.HDFStore(self.path_to_hdf, mode='r') as h:
+        with self._store('r') as h:
             return h.get(*args, **kwargs)
 
     def select(self, *args, **kwargs):
         """Wrapper for pandas.HDFStore.select.
         """
-        with pd.HDFStore(self.path_to_hdf, mode='r') as h:
+        with self._store('r') as h:
             return h.select(*args, **kwargs)
 
-    def append(self, *args, **kwargs):
+    def select_isin(self, key, column, values, columns=None):
+        """Read rows of table `key` whose `column` takes one of `values`.
+
+        Only `column` is scanned; matching rows are then fetched by their
+        coordinates, which pytables does not limit the number of.
+        """
+        with self._store('r') as h:
+            found = h.select_column(key, column).isin(values).values
+            coords = np.flatnonzero(found)
+
+            # no coordinates at all would select every row
+            if len(coords) < 1:
+                return h.select(key, start=0, stop=0, columns=columns)
+
+            return h.select(key, where=coords, columns=columns)
+
+    def append(self, key, value, **kwargs):
         """Wrapper for pandas.HDFStore.append.
+
+        Within `deferred_indexing()`, indexes of `key` are not updated if
+        the first append to it is large next to the table (at least
+        `defer_ratio` times its number of rows): they are rebuilt on exit.
+        Smaller appends are added to the indexes as they come, which costs
+        in proportion to the rows appended rather than to the table.
+        """
+        with self._store('a') as h:
+            if self._deferred is None:
+                return h.append(key, value, **kwargs)
+
+            if key not in self._deferred:
+                table = h.get_storer(key).table if key in h else None
+
+                if table is None:
+                    self._deferred[key] = True
+                elif len(value) >= self.defer_ratio * table.nrows:
+                    self._deferred[key] = table.autoindex
+                    table.autoindex = False
+                else:
+                    # indexed as appended, nothing to restore
+                    self._deferred[key] = None
+
+            kwargs["index"] = False
+            res = h.append(key, value, **kwargs)
+
+            if self._deferred[key] is not None:
+                h.get_storer(key).table.autoindex = False
+
+            return res
+
+    def create_table_index(self, *args, **kwargs):
+        """Wrapper for pandas.HDFStore.create_table_index.
+        """
+        with self._store('a') as h:
+            return h.create_table_index(*args, **kwargs)
+
+    def __contains__(self, key):
+        if not (self.is_open or os.path.exists(self.path_to_hdf)):
+            return False
+
+        with self._store('r') as h:
+            return key in h
+
+    def keys(self):
+        """Wrapper for pandas.HDFStore.keys.
+        """
+        if not (self.is_open or os.path.exists(self.path_to_hdf)):
+            return []
+
+        with self._store('r') as h:
+            return h.keys()
+
+    def remove(self, *args, **kwargs):
+        """Wrapper for pandas.HDFStore.remove.
+        """
+        with self._store('a') as h:
+            return h.remove(*args, **kwargs)
+
+    def get_attrs(self, key, default=None):
+        """Fetch the schema stored for `key` in the root node attributes.
+
+        Parameters
+        ----------
+        key : str
+        default : any
+            returned if there is no such attribute; if None, a missing
+            attribute is an error
+
+        Returns
+        -------
+        dict
+
+        """
+        if (default is not None) and not os.path.exists(self.path_to_hdf):
+            return default
+
+        with self._store('r') as h:
+            if (default is not None) and (key not in h.root._v_attrs):
+                return default
+            return h.root._v_attrs[key]
+
+    def set_attrs(self, key, value):
+        """Store `value` under `key` in the root node attributes.
+
+        Parameters
+        ----------
+        key : str
+        value : any
+            picklable
+
+        """
+        with self._store('a') as h:
+            h.root._v_attrs[key] = value
+
+    def nrows(self, key):
+        """Number of rows in table `key`.
+
+        Parameters
+        ----------
+        key : str
+
+        Returns
+        -------
+        int
+
+        """
+        with self._store('r') as h:
+            return h.get_storer(key).nrows
+
+    @contextmanager
+    def deferred_indexing(self):
+        """Defer index maintenance of appended-to tables to the exit.
+
+        Meant for bulk appends: on exit, completely sorted indexes are
+        rebuilt once on the declared index columns of every table a large
+        append (see `append()`) was made to in the meantime, and created
+        where missing. Tables appended few rows to keep their indexes,
+        extended by those rows, which can leave them no longer completely
+        sorted; `rebuild_indexes()` makes them so again.
+        """
+        with self._lock:
+            if self._deferred is not None:
+                # nested: the outermost context rebuilds
+                yield self
+                return
+
+            self._deferred = dict()
+
+            try:
+                with self.session():
+                    yield self
+
+            finally:
+                deferred, self._deferred = self._deferred, None
+
+                with self._store('a') as h:
+                    for key, autoindex in deferred.items():
+                        if key not in h:
+                            continue
+                        if autoindex is not None:
+                            h.get_storer(key).table.autoindex = autoindex
+                        self._update_indexes(h, key)
+
+    @staticmethod
+    def _index_columns(h, key):
+        """Columns of table `key` to be indexed.
+
+        These are the columns declared with `declare_index_columns()` or, by
+        default, all columns usable in `where` (the index and the data
+        columns).
+        """
+        storer = h.get_storer(key)
+
+        if "index_columns" in storer.attrs:
+            return list(storer.attrs.index_columns)
+
+        storer.infer_axes()
+
+        return [a.cname for a in storer.axes if a.is_data_indexable]
+
+    def _update_indexes(self, h, key):
+        """Add rows appended to table `key` to its indexes.
+
+        Clean indexes are extended by the rows not yet indexed; missing or
+        invalidated (dirty) ones, e.g. after appends with indexing deferred,
+        are created from scratch.
+        """
+        table = h.get_storer(key).table
+        table.flush_rows_to_index()
+
+        missing = [c for c in self._index_columns(h, key)
+                   if not table.colinstances[c].is_indexed or
+                   table.colinstances[c].index.dirty]
+
+        if len(missing) > 0:
+            self._create_csi(h, key, columns=missing)
+
+    def _create_csi(self, h, key, columns=None, force=False):
+        """Create completely sorted indexes on `columns` of table `key`.
+
+        Indexes which are already completely sorted and clean are kept,
+        unless `force` is set.
         """
-        with pd.HDFStore(self.path_to_hdf, mode='a') as h:
-            return h.append(*args, **kwargs)
+        table = h.get_storer(key).table
+
+        if columns is None:
+            columns = self._index_columns(h, key)
+
+        for c in columns:
+            col = table.colinstances[c]
+
+            if col.is_indexed:
+                if col.index.is_csi and not (col.index.dirty or force):
+                    continue
+                col.remove_index()
+
+            col.create_csindex()
+
+    def declare_index_columns(self, key, columns):
+        """Declare which columns of table `key` are to be indexed.
+
+        Parameters
+        ----------
+        key : str
+        columns : list-like
+            of str, e.g. ('header_id', 'obs_date'); 'index' is the row index
+
+        """
+        with self._store('a') as h:
+            h.get_storer(key).attrs.index_columns = tuple(columns)
+
+    def create_index(self, key, columns=None):
+        """Create completely sorted indexes on the columns of table `key`.
+
+        Parameters
+        ----------
+        key : str
+        columns : list-like or None
+            of str; None for the declared index columns
+
+        """
+        with self._store('a') as h:
+            self._create_csi(h, key, columns=columns)
+
+    def _table_keys(self, h, keys=None):
+        if keys is None:
+            keys = h.keys()
+
+        return [k for k in keys if getattr(h.get_storer(k), "is_table", False)]
+
+    def verify_indexes(self, keys=None):
+        """Report the state of indexes on the declared index columns.
+
+        Parameters
+        ----------
+        keys : list-like or None
+            of str; None for all tables
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            indexed by (key, column), with boolean columns 'indexed', 'csi'
+            and 'dirty' and column 'ok' if all is in order
+
+        """
+        rows = []
+
+        with self._store('r') as h:
+            for k in self._table_keys(h, keys):
+                table = h.get_storer(k).table
+
+                for c in self._index_columns(h, k):
+                    col = table.colinstances[c]
+                    indexed = col.is_indexed
+                    rows.append({
+                        "key": k,
+                        "column": c,
+                        "indexed": indexed,
+                        "csi": indexed and bool(col.index.is_csi),
+                        "dirty": indexed and bool(col.index.dirty),
+                    })
+
+        res = pd.DataFrame(rows,
+                           columns=["key", "column", "indexed", "csi",
+                                    "dirty"]).set_index(["key", "column"])
+        res["ok"] = res["csi"] & ~res["dirty"]
+
+        return res
+
+    def rebuild_indexes(self, keys=None, force=False):
+        """(Re)create completely sorted indexes where they are missing.
+
+        Parameters
+        ----------
+        keys : list-like or None
+            of str; None for all tables
+        force : bool
+            True to rebuild indexes which are in order, too
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            as returned by `verify_indexes()` after the rebuild
+
+        """
+        with self._store('a') as h:
+            for k in self._table_keys(h, keys):
+                self._create_csi(h, k, force=force)
+
+        return self.verify_indexes(keys)
+
+
+def main(argv=None):
+    """Verify or rebuild the indexes of a store from the command line.
+
+    Usage: python -m datadough.hangar path/to/store.h5 [--rebuild] [--force]
+    [--keys key_1 key_2]
+    """
+    parser = argparse.ArgumentParser(
+        description="Verify or rebuild the indexes of an hdf store.")
+    parser.add_argument("path_to_hdf")
+    parser.add_argument("--keys", nargs="*", default=None)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="create completely sorted indexes where needed")
+    parser.add_argument("--force", action="store_true",
+                        help="with --rebuild, rebuild all indexes")
+    args = parser.parse_args(argv)
+
+    hangar = DataHangar(args.path_to_hdf)
+
+    if args.rebuild:
+        res = hangar.rebuild_indexes(args.keys, force=args.force)
+    else:
+        res = hangar.verify_indexes(args.keys)
+
+    print(res.to_string())
+
+    return 0 if res["ok"].all() else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,342 @@
+"""Instrumentation of store calls.
+
+With `enable()`, every call DataHangar forwards to its backend is timed
+and recorded, together with the rows and bytes it returned, its `where`
+expression, the (innermost) traced function it was made from, e.g.
+'Table.filter' or 'Column.__eq__', and the error it raised, if any.
+Records go to pluggable sinks; see
+`summary()` for a report of the most expensive query shapes.
+"""
+import re
+import json
+import time
+import logging
+import functools
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# backend methods whose calls are recorded
+STORE_CALLS = ("select", "select_column", "select_isin", "get", "append",
+               "nrows", "remove", "keys", "get_attrs", "set_attrs",
+               "reserve_ids")
+
+# the active recorder, see `enable()`
+recorder = None
+
+# stacks of traced callers, one per thread
+_local = threading.local()
+
+
+class Recorder(object):
+    """Fan records out to sinks.
+
+    Parameters
+    ----------
+    sinks : list-like
+        of objects with a `write(record)` method
+
+    """
+    def __init__(self, sinks):
+        """
+        """
+        self.sinks = list(sinks)
+
+    def write(self, record):
+        for sink in self.sinks:
+            sink.write(record)
+
+    def close(self):
+        for sink in self.sinks:
+            if hasattr(sink, "close"):
+                sink.close()
+
+
+class RingBuffer(object):
+    """Keep the latest `maxlen` records in memory.
+
+    Parameters
+    ----------
+    maxlen : int
+
+    """
+    def __init__(self, maxlen=10000):
+        """
+        """
+        self._records = deque(maxlen=maxlen)
+
+    def write(self, record):
+        self._records.append(record)
+
+    @property
+    def records(self):
+        return list(self._records)
+
+    def clear(self):
+        self._records.clear()
+
+    def summary(self, by=("op", "key", "shape"), top=10):
+        """Report of the records held, see `summary()`."""
+        return summary(self.records, by=by, top=top)
+
+
+class LoggingSink(object):
+    """Log every record as one line.
+
+    Parameters
+    ----------
+    logger : logging.Logger or None
+        None for the 'datadough.instrument' logger
+    level : int
+
+    """
+    def __init__(self, logger=None, level=logging.DEBUG):
+        """
+        """
+        self.logger = logging.getLogger("datadough.instrument") \
+            if logger is None else logger
+        self.level = level
+
+    def write(self, record):
+        self.logger.log(
+            self.level, "%s %s %.6fs rows=%s bytes=%s caller=%s where=%s",
+            record["op"], record["key"], record["seconds"], record["rows"],
+            record["bytes"], record["caller"], record["where"])
+
+
+class JSONLinesSink(object):
+    """Append every record to a file as one JSON object per line.
+
+    Parameters
+    ----------
+    path : str
+
+    """
+    def __init__(self, path):
+        """
+        """
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, default=str)
+
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def enable(*sinks):
+    """Record store calls to `sinks` (a new RingBuffer if none).
+
+    Returns
+    -------
+    Recorder
+
+    """
+    global recorder
+
+    if len(sinks) < 1:
+        sinks = (RingBuffer(), )
+
+    recorder = Recorder(sinks)
+
+    return recorder
+
+
+def disable():
+    """Stop recording and close the sinks."""
+    global recorder
+
+    if recorder is not None:
+        recorder.close()
+
+    recorder = None
+
+
+def _callers():
+    if not hasattr(_local, "callers"):
+        _local.callers = []
+
+    return _local.callers
+
+
+def traced(func):
+    """Make `func` the caller of the store calls made within it."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if recorder is None:
+            return func(*args, **kwargs)
+
+        callers = _callers()
+        callers.append(name)
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            callers.pop()
+
+    return wrapper
+
+
+def shape(where):
+    """`where` with its literals replaced by '?', to group similar queries.
+    """
+    if where is None:
+        return None
+
+    res = re.sub(r"Timestamp\(\s*(['\"]).*?\1\s*\)", "?", where)
+    res = re.sub(r"(['\"]).*?\1", "?", res)
+    res = re.sub(r"\[[^\]]*\]", "[?]", res)
+    res = re.sub(r"(?<![\w.])-?\d+(\.\d+)?(e-?\d+)?", "?", res)
+
+    return res
+
+
+def _size(value):
+    """Rows and bytes of what a store call returned or was given.
+
+    Bytes include the strings of object columns, which takes a pass over
+    them.
+    """
+    if isinstance(value, pd.DataFrame):
+        return len(value), int(value.memory_usage(index=True,
+                                                  deep=True).sum())
+    if isinstance(value, pd.Series):
+        return len(value), int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, pd.Index):
+        return len(value), int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return len(value), int(pd.Series(value).memory_usage(index=False,
+                                                              deep=True))
+
+    return None, None
+
+
+def wrap(method, op):
+    """Record the calls of the backend method `method`, named `op`."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        key = args[0] if len(args) > 0 else kwargs.get("key")
+
+        if op == "select":
+            where = args[1] if len(args) > 1 else kwargs.get("where")
+        elif op == "select_isin":
+            column = args[1] if len(args) > 1 else kwargs.get("column")
+            values = args[2] if len(args) > 2 else kwargs.get("values")
+            where = "{} == [{} values]".format(column, len(values))
+        else:
+            where = None
+
+        if (where is not None) and not isinstance(where, str):
+            where = "<{}>".format(type(where).__name__)
+
+        callers = _callers()
+        t_start = time.time()
+        t_perf = time.perf_counter()
+
+        res = None
+        error = None
+
+        try:
+            res = method(*args, **kwargs)
+            return res
+
+        except BaseException as e:
+            error = "{}: {}".format(type(e).__name__, e)
+            raise
+
+        finally:
+            seconds = time.perf_counter() - t_perf
+
+            if error is not None:
+                rows, nbytes = None, None
+            elif op == "append":
+                rows, nbytes = _size(args[1] if len(args) > 1
+                                     else kwargs.get("value"))
+            else:
+                rows, nbytes = _size(res)
+
+            if op == "select_column":
+                query_shape = args[1] if len(args) > 1 \
+                    else kwargs.get("column")
+            else:
+                query_shape = shape(where)
+
+            active = recorder
+            if active is not None:
+                active.write({
+                    "time": t_start,
+                    "op": op,
+                    "key": key,
+                    "seconds": seconds,
+                    "rows": rows,
+                    "bytes": nbytes,
+                    "where": where,
+                    "shape": query_shape,
+                    "caller": callers[-1] if len(callers) > 0 else None,
+                    "stack": " > ".join(callers),
+                    "error": error
+                })
+
+    return wrapper
+
+
+def summary(records, by=("op", "key", "shape"), top=10):
+    """Rank query shapes by the total time spent on them.
+
+    Parameters
+    ----------
+    records : list-like
+        of records, as written to the sinks
+    by : tuple
+        record fields defining a query shape
+    top : int or None
+        number of shapes to report; None for all
+
+    Returns
+    -------
+    res : pandas.DataFrame
+        indexed by `by`, with columns 'calls', 'errors', 'seconds',
+        'mean_seconds', 'max_seconds', 'rows', 'bytes' and 'callers'
+
+    """
+    by = list(by)
+
+    if len(records) < 1:
+        return pd.DataFrame(
+            columns=by + ["calls", "errors", "seconds", "mean_seconds",
+                          "max_seconds", "rows", "bytes",
+                          "callers"]).set_index(by)
+
+    df = pd.DataFrame(list(records))
+    df[by] = df[by].astype(object).fillna("")
+    df["caller"] = df["caller"].astype(object).fillna("")
+
+    grouped = df.groupby(by, sort=False)
+
+    res = pd.DataFrame({
+        "calls": grouped.size(),
+        "errors": grouped["error"].count() if "error" in df.columns
+        else 0,
+        "seconds": grouped["seconds"].sum(),
+        "mean_seconds": grouped["seconds"].mean(),
+        "max_seconds": grouped["seconds"].max(),
+        "rows": grouped["rows"].sum(min_count=1),
+        "bytes": grouped["bytes"].sum(min_count=1),
+        "callers": grouped["caller"].agg(
+            lambda x: ", ".join(sorted(set(p for p in x if p))))
+    }).sort_values("seconds", ascending=False)
+
+    if top is not None:
+        res = res.iloc[:top]
+
+    return res
@@ -0,0 +1,222 @@
+import os
+import json
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+
+class MmapStore(object):
+    """Memory-mapped, read-optimized copy of (hot) series of Timeseries.
+
+    Observations of every header lie contiguously and sorted by date in two
+    flat arrays, 'obs_date.npy' (int64, nanoseconds since the epoch) and
+    'obs_value.npy' (float64); 'offsets.npy' holds (header_id, start, stop)
+    rows sorted by header_id. Date ranges are sliced with searchsorted,
+    without copying.
+
+    The hdf store remains the source of truth: `refresh()` rebuilds the
+    files from it, and the copy of a series counts as stale as soon as
+    anything else is saved to it (saves to other series leave it be).
+
+    Parameters
+    ----------
+    directory : str
+
+    """
+    def __init__(self, directory):
+        """
+        """
+        self.directory = directory
+
+        self._meta = None
+        self._obs_date = None
+        self._obs_value = None
+        self._offsets = None
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    def _load(self):
+        """Map the arrays of the current build, if it changed.
+
+        Returns
+        -------
+        meta : dict or None
+            None if nothing has been built yet
+
+        """
+        if not os.path.exists(self._meta_path):
+            return None
+
+        with open(self._meta_path, 'r') as f:
+            meta = json.load(f)
+
+        if (self._meta is None) or (meta["build"] != self._meta["build"]):
+            path = os.path.join(self.directory, meta["build"])
+
+            self._obs_date = np.load(os.path.join(path, "obs_date.npy"),
+                                     mmap_mode='r')
+            self._obs_value = np.load(os.path.join(path, "obs_value.npy"),
+                                      mmap_mode='r')
+            offsets = np.load(os.path.join(path, "offsets.npy"))
+            self._offsets = pd.DataFrame(offsets[:, 1:],
+                                         index=offsets[:, 0],
+                                         columns=["start", "stop"])
+            self._meta = meta
+
+        return self._meta
+
+    def refresh(self, timeseries, header=None):
+        """(Re)build the memory-mapped copy from the store.
+
+        Files of a new build are written to a fresh directory and switched
+        to in one step, so that concurrent readers see either the old or
+        the new build.
+
+        Parameters
+        ----------
+        timeseries : Timeseries
+            the source
+        header : list-like or None
+            of integer header ids to export; None for all
+
+        Returns
+        -------
+        res : dict
+            with 'headers' and 'rows' exported
+
+        """
+        version = timeseries.version()
+        saves = timeseries.saves()
+
+        if header is None:
+            header = timeseries.header_ids()
+
+        long = timeseries._read_long(np.asarray(header))
+
+        # sorted by series and date; of repeated observations, the last
+        #   saved one wins
+        long = long.sort_index().sort_values(["header_id", "obs_date"],
+                                             kind="mergesort")
+        long = long.drop_duplicates(["header_id", "obs_date"], keep="last")
+
+        header_id = long["header_id"].values.astype(np.int64)
+        obs_date = long["obs_date"].values.astype("datetime64[ns]") \
+            .view(np.int64)
+        obs_value = long["obs_value"].values.astype(np.float64)
+
+        uniq, start = np.unique(header_id, return_index=True)
+        stop = np.append(start[1:], len(header_id))
+        offsets = np.column_stack((uniq, start, stop)).astype(np.int64)
+
+        build = "build_" + uuid.uuid4().hex
+        path = os.path.join(self.directory, build)
+        os.makedirs(path)
+
+        np.save(os.path.join(path, "obs_date.npy"), obs_date)
+        np.save(os.path.join(path, "obs_value.npy"), obs_value)
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"build": build, "version": int(version),
+                       "saves": int(saves)}, f)
+        os.replace(tmp, self._meta_path)
+
+        # older builds; readers having them mapped keep them alive
+        for p in os.listdir(self.directory):
+            if p.startswith("build_") and (p != build):
+                shutil.rmtree(os.path.join(self.directory, p),
+                              ignore_errors=True)
+
+        return {"headers": len(uniq), "rows": len(header_id)}
+
+    def covers(self, header_id, timeseries):
+        """Which of `header_id` can be served from the copy.
+
+        Those exported and not saved to since.
+
+        Parameters
+        ----------
+        header_id : list-like
+            of int
+        timeseries : Timeseries
+            the source
+
+        Returns
+        -------
+        res : numpy.ndarray
+            of bool
+
+        """
+        header_id = np.asarray(header_id, dtype=np.int64)
+        meta = self._load()
+
+        if (meta is None) or ("saves" not in meta):
+            return np.zeros(len(header_id), dtype=bool)
+
+        res = self._offsets.index.get_indexer(header_id) > -1
+
+        if meta["version"] != timeseries.version():
+            res &= ~np.isin(header_id,
+                            timeseries.saved_since(meta["saves"]))
+
+        return res
+
+    def get(self, header_id, date_from=None, date_to=None):
+        """Observations of one header, as views of the mapped arrays.
+
+        Parameters
+        ----------
+        header_id : int
+        date_from, date_to : str or pandas.Timestamp, optional
+
+        Returns
+        -------
+        res : pandas.Series
+            indexed by 'obs_date'
+
+        """
+        self._load()
+
+        start, stop = self._offsets.loc[int(header_id)]
+        obs_date = self._obs_date[start:stop]
+
+        if date_from is not None:
+            start += np.searchsorted(obs_date, pd.Timestamp(date_from).value,
+                                     side="left")
+        if date_to is not None:
+            stop = self._offsets.loc[int(header_id), "start"] + \
+                np.searchsorted(obs_date, pd.Timestamp(date_to).value,
+                                side="right")
+
+        index = pd.DatetimeIndex(self._obs_date[start:stop].view("M8[ns]"),
+                                 copy=False, name="obs_date")
+
+        res = pd.Series(self._obs_value[start:stop], index=index,
+                        name=header_id, copy=False)
+
+        return res
+
+    def get_data(self, header_id, date_from=None, date_to=None):
+        """Observations of many headers, in wide format.
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            indexed by 'obs_date', columned by header id
+
+        """
+        header_id = pd.unique(np.asarray(header_id, dtype=np.int64))
+
+        if len(header_id) == 1:
+            return self.get(header_id[0], date_from, date_to).to_frame()
+
+        res = pd.concat([self.get(p, date_from, date_to) for p in header_id],
+                        axis=1)
+        res.index.name = "obs_date"
+
+        return res
@@ -0,0 +1,115 @@
+import os
+import multiprocessing
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Timeseries of a worker process, reading through its own handle
+_timeseries = None
+
+
+def _init_worker(path_to_hdf, backend, mmap_dir):
+    """Open a read-only store in a freshly started worker process."""
+    global _timeseries
+
+    from datadough import engine
+    from datadough.hangar import DataHangar
+    from datadough.mmap_store import MmapStore
+
+    engine.hangar = DataHangar(path_to_hdf, keep_open=True, backend=backend)
+
+    mmap_store = None if mmap_dir is None else MmapStore(mmap_dir)
+    _timeseries = engine.Timeseries(mmap_store=mmap_store)
+
+
+def _fetch(header_id, date_from, date_to, as_of):
+    return _timeseries.get_data(header_id, date_from, date_to, as_of=as_of)
+
+
+class ParallelFetcher(object):
+    """Read the data of many headers in concurrent worker processes.
+
+    Headers are split into batches, which worker processes, each with its
+    own read-only handle on the store, read concurrently; the wide result
+    is then reassembled in the order of the headers asked for. Workers are
+    started (with 'spawn', as HDF5 handles do not survive a fork) on
+    creation and kept until `close()`.
+
+    Parameters
+    ----------
+    hangar : DataHangar
+        store to read from; its backend must be creatable by name
+    n_workers : int or None
+        number of worker processes, None for the number of CPUs
+    mmap_store : MmapStore or None
+        read-optimized copy of hot series, as in Timeseries
+
+    """
+    def __init__(self, hangar, n_workers=None, mmap_store=None):
+        """
+        """
+        if hangar.backend.name is None:
+            raise ValueError("Backends without a name cannot be opened by "
+                             "worker processes!")
+
+        self.n_workers = n_workers or os.cpu_count()
+        self.path_to_hdf = hangar.path_to_hdf
+
+        mmap_dir = None if mmap_store is None else mmap_store.directory
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(hangar.path_to_hdf, hangar.backend.name, mmap_dir))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes."""
+        self._executor.shutdown()
+
+    def get_data(self, header, date_from=None, date_to=None, batch_size=100,
+                 as_of=None):
+        """Fetch the data of `header`, as Timeseries.get_data() does.
+
+        Parameters
+        ----------
+        header : list-like
+            of integer header ids
+        date_from, date_to : str or pandas.Timestamp, optional
+        batch_size : int
+            number of headers read by a worker at once
+        as_of : str or pandas.Timestamp, optional
+            as in Timeseries.get_data()
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            indexed by 'obs_date', columned by header ids
+
+        """
+        header_id = pd.Series(header).values
+        unique = pd.unique(header_id)
+
+        batches = [unique[p:(p + batch_size)]
+                   for p in range(0, len(unique), batch_size)]
+
+        frames = list(self._executor.map(_fetch, batches, repeat(date_from),
+                                         repeat(date_to), repeat(as_of)))
+
+        if len(frames) < 1:
+            return pd.DataFrame(columns=header_id, dtype=float,
+                                index=pd.DatetimeIndex([], name="obs_date"))
+
+        res = pd.concat(frames, axis=1).sort_index()
+        res.index.name = "obs_date"
+
+        res = res.reindex(columns=header_id)
+
+        return res
@@ -0,0 +1,318 @@
+import os
+import re
+import uuid
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from datadough.hangar import Backend
+from datadough.query import evaluate, parse, Term, In, Range, And
+
+
+class ParquetBackend(Backend):
+    """Local parquet dataset store.
+
+    Every table is a directory of parquet files below `path_to_hdf`. Tables
+    with 'header_id' and 'obs_date' columns are partitioned hive-style by
+    header bucket and year, so that predicates on these columns skip whole
+    directories. The conjuncts of `where` that compare a column to a literal
+    are pushed down to the parquet reader, together with the columns
+    needed; the full expression is then evaluated on what was read.
+
+    Parameters
+    ----------
+    path_to_hdf : str
+        root directory of the dataset
+    n_buckets : int
+        number of header buckets of partitioned tables
+
+    """
+    name = "parquet"
+
+    # file marking a directory as a table
+    marker = "_table.pkl"
+
+    # file with the root attributes
+    attrs_file = "_attrs.pkl"
+
+    partitioning = pa.schema([("bucket", pa.int32()), ("year", pa.int32())])
+
+    def __init__(self, path_to_hdf, n_buckets=64):
+        """
+        """
+        super(ParquetBackend, self).__init__(path_to_hdf)
+
+        self.n_buckets = n_buckets
+
+    def _path(self, key):
+        return os.path.join(self.path_to_hdf, *key.strip('/').split('/'))
+
+    def _meta(self, key):
+        """Table metadata: {'partitioned': bool, 'n_buckets': int}."""
+        with open(os.path.join(self._path(key), self.marker), "rb") as f:
+            return pickle.load(f)
+
+    def _dataset(self, key):
+        if key not in self:
+            raise KeyError("No object named {} in the file".format(key))
+
+        meta = self._meta(key)
+
+        if meta["partitioned"]:
+            partitioning = ds.partitioning(self.partitioning, flavor="hive")
+        else:
+            partitioning = None
+
+        return ds.dataset(self._path(key), format="parquet",
+                          partitioning=partitioning), meta
+
+    def __contains__(self, key):
+        return os.path.exists(os.path.join(self._path(key), self.marker))
+
+    def keys(self):
+        """Keys of all tables, '/'-prefixed as those of pandas.HDFStore."""
+        res = []
+
+        for root, dirs, files in os.walk(self.path_to_hdf):
+            if self.marker in files:
+                rel = os.path.relpath(root, self.path_to_hdf)
+                res.append('/' + rel.replace(os.sep, '/'))
+                # partitions are not tables
+                dirs[:] = []
+
+        return sorted(res)
+
+    def append(self, key, value, **kwargs):
+        """Append `value` to table `key` as a new parquet file per partition.
+
+        Keyword arguments specific to pandas.HDFStore.append (format,
+        data_columns, index etc.) are ignored.
+        """
+        df = value.copy()
+        df.index.name = "index"
+        df = df.reset_index()
+
+        if key in self:
+            meta = self._meta(key)
+        else:
+            partitioned = {"header_id", "obs_date"} <= set(df.columns)
+            meta = {"partitioned": partitioned, "n_buckets": self.n_buckets}
+
+        if meta["partitioned"]:
+            df["bucket"] = (df["header_id"] % meta["n_buckets"]) \
+                .astype(np.int32)
+            df["year"] = pd.DatetimeIndex(df["obs_date"]).year \
+                .astype(np.int32)
+            partitioning = ds.partitioning(self.partitioning, flavor="hive")
+        else:
+            partitioning = None
+
+        ds.write_dataset(
+            pa.Table.from_pandas(df, preserve_index=False),
+            self._path(key), format="parquet", partitioning=partitioning,
+            basename_template="part-" + uuid.uuid4().hex + "-{i}.parquet",
+            existing_data_behavior="overwrite_or_ignore")
+
+        if key not in self:
+            with open(os.path.join(self._path(key), self.marker), "wb") as f:
+                pickle.dump(meta, f)
+
+    def select(self, key, where=None, columns=None, start=None, stop=None,
+               **kwargs):
+        """Read rows of table `key` where `where` holds.
+
+        Parameters
+        ----------
+        key : str
+        where : str or None
+            pytables-like expression
+        columns : list-like or None
+            columns to return, None for all
+        start, stop : int or None
+            positions of the first and after the last row to return
+
+        Returns
+        -------
+        res : pandas.DataFrame
+
+        """
+        dataset, meta = self._dataset(key)
+
+        names = [p for p in dataset.schema.names
+                 if p not in self.partitioning.names + ["index"]]
+        columns = names if columns is None else list(columns)
+
+        # columns needed for evaluating `where`, too
+        needed = ["index"] + columns
+        if where is not None:
+            needed += [p for p in re.findall(r"[A-Za-z_]\w*", where)
+                       if (p in names) and (p not in needed)]
+
+        table = dataset.to_table(columns=needed,
+                                 filter=self._pushdown(where, meta))
+
+        res = table.to_pandas().set_index("index")
+        res.index.name = None
+
+        if where is not None:
+            res = evaluate(res, where)
+
+        if (start is not None) or (stop is not None):
+            res = res.sort_index(kind="mergesort").iloc[start:stop]
+
+        return res.loc[:, columns]
+
+    def select_isin(self, key, column, values, columns=None):
+        """Read rows of table `key` whose `column` takes one of `values`.
+
+        The membership test is handed to the parquet reader as a filter,
+        so that row groups (and header buckets) without any of `values`
+        are skipped rather than loaded.
+        """
+        if key not in self:
+            raise KeyError("No object named {} in the file".format(key))
+
+        meta = self._meta(key)
+        values = list(values)
+
+        filters = [(column, "in", values)]
+        if meta["partitioned"]:
+            partitioning = ds.partitioning(self.partitioning, flavor="hive")
+            if column == "header_id":
+                filters.append(("bucket", "in", sorted(
+                    set(int(p) % meta["n_buckets"] for p in values))))
+        else:
+            partitioning = None
+
+        table = pq.read_table(self._path(key), filters=filters,
+                              partitioning=partitioning)
+
+        res = table.to_pandas().set_index("index")
+        res.index.name = None
+
+        names = [p for p in table.schema.names
+                 if p not in self.partitioning.names + ["index"]]
+        columns = names if columns is None else list(columns)
+
+        return res.loc[:, columns]
+
+    def get(self, key):
+        return self.select(key)
+
+    def select_column(self, key, column):
+        if column == "index":
+            dataset, _ = self._dataset(key)
+            return pd.Series(dataset.to_table(columns=["index"])
+                             .column("index").to_numpy())
+
+        return self.select(key, columns=[column])[column] \
+            .reset_index(drop=True)
+
+    def nrows(self, key):
+        return self._dataset(key)[0].count_rows()
+
+    def remove(self, key):
+        shutil.rmtree(self._path(key))
+
+    def get_attrs(self, key, default=None):
+        path = os.path.join(self.path_to_hdf, self.attrs_file)
+
+        attrs = dict()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                attrs = pickle.load(f)
+
+        if (default is not None) and (key not in attrs):
+            return default
+
+        return attrs[key]
+
+    def set_attrs(self, key, value):
+        path = os.path.join(self.path_to_hdf, self.attrs_file)
+
+        attrs = dict()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                attrs = pickle.load(f)
+
+        attrs[key] = value
+
+        os.makedirs(self.path_to_hdf, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(attrs, f)
+
+    def _pushdown(self, where, meta):
+        """Translate the simple conjuncts of `where` into a pyarrow filter.
+
+        Returns
+        -------
+        res : pyarrow.dataset.Expression or None
+
+        """
+        if where is None:
+            return None
+
+        node = parse(where).optimize()
+        terms = node.children if isinstance(node, And) else [node]
+
+        res = None
+
+        for term in terms:
+            if isinstance(term, Term):
+                parsed = [(term.column, term.op, term.value)]
+            elif isinstance(term, In):
+                parsed = [(term.column, "==", term.values)]
+            elif isinstance(term, Range):
+                parsed = [(term.column, ">=", term.lo),
+                          (term.column, "<=", term.hi)]
+            else:
+                continue
+
+            for col, op, value in parsed:
+                if col == "index":
+                    continue
+                for expr in self._expressions(col, op, value, meta):
+                    res = expr if res is None else (res & expr)
+
+        return res
+
+    @staticmethod
+    def _expressions(col, op, value, meta):
+        """pyarrow expressions equivalent to (or implied by) `col op value`.
+        """
+        field = ds.field(col)
+        res = []
+
+        if isinstance(value, (list, tuple)):
+            if op != "==":
+                return res
+            res.append(field.isin(list(value)))
+        else:
+            res.append({"==": field == value, "!=": field != value,
+                        ">=": field >= value, "<=": field <= value,
+                        ">": field > value, "<": field < value}[op])
+
+        if not meta["partitioned"]:
+            return res
+
+        # partition pruning
+        if col == "header_id" and op == "==":
+            values = value if isinstance(value, (list, tuple)) else [value]
+            res.append(ds.field("bucket").isin(
+                sorted(set(int(p) % meta["n_buckets"] for p in values))))
+
+        elif (col == "obs_date") and isinstance(value, pd.Timestamp):
+            year = ds.field("year")
+            if op in (">", ">="):
+                res.append(year >= value.year)
+            elif op in ("<", "<="):
+                res.append(year <= value.year)
+            elif op == "==":
+                res.append(year == value.year)
+
+        return res
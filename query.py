@@ -1,38 +1,556 @@
+import re
+import ast
+
+import numpy as np
 import pandas as pd
 
 
+class UnsupportedQuery(ValueError):
+    """Expression pandas cannot evaluate in memory; pytables might."""
+
+
+def evaluate(frame, expression):
+    """Evaluate a pytables-like `expression` on an in-memory table.
+
+    Parameters
+    ----------
+    frame : pandas.DataFrame
+    expression : str or None
+        as passed to `where` of pandas.HDFStore.select()
+
+    Returns
+    -------
+    res : pandas.DataFrame
+        rows of `frame` where `expression` holds
+
+    """
+    if expression is None:
+        return frame.copy()
+
+    # pandas.eval does not call functions: bind timestamps to variables
+    timestamps = dict()
+
+    def bind(m):
+        name = "_ts_{}".format(len(timestamps))
+        timestamps[name] = pd.Timestamp(m.group(2))
+        return "@" + name
+
+    expression = re.sub(r"Timestamp\(\s*(['\"])(.*?)\1\s*\)", bind,
+                        expression)
+
+    return frame.query(expression, local_dict=timestamps)
+
+
+class Node(object):
+    """Node of a query expression tree.
+
+    Trees render to the `where` strings of pandas.HDFStore.select() and
+    evaluate to boolean masks on in-memory tables; `&` and `|` combine
+    them.
+    """
+    def render(self):
+        raise NotImplementedError
+
+    def mask(self, frame):
+        """Boolean mask of the rows of `frame` where the node holds.
+
+        Parameters
+        ----------
+        frame : pandas.DataFrame
+
+        Returns
+        -------
+        res : numpy.ndarray
+            of bool
+
+        """
+        raise NotImplementedError
+
+    def optimize(self):
+        return self
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, self.render())
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and (self.render() == other.render())
+
+    def __hash__(self):
+        return hash(self.render())
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+
+class Term(Node):
+    """Comparison of a column to a literal: `column op value`."""
+    operators = ("==", "!=", ">=", "<=", ">", "<")
+
+    def __init__(self, column, op, value):
+        """
+        """
+        if op not in self.operators:
+            raise ValueError("Unknown operator '{}'.".format(op))
+
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def render(self):
+        return "{} {} {}".format(self.column, self.op, _literal(self.value))
+
+    def mask(self, frame):
+        values = _values(frame, self.column)
+        value = self.value
+
+        if self.op == "==":
+            res = values == value
+        elif self.op == "!=":
+            res = values != value
+        elif self.op == ">=":
+            res = values >= value
+        elif self.op == "<=":
+            res = values <= value
+        elif self.op == ">":
+            res = values > value
+        else:
+            res = values < value
+
+        return np.asarray(res, dtype=bool)
+
+
+class In(Node):
+    """Membership of column values in a list of literals."""
+    def __init__(self, column, values):
+        """
+        """
+        self.column = column
+        self.values = list(values)
+
+    def render(self):
+        return "{} == {}".format(self.column, _literal(self.values))
+
+    def mask(self, frame):
+        return np.asarray(_values(frame, self.column).isin(self.values),
+                          dtype=bool)
+
+    def optimize(self):
+        values = list(pd.unique(np.asarray(self.values, dtype=object)))
+
+        if len(values) == 1:
+            return Term(self.column, "==", values[0])
+
+        # contiguous integers to a range
+        if (len(values) > 2) and \
+                all(isinstance(p, (int, np.integer)) for p in values):
+            lo, hi = min(values), max(values)
+            if hi - lo + 1 == len(values):
+                return Range(self.column, lo, hi)
+
+        return In(self.column, values)
+
+
+class Range(Node):
+    """Inclusive range of column values: `lo <= column <= hi`."""
+    def __init__(self, column, lo, hi):
+        """
+        """
+        self.column = column
+        self.lo = lo
+        self.hi = hi
+
+    def render(self):
+        return "({c} >= {lo}) & ({c} <= {hi})".format(
+            c=self.column, lo=_literal(self.lo), hi=_literal(self.hi))
+
+    def mask(self, frame):
+        values = _values(frame, self.column)
+
+        return np.asarray((values >= self.lo) & (values <= self.hi),
+                          dtype=bool)
+
+
+class Raw(Node):
+    """Expression the tree does not model, kept verbatim."""
+    def __init__(self, expression):
+        """
+        """
+        self.expression = expression
+
+    def render(self):
+        return self.expression
+
+    def mask(self, frame):
+        try:
+            res = evaluate(frame, self.expression)
+        except (SyntaxError, NameError, TypeError, ValueError,
+                NotImplementedError) as e:
+            # pytables syntax pandas.eval does not take
+            raise UnsupportedQuery("Cannot evaluate '{}' in memory: {}"
+                                   .format(self.expression, e)) from e
+
+        return frame.index.isin(res.index)
+
+
+class And(Node):
+    """Conjunction of nodes."""
+    sep = " & "
+
+    def __init__(self, *children):
+        """
+        """
+        self.children = list(children)
+
+    def render(self):
+        return self.sep.join("(" + p.render() + ")" for p in self.children)
+
+    def mask(self, frame):
+        res = np.ones(len(frame), dtype=bool)
+        for p in self.children:
+            res &= p.mask(frame)
+
+        return res
+
+    def optimize(self):
+        children = _flatten(self, And)
+        children = _unique([p.optimize() for p in children])
+        children = _merge_bounds(children)
+
+        if len(children) == 1:
+            return children[0]
+
+        return And(*children)
+
+
+class Or(Node):
+    """Disjunction of nodes."""
+    sep = " | "
+
+    def __init__(self, *children):
+        """
+        """
+        self.children = list(children)
+
+    def render(self):
+        return self.sep.join("(" + p.render() + ")" for p in self.children)
+
+    def mask(self, frame):
+        res = np.zeros(len(frame), dtype=bool)
+        for p in self.children:
+            res |= p.mask(frame)
+
+        return res
+
+    def optimize(self):
+        children = _flatten(self, Or)
+        children = _unique([p.optimize() for p in children])
+
+        # equalities on the same column to one membership
+        merged = dict()
+        rest = []
+        for p in children:
+            if isinstance(p, Term) and (p.op == "=="):
+                merged.setdefault(p.column, []).append(p.value)
+            elif isinstance(p, In):
+                merged.setdefault(p.column, []).extend(p.values)
+            else:
+                rest.append(p)
+
+        children = [In(k, v).optimize() for k, v in merged.items()] + rest
+
+        if len(children) == 1:
+            return children[0]
+
+        return Or(*children)
+
+
+def _values(frame, column):
+    """Values of `column` of `frame`, 'index' being the index."""
+    if column == "index":
+        return pd.Series(frame.index, index=frame.index)
+
+    return frame[column]
+
+
+def _literal(value):
+    """Render a literal the way pytables expressions expect it."""
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return "[" + ", ".join(_literal(p) for p in value) + "]"
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return "Timestamp('{}')".format(pd.Timestamp(value))
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, np.integer):
+        return str(int(value))
+    if isinstance(value, np.floating):
+        return repr(float(value))
+
+    return repr(value)
+
+
+def _flatten(node, kind):
+    """Children of nested nodes of the same `kind`, in order."""
+    res = []
+    for p in node.children:
+        res += _flatten(p, kind) if isinstance(p, kind) else [p]
+
+    return res
+
+
+def _unique(nodes):
+    """Drop repeated nodes, keeping the first."""
+    res = []
+    for p in nodes:
+        if p not in res:
+            res.append(p)
+
+    return res
+
+
+def _merge_bounds(nodes):
+    """Intersect inclusive bounds on the same column into one range."""
+    bounds = dict()
+    rest = []
+    for p in nodes:
+        if isinstance(p, Range):
+            bounds.setdefault(p.column, []).extend(
+                [(">=", p.lo), ("<=", p.hi)])
+        elif isinstance(p, Term) and (p.op in (">=", "<=")):
+            bounds.setdefault(p.column, []).append((p.op, p.value))
+        else:
+            rest.append(p)
+
+    res = []
+    for column, b in bounds.items():
+        lo = [v for op, v in b if op == ">="]
+        hi = [v for op, v in b if op == "<="]
+        try:
+            lo = max(lo) if lo else None
+            hi = min(hi) if hi else None
+        except TypeError:
+            # incomparable literals: leave as they are
+            res += [Term(column, op, v) for op, v in b]
+            continue
+
+        if (lo is not None) and (hi is not None):
+            res.append(Range(column, lo, hi))
+        elif lo is not None:
+            res.append(Term(column, ">=", lo))
+        else:
+            res.append(Term(column, "<=", hi))
+
+    return res + rest
+
+
+def encode_ids(column, ids, min_run=3, max_terms=None):
+    """Encode integer ids as inclusive ranges plus a literal membership.
+
+    Runs of at least `min_run` consecutive ids become ranges; the other
+    ids are listed literally.
+
+    Parameters
+    ----------
+    column : str
+    ids : list-like
+        of int
+    min_run : int
+        shortest run of consecutive ids to encode as a range
+    max_terms : int or None
+        if the encoding takes more than this many ranges and literals, a
+        plain membership of all ids is returned instead
+
+    Returns
+    -------
+    res : Node
+
+    """
+    ids = np.unique(np.asarray(ids, dtype=np.int64))
+
+    if len(ids) < 1:
+        return Raw("index < 0")
+
+    # bounds of runs of consecutive ids
+    breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+    starts = np.append(0, breaks)
+    stops = np.append(breaks, len(ids))
+
+    nodes = []
+    literals = []
+    for start, stop in zip(starts, stops):
+        if stop - start >= min_run:
+            nodes.append(Range(column, int(ids[start]), int(ids[stop - 1])))
+        else:
+            literals += ids[start:stop].tolist()
+
+    if (max_terms is not None) and (len(nodes) + len(literals) > max_terms):
+        return In(column, ids.tolist())
+
+    if len(literals) == 1:
+        nodes.append(Term(column, "==", literals[0]))
+    elif len(literals) > 1:
+        nodes.append(In(column, literals))
+
+    if len(nodes) == 1:
+        return nodes[0]
+
+    return Or(*nodes)
+
+
+def parse(expression):
+    """Parse a pytables-like `expression` into a tree.
+
+    Conjunctions ('&', 'and') and disjunctions ('|', 'or') of comparisons
+    of a column to a literal are modelled; anything else becomes a `Raw`
+    node.
+
+    Parameters
+    ----------
+    expression : str
+
+    Returns
+    -------
+    res : Node
+
+    """
+    expression = strip_parentheses(expression)
+
+    for kind, seps in ((Or, ("|", " or ")), (And, ("&", " and "))):
+        parts = split(expression, seps)
+        if len(parts) > 1:
+            return kind(*[parse(p) for p in parts])
+
+    m = re.match(r"^([A-Za-z_]\w*)\s*(==|!=|>=|<=|>|<| in )\s*(.+)$",
+                 expression)
+    if m is None:
+        return Raw(expression)
+
+    column, op, literal = m.groups()
+    literal = literal.strip()
+    m_ts = re.match(r"^Timestamp\(\s*['\"](.+)['\"]\s*\)$", literal)
+
+    try:
+        if m_ts is not None:
+            value = pd.Timestamp(m_ts.group(1))
+        else:
+            value = ast.literal_eval(literal)
+    except (ValueError, SyntaxError):
+        return Raw(expression)
+
+    if isinstance(value, (list, tuple)):
+        if op.strip() not in ("==", "in"):
+            return Raw(expression)
+        return In(column, value)
+
+    if not isinstance(value, (int, float, str, pd.Timestamp)) or \
+            (op == " in "):
+        return Raw(expression)
+
+    return Term(column, op, value)
+
+
+def split(expression, seps):
+    """Split `expression` at the top-level occurrences of `seps`."""
+    res = []
+    depth = 0
+    quote = None
+    p_start = 0
+    p = 0
+
+    while p < len(expression):
+        c = expression[p]
+
+        if quote is not None:
+            if c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif depth == 0:
+            for sep in seps:
+                if expression[p:(p + len(sep))] == sep:
+                    res.append(expression[p_start:p])
+                    p_start = p + len(sep)
+                    p += len(sep) - 1
+                    break
+
+        p += 1
+
+    res.append(expression[p_start:])
+
+    return [p.strip() for p in res]
+
+
+def strip_parentheses(expression):
+    """Remove parentheses enclosing all of `expression`."""
+    expression = expression.strip()
+
+    while expression.startswith('(') and expression.endswith(')'):
+        # only if the outer pair matches
+        depth = 0
+        for p, c in enumerate(expression):
+            depth += (c == '(') - (c == ')')
+            if (depth == 0) and (p < len(expression) - 1):
+                return expression
+        expression = expression[1:-1].strip()
+
+    return expression
+
+
 class TableQuery(object):
-    """docstring for Query."""
+    """Query on a table, held as an expression tree.
+
+    Parameters
+    ----------
+    condition : str or dict or pandas.Series or Node or None
+        str is parsed, dict-like means equality of every key (column) to
+        its value, an empty list matches no rows and None all of them
+
+    """
     def __init__(self, condition=None):
         """
         """
-        self.expression = self.parse_expression(condition)
+        self.node = self.parse_expression(condition)
 
     def __str__(self):
         return self.expression
 
+    @property
+    def expression(self):
+        """The `where` string for pandas.HDFStore.select()."""
+        if self.node is None:
+            # default value of arg `where` in pandas.HDFStore.select(),
+            #   to be able to return all rows from a table
+            return None
+
+        return self.node.render()
+
     @staticmethod
     def parse_expression(condition):
         """
         """
         if condition is None:
-            # default value of arg `where` in pandas.HDFStore.select(),
-            #   to be able to return all rows from a table
             return None
 
-        elif isinstance(condition, str):
+        elif isinstance(condition, Node):
             res = condition
 
-        # elif isinstance(condition, dict):
-        #     res = ' and '.join([(' ' + str(k) + ' ').join(v)
-        #                         for k, v in condition.items()])
+        elif isinstance(condition, str):
+            res = parse(condition)
 
         elif isinstance(condition, (dict, pd.Series)):
-            res = ' and '.join(['(' + str(k) + ' == ' + str(v) + ')'
-                               for k, v in condition.items()])
+            res = And(*[Term(str(k), "==", v) for k, v in condition.items()])
 
         elif isinstance(condition, (list, tuple)) and (len(condition) < 1):
-            res = "index < 0"
+            res = Raw("index < 0")
 
         else:
             raise ValueError("Not implemented!")
@@ -42,18 +560,36 @@ class TableQuery(object):
     def or_(self, other):
         """
         """
-        new_expression = '(' + self.expression + ')' + " or " + \
-            '(' + other.expression + ')'
-
-        return TableQuery(condition=new_expression)
+        return TableQuery(condition=Or(self.node, other.node))
 
     def and_(self, other):
         """
         """
-        new_expression = '(' + self.expression + ')' + " and " + \
-            '(' + other.expression + ')'
+        return TableQuery(condition=And(self.node, other.node))
+
+    def optimize(self):
+        """Simplified equivalent query.
+
+        Equalities on one column joined by 'or' become one membership,
+        contiguous integer memberships become ranges, repeated terms are
+        dropped and bounds on one column are intersected.
+
+        Returns
+        -------
+        res : TableQuery
+
+        """
+        if self.node is None:
+            return self
+
+        return TableQuery(condition=self.node.optimize())
+
+    def mask(self, frame):
+        """Boolean mask of the rows of `frame` where the query holds."""
+        if self.node is None:
+            return np.ones(len(frame), dtype=bool)
 
-        return TableQuery(condition=new_expression)
+        return self.node.mask(frame)
 
     # @classmethod
     # def by_id(cls, idx):
@@ -0,0 +1,571 @@
+"""Local query server keeping a store hot in memory, and its client.
+
+A QueryServer wraps one DataBase for the lifetime of the process: the
+store handle stays open, dimension tables are mirrored in memory (see
+`engine.enable_table_cache()`) and the data of queried series, raw or
+read from rollups, is kept in the result cache of the DataBase, if any.
+Clients in other processes (`Client`, with the read API of DataBase)
+connect over a Unix socket or localhost TCP.
+
+Every message is a 4-byte big-endian length, a JSON header of that many
+bytes, then the raw buffers the header lists the sizes of. Frames travel
+as numpy buffers: the index and the values of a frame of one numeric
+dtype each make one buffer, received without any parsing; only labels
+and non-numeric columns are spelled out in JSON. Nothing is pickled.
+"""
+import os
+import json
+import struct
+import socket
+import argparse
+import builtins
+import threading
+import socketserver
+
+import numpy as np
+import pandas as pd
+
+# calls a client can make, see `QueryServer.call()`
+METHODS = ("get_data", "header_id", "stats")
+
+
+def _jsonable(value):
+    """`value` as something json can write."""
+    if (value is pd.NaT) or (value is pd.NA):
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, tuple):
+        return [_jsonable(p) for p in value]
+
+    return value
+
+
+def _encode_array(values, buffers):
+    """Describe `values`, appending their buffer to `buffers` if numeric."""
+    arr = np.asarray(values)
+
+    if arr.dtype.kind not in "biufmM":
+        return {"values": [_jsonable(p) for p in arr.tolist()]}
+
+    buffers.append(np.ascontiguousarray(arr).view(np.uint8).reshape(-1))
+
+    return {"dtype": arr.dtype.str, "shape": list(arr.shape),
+            "buffer": len(buffers) - 1}
+
+
+def _decode_array(meta, buffers):
+    if "values" in meta:
+        # labels of tuples (e.g. MultiIndex columns) arrive as lists
+        values = [tuple(p) if isinstance(p, list) else p
+                  for p in meta["values"]]
+        res = np.empty(len(values), dtype=object)
+        res[:] = values
+        return res
+
+    res = np.frombuffer(buffers[meta["buffer"]], dtype=np.dtype(meta["dtype"]))
+
+    return res.reshape(meta["shape"])
+
+
+def _encode_index(index, buffers):
+    res = {
+        "names": [_jsonable(p) for p in index.names],
+        "levels": [_encode_array(index.get_level_values(p), buffers)
+                   for p in range(index.nlevels)],
+        "freq": index.freqstr if isinstance(index, pd.DatetimeIndex)
+        else None
+    }
+
+    return res
+
+
+def _decode_index(meta, buffers):
+    levels = [_decode_array(p, buffers) for p in meta["levels"]]
+
+    if len(levels) > 1:
+        return pd.MultiIndex.from_arrays(levels, names=meta["names"])
+
+    if meta["freq"] is not None:
+        return pd.DatetimeIndex(levels[0], freq=meta["freq"],
+                                name=meta["names"][0])
+
+    return pd.Index(levels[0], name=meta["names"][0])
+
+
+def encode_frame(frame, buffers):
+    """Describe pandas.DataFrame or Series `frame`, collecting its buffers.
+
+    Parameters
+    ----------
+    frame : pandas.DataFrame or pandas.Series
+    buffers : list
+        to append the buffers of `frame` to
+
+    Returns
+    -------
+    res : dict
+        json-able description, referring to `buffers` by position
+
+    """
+    res = {"series": isinstance(frame, pd.Series)}
+
+    if res["series"]:
+        res["name"] = _jsonable(frame.name)
+        frame = frame.to_frame()
+
+    res["index"] = _encode_index(frame.index, buffers)
+    res["columns"] = _encode_index(frame.columns, buffers)
+
+    dtypes = set(frame.dtypes)
+    if (len(dtypes) == 1) and (frame.dtypes.iloc[0].kind in "biufmM"):
+        # one block, e.g. all the series of get_data()
+        res["block"] = _encode_array(frame.to_numpy(), buffers)
+    else:
+        res["data"] = [_encode_array(frame.iloc[:, p], buffers)
+                       for p in range(frame.shape[1])]
+
+    return res
+
+
+def decode_frame(meta, buffers):
+    """Rebuild the frame described by `meta`, see `encode_frame()`.
+
+    Numeric values are views of `buffers`, not copies.
+    """
+    index = _decode_index(meta["index"], buffers)
+    columns = _decode_index(meta["columns"], buffers)
+
+    if "block" in meta:
+        res = pd.DataFrame(_decode_array(meta["block"], buffers),
+                           index=index, columns=columns, copy=False)
+    else:
+        res = pd.DataFrame(
+            dict(enumerate(_decode_array(p, buffers) for p in meta["data"])),
+            index=index)
+        res.columns = columns
+
+    if meta["series"]:
+        res = res.iloc[:, 0].rename(meta["name"])
+
+    return res
+
+
+def _encode(value, buffers):
+    """`value` as json, with frames replaced by their descriptions."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return {"__frame__": encode_frame(value, buffers)}
+    if isinstance(value, dict):
+        return {k: _encode(v, buffers) for k, v in value.items()}
+
+    return _jsonable(value)
+
+
+def _decode(value, buffers):
+    if isinstance(value, dict):
+        if "__frame__" in value:
+            return decode_frame(value["__frame__"], buffers)
+        return {k: _decode(v, buffers) for k, v in value.items()}
+
+    return value
+
+
+def _recv_exactly(sock, n):
+    """Receive `n` bytes; None if the peer closed the connection first."""
+    res = bytearray(n)
+    view = memoryview(res)
+
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if k == 0:
+            return None
+        got += k
+
+    return res
+
+
+def send_message(sock, message):
+    """Send dict `message`, its frames as raw buffers, see module docs."""
+    buffers = []
+    header = {"body": _encode(message, buffers),
+              "buffers": [p.nbytes for p in buffers]}
+
+    header = json.dumps(header).encode()
+
+    sock.sendall(struct.pack(">I", len(header)) + header)
+    for p in buffers:
+        sock.sendall(memoryview(p))
+
+
+def recv_message(sock):
+    """Receive a message sent by `send_message()`; None on end of stream.
+    """
+    size = _recv_exactly(sock, 4)
+    if size is None:
+        return None
+
+    header = json.loads(bytes(_recv_exactly(sock, struct.unpack(">I",
+                                                                size)[0])))
+    buffers = [_recv_exactly(sock, p) for p in header["buffers"]]
+
+    return _decode(header["body"], buffers)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Answer the requests of one connection, until it is closed."""
+    def handle(self):
+        while True:
+            request = recv_message(self.request)
+            if request is None:
+                break
+
+            try:
+                res = {"status": "ok",
+                       "result": self.server.query_server.call(
+                           request["method"], request["args"])}
+            except Exception as e:
+                res = {"status": "error", "type": type(e).__name__,
+                       "error": str(e)}
+
+            send_message(self.request, res)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class QueryServer(object):
+    """Serve the reads of one DataBase to local clients.
+
+    Connections are handled in threads of their own, but calls to the
+    DataBase are made one at a time: the store serializes access by
+    threads anyway (see HDFBackend), and so do the caches. Whenever the
+    store has been written to (by a writer process, see
+    `datadough.writer`), the caches are dropped before the next call.
+
+    Parameters
+    ----------
+    database : DataBase
+        to serve; its store is best opened with `keep_open=True`
+    address : str or tuple
+        path of a Unix socket, or (host, port) to listen on over TCP;
+        port 0 for any free one, see `address` after creation
+
+    """
+    def __init__(self, database, address):
+        """
+        """
+        self.database = database
+
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self._server = _UnixServer(address, _Handler)
+        else:
+            self._server = _TCPServer(tuple(address), _Handler)
+
+        self._server.query_server = self
+        self.address = self._server.server_address
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._mtime = None
+
+        self.requests = 0
+
+        self.warm()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _store_mtime(self):
+        try:
+            return os.path.getmtime(self.database.hangar.path_to_hdf)
+        except (OSError, TypeError):
+            return None
+
+    def warm(self):
+        """Mirror the dimension tables of the store in memory."""
+        from datadough import engine
+
+        table_cache = engine.table_cache
+        if table_cache is None:
+            table_cache = engine.enable_table_cache()
+
+        hangar = self.database.hangar
+
+        with hangar.session():
+            for p in engine.DIMENSION_TABLES:
+                if p in hangar:
+                    table_cache.get(hangar, p)
+
+        self._mtime = self._store_mtime()
+
+    def _invalidate(self):
+        """Drop what is cached if the store was written to since cached."""
+        from datadough import engine
+
+        mtime = self._store_mtime()
+        if mtime == self._mtime:
+            return
+
+        if engine.table_cache is not None:
+            engine.table_cache.invalidate(self.database.hangar)
+        if self.database.result_cache is not None:
+            self.database.result_cache.invalidate()
+
+        self._mtime = mtime
+
+    def call(self, method, args):
+        """Make the call a client asked for.
+
+        Parameters
+        ----------
+        method : str
+            one of `METHODS`
+        args : dict
+            keyword arguments of the method
+
+        Returns
+        -------
+        res
+            pandas.DataFrame or Series, or a json-able dict
+
+        """
+        if method not in METHODS:
+            raise ValueError("Unknown method {!r}!".format(method))
+
+        with self._lock:
+            self.requests += 1
+            self._invalidate()
+
+            if method == "get_data":
+                return self.database.get_data(**args)
+
+            if method == "header_id":
+                with self.database.hangar.session():
+                    return self.database._header_id(**args)
+
+            result_cache = self.database.result_cache
+
+            return {"requests": self.requests,
+                    "result_cache": None if result_cache is None
+                    else result_cache.stats}
+
+    def serve_forever(self):
+        """Answer requests until `close()` is called from elsewhere."""
+        self._server.serve_forever()
+
+    def start(self):
+        """Answer requests in a background thread.
+
+        Returns
+        -------
+        threading.Thread
+
+        """
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        name="datadough-server", daemon=True)
+        self._thread.start()
+
+        return self._thread
+
+    def close(self):
+        """Stop answering requests and release the socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+
+        self._server.server_close()
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+class Client(object):
+    """Read a store through a QueryServer, as through a DataBase.
+
+    One connection is opened on first use and kept; calls from several
+    threads take turns on it. Errors raised by the server are raised
+    again, as the same builtin exception type where there is one.
+
+    Parameters
+    ----------
+    address : str or tuple
+        as given to QueryServer
+    timeout : float or None
+        seconds to wait for an answer; None to wait for as long as it
+        takes
+
+    """
+    def __init__(self, address, timeout=None):
+        """
+        """
+        self.address = address
+        self.timeout = timeout
+
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _connect(self):
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        sock.settimeout(self.timeout)
+        sock.connect(self.address if isinstance(self.address, str)
+                     else tuple(self.address))
+
+        return sock
+
+    def close(self):
+        """Close the connection, if open."""
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def call(self, method, **kwargs):
+        """Make call `method` on the server, see `QueryServer.call()`."""
+        request = {"method": method, "args": kwargs}
+
+        with self._lock:
+            if self._sock is None:
+                self._sock = self._connect()
+
+            try:
+                send_message(self._sock, request)
+                res = recv_message(self._sock)
+                if res is None:
+                    raise ConnectionError("The server closed the "
+                                          "connection!")
+            except Exception:
+                # the stream is out of step: start afresh next time
+                self._sock.close()
+                self._sock = None
+                raise
+
+        if res["status"] != "ok":
+            error = getattr(builtins, res["type"], None)
+            if not (isinstance(error, type) and
+                    issubclass(error, Exception)):
+                error = RuntimeError
+            raise error(res["error"])
+
+        return res["result"]
+
+    def get_data(self, header, date_from, date_to, freq, **kwargs):
+        """DataBase.get_data(), answered by the server.
+
+        Parameters
+        ----------
+        header, date_from, date_to, freq
+            as in DataBase.get_data()
+        kwargs
+            keyword arguments to DataBase.get_data(), e.g. `as_of`
+
+        Returns
+        -------
+        res : pandas.DataFrame
+
+        """
+        return self.call("get_data", header=header, date_from=date_from,
+                         date_to=date_to, freq=freq, **kwargs)
+
+    def header_id(self, header, version="default"):
+        """Integer header ids to fetch data of, as DataBase resolves them.
+
+        Parameters
+        ----------
+        header : pandas.Series or pandas.DataFrame
+            as in DataBase.get_data()
+        version : str or int
+            as in DataBase.get_data()
+
+        Returns
+        -------
+        res : pandas.Series
+            of integer header ids, indexed by names to use on the data
+
+        """
+        return self.call("header_id", header=header, version=version)
+
+    def iter_data(self, header, date_from, date_to, freq, batch_size=100,
+                  as_of=None, version="default"):
+        """DataBase.iter_data(), with one request per batch of headers.
+
+        Yields
+        ------
+        data : pandas.DataFrame
+
+        """
+        dh = self.header_id(header, version)
+
+        for p in range(0, len(dh), batch_size):
+            yield self.get_data(dh.iloc[p:(p + batch_size)], date_from,
+                                date_to, freq, as_of=as_of)
+
+    def stats(self):
+        """Requests answered by the server and its result cache counters.
+        """
+        return self.call("stats")
+
+
+def main(argv=None):
+    """Command line entry: serve a store until interrupted."""
+    from datadough.engine import DataBase
+    from datadough.hangar import DataHangar
+    from datadough.cache import ResultCache
+
+    parser = argparse.ArgumentParser(
+        description="Serve reads of a datadough store to local clients.")
+    parser.add_argument("path", help="store to serve")
+    parser.add_argument("--socket", default=None,
+                        help="path of a Unix socket to listen on")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7321,
+                        help="TCP port to listen on, if no --socket")
+    parser.add_argument("--backend", default="hdf")
+    parser.add_argument("--cache-mb", type=int, default=256,
+                        help="memory for hot series; 0 for none")
+
+    args = parser.parse_args(argv)
+
+    result_cache = ResultCache(max_bytes=args.cache_mb * 2**20) \
+        if args.cache_mb > 0 else None
+    database = DataBase(
+        result_cache=result_cache,
+        hangar=DataHangar(args.path, keep_open=True, backend=args.backend))
+
+    address = args.socket if args.socket is not None \
+        else (args.host, args.port)
+
+    with QueryServer(database, address) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
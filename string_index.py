@@ -0,0 +1,286 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+class StringIndex(object):
+    """Secondary index of one string column of a table.
+
+    Kept in two tables next to the indexed one: '<prefix>/<key>/<column>'
+    with the values, indexed by row id, and '<prefix>/<key>/<column>_grams'
+    with the (gram, row id) pairs of all n-grams of every value, each gram
+    packed into one int64 of its code points. In memory, values are held
+    sorted, for equality and prefix lookups by binary search, and so are
+    the grams, whose postings narrow substring searches down to few
+    candidates.
+
+    Rows added with `Table.add_new()` are indexed on the way in. The
+    number of rows of the indexed table the index is up to date with is
+    kept in the root node attributes; writes bypassing `update()` (e.g.
+    `DataHangar.append()` or the writer spool) change that number, and
+    the index is rebuilt on its next use.
+
+    Parameters
+    ----------
+    hangar : DataHangar
+    key : str
+        of the indexed table
+    column : str
+    n : int
+        length of the n-grams, at most 3
+
+    """
+    # group of the index tables
+    prefix = "string_index"
+
+    # root attribute with the rows of the indexed tables, by values key
+    synced_key = "string_index_rows"
+
+    # substring searches stop intersecting postings below this many rows
+    few_candidates = 64
+
+    def __init__(self, hangar, key, column, n=3):
+        """
+        """
+        self.hangar = hangar
+        self.key = key
+        self.column = column
+        self.n = n
+
+        self.values_key = "/".join((self.prefix, key, column))
+        self.grams_key = self.values_key + "_grams"
+
+        # sorted values and their row ids
+        self._values = None
+        self._ids = None
+
+        # row ids, sorted, and their values
+        self._sorted_ids = None
+        self._values_by_id = None
+
+        # sorted grams and their row ids
+        self._grams = None
+        self._gram_ids = None
+
+    def grams(self, values):
+        """Distinct n-grams of every value, as int64 codes.
+
+        Parameters
+        ----------
+        values : pandas.Series
+            of str, indexed by row id
+
+        Returns
+        -------
+        res : pandas.DataFrame
+            with columns 'gram' and 'row_id'
+
+        """
+        chars = np.asarray(values.tolist(), dtype=str)
+        width = chars.dtype.itemsize // 4
+
+        if (len(chars) < 1) or (width < self.n):
+            return pd.DataFrame({"gram": np.array([], dtype=np.int64),
+                                 "row_id": np.array([], dtype=np.int64)})
+
+        # code points, one row per value, padded with zeros
+        codes = chars.view(np.uint32).reshape(len(chars), width) \
+            .astype(np.int64)
+        lengths = np.char.str_len(chars)
+
+        res = np.zeros((len(chars), width - self.n + 1), dtype=np.int64)
+        for p in range(self.n):
+            res = (res << 21) | codes[:, p:(width - self.n + 1 + p)]
+
+        valid = np.arange(width - self.n + 1) <= \
+            (lengths[:, np.newaxis] - self.n)
+        row_id = np.broadcast_to(
+            values.index.to_numpy(dtype=np.int64)[:, np.newaxis], res.shape)
+
+        res = pd.DataFrame({"gram": res[valid], "row_id": row_id[valid]}) \
+            .drop_duplicates()
+
+        return res
+
+    def _encode(self, text):
+        """int64 codes of the n-grams of `text`."""
+        codes = [ord(c) for c in text]
+
+        res = set()
+        for p in range(len(codes) - self.n + 1):
+            code = 0
+            for c in codes[p:(p + self.n)]:
+                code = (code << 21) | c
+            res.add(code)
+
+        return res
+
+    def _append(self, values, itemsize=None):
+        """Write the index rows of `values` to the index tables."""
+        values = values.dropna().astype(str)
+
+        if itemsize is None:
+            itemsize = max([256] + [len(p) for p in values])
+
+        # read in full only, so no pytables indexes
+        self.hangar.append(self.values_key, values.to_frame("value"),
+                           index=False, min_itemsize={"value": itemsize})
+        self.hangar.append(self.grams_key, self.grams(values), index=False)
+
+    def _synced_rows(self):
+        """Rows of the indexed table the index is up to date with."""
+        return self.hangar.get_attrs(self.synced_key, default={}) \
+            .get(self.values_key)
+
+    def _mark_synced(self):
+        synced = dict(self.hangar.get_attrs(self.synced_key, default={}))
+        synced[self.values_key] = self.hangar.nrows(self.key)
+        self.hangar.set_attrs(self.synced_key, synced)
+
+    def build(self):
+        """(Re)build the index from the indexed table."""
+        with self.hangar.session():
+            values = self.hangar.select(self.key, columns=[self.column])
+
+            for k in (self.values_key, self.grams_key):
+                if k in self.hangar:
+                    self.hangar.remove(k)
+
+            self._append(values[self.column])
+            self._mark_synced()
+
+        self._values = None
+
+    def update(self, new):
+        """Index rows just appended to the indexed table.
+
+        Parameters
+        ----------
+        new : pandas.Series
+            of values, indexed by row id
+
+        """
+        if (self.values_key not in self.hangar) or (len(new) < 1):
+            # built on first use
+            return
+
+        with self.hangar.session():
+            # rows written bypassing the index before these: start over
+            if self._synced_rows() != self.hangar.nrows(self.key) - len(new):
+                self.build()
+                return
+
+            try:
+                self._append(new, itemsize=256)
+                self._mark_synced()
+            except ValueError:
+                # values longer than the column of the index table
+                self.build()
+
+        self._values = None
+
+    def _load(self):
+        """Read the index, building it if missing or stale, or reloading it
+        if rows were added meanwhile."""
+        with self.hangar.session():
+            if (self.values_key not in self.hangar) or \
+                    (self._synced_rows() != self.hangar.nrows(self.key)):
+                self.build()
+
+            n_rows = self.hangar.nrows(self.values_key)
+            if (self._values is not None) and (len(self._values) == n_rows):
+                return
+
+            values = self.hangar.get(self.values_key)["value"]
+            grams = self.hangar.get(self.grams_key)
+
+        # plain numpy arrays, for fast binary search
+        values_arr = values.to_numpy(dtype=object).astype(str)
+        ids = values.index.to_numpy(dtype=np.int64)
+
+        order = np.argsort(values_arr, kind="mergesort")
+        self._values = values_arr[order]
+        self._ids = ids[order]
+
+        order = np.argsort(ids, kind="mergesort")
+        self._sorted_ids = ids[order]
+        self._values_by_id = values_arr[order]
+
+        order = np.argsort(grams["gram"].values, kind="mergesort")
+        self._grams = grams["gram"].values[order]
+        self._gram_ids = grams["row_id"].values[order]
+
+    def equal(self, values):
+        """Row ids of rows whose value is one of `values`.
+
+        Returns
+        -------
+        res : numpy.ndarray
+            sorted
+
+        """
+        self._load()
+
+        res = [self._ids[np.searchsorted(self._values, v, side="left"):
+                         np.searchsorted(self._values, v, side="right")]
+               for v in pd.unique(np.asarray(values, dtype=str))]
+
+        return np.unique(np.concatenate(res + [np.array([], np.int64)]))
+
+    def startswith(self, prefix):
+        """Row ids of rows whose value starts with `prefix`."""
+        self._load()
+
+        start = np.searchsorted(self._values, prefix, side="left")
+        stop = np.searchsorted(self._values, prefix + chr(0x10ffff),
+                               side="left")
+
+        return np.sort(self._ids[start:stop])
+
+    def contains(self, pattern, regex=True):
+        """Row ids of rows whose value contains `pattern`.
+
+        Parameters
+        ----------
+        pattern : str
+        regex : bool
+            as in pandas.Series.str.contains
+
+        Returns
+        -------
+        res : numpy.ndarray
+            sorted
+
+        """
+        self._load()
+
+        # regular expressions: no literal text known to be in a match
+        if regex and (re.search(r"[.^$*+?{}\[\]\\|()]", pattern) is not None):
+            grams = set()
+        else:
+            grams = self._encode(pattern)
+
+        # postings of the grams of `pattern`, shortest first
+        postings = [self._gram_ids[
+            np.searchsorted(self._grams, g, side="left"):
+            np.searchsorted(self._grams, g, side="right")] for g in grams]
+        postings.sort(key=len)
+
+        if len(postings) > 0:
+            candidates = np.unique(postings[0])
+            for p in postings[1:]:
+                if len(candidates) <= self.few_candidates:
+                    break
+                candidates = np.intersect1d(candidates, p)
+
+            values = self._values_by_id[
+                np.searchsorted(self._sorted_ids, candidates)]
+        else:
+            candidates = self._sorted_ids
+            values = self._values_by_id
+
+        found = pd.Series(values, dtype=object).str.contains(pattern,
+                                                             regex=regex)
+
+        return candidates[found.values.astype(bool)]
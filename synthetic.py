@@ -0,0 +1,179 @@
+"""Synthetic databases of any size, for testing and benchmarking.
+
+Run as `python -m datadough.synthetic path [--objects N] [--types M] ...`.
+"""
+import time
+import argparse
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from datadough import engine
+from datadough.hangar import DataHangar
+
+
+@contextmanager
+def using(hangar):
+    """Point the engine to `hangar` for the duration of the context."""
+    default, engine.hangar = engine.hangar, hangar
+
+    try:
+        yield hangar
+    finally:
+        engine.hangar = default
+
+
+def dimensions(n_objects, n_types, n_providers, n_currencies, n_versions):
+    """Rows of the dimension tables.
+
+    Returns
+    -------
+    res : dict
+        {key: pandas.DataFrame}, in the order of creation
+
+    """
+    res = dict()
+
+    res["data_object"] = pd.DataFrame({
+        "long_name": ["synthetic object {:07d}".format(p)
+                      for p in range(n_objects)]
+    })
+    res["data_type"] = pd.DataFrame({
+        "short_name": ["type_{:04d}".format(p) for p in range(n_types)],
+        "long_name": ["synthetic type {:04d}".format(p)
+                      for p in range(n_types)],
+        "nature": "float"
+    })
+    res["data_provider"] = pd.DataFrame({
+        "long_name": ["provider_{:03d}".format(p) for p in range(n_providers)]
+    })
+    res["currency"] = pd.DataFrame({
+        "iso": ["c{:02d}".format(p) for p in range(n_currencies)],
+        "long_name": ["currency {:02d}".format(p)
+                      for p in range(n_currencies)]
+    })
+    res["data_version"] = pd.DataFrame({
+        "concept_header_id": 0,
+        "date_created": pd.Timestamp("2018-01-01"),
+        "description": ["default"] + ["version_{:03d}".format(p)
+                                      for p in range(1, n_versions)]
+    })
+
+    return res
+
+
+def generate(hangar, n_objects=100, n_types=10, n_versions=1, n_dates=1000,
+             n_providers=2, n_currencies=5, start="1990-01-01", freq='B',
+             chunksize=10**7, seed=0):
+    """Populate an empty store with a synthetic database.
+
+    Every data object comes in every data type, from one provider in one
+    currency (cycling through them), and in every version: there are
+    `n_objects * n_types` concept headers, `n_versions` times as many time
+    series headers, and a random walk of `n_dates` observations per time
+    series. Observations are generated and saved in chunks of at most
+    `chunksize` rows, so that 10^8 of them fit in memory.
+
+    Parameters
+    ----------
+    hangar : DataHangar
+    n_objects, n_types, n_versions, n_dates, n_providers, n_currencies : int
+    start : str
+        first observation date
+    freq : str
+        of observation dates
+    chunksize : int
+        largest number of observations held in memory
+    seed : int
+
+    Returns
+    -------
+    res : dict
+        {'headers', 'rows', 'seconds'}
+
+    """
+    t_start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+
+    with using(hangar):
+        with hangar.session():
+            # as Table(schema=None) reads them
+            for key, schema in engine.SCHEMAS.items():
+                hangar.set_attrs(key, schema)
+
+            for key, rows in dimensions(n_objects, n_types, n_providers,
+                                        n_currencies, n_versions).items():
+                engine.Table(key, schema=engine.SCHEMAS[key]).add_new(rows)
+
+            # object-major: the headers of one object are adjacent
+            obj, typ = np.divmod(np.arange(n_objects * n_types), n_types)
+            concept_header = pd.DataFrame({
+                "data_object_id": obj,
+                "data_type_id": typ,
+                "data_provider_id": obj % n_providers,
+                "currency_id": obj % n_currencies
+            })
+            engine.Table("concept_header",
+                         schema=engine.SCHEMAS["concept_header"]) \
+                .add_new(concept_header)
+
+            ts_header = pd.DataFrame({
+                "concept_header_id": np.repeat(np.arange(len(concept_header)),
+                                               n_versions),
+                "data_version_id": np.tile(np.arange(n_versions),
+                                           len(concept_header))
+            })
+            ts_header_ids = engine.Table(
+                "ts_header", schema=engine.SCHEMAS["ts_header"]) \
+                .add_new(ts_header)
+
+        dates = pd.date_range(start, periods=n_dates, freq=freq).values
+        timeseries = engine.Timeseries()
+        per_chunk = max(1, chunksize // n_dates)
+
+        for p in range(0, len(ts_header_ids), per_chunk):
+            ids = np.asarray(ts_header_ids[p:(p + per_chunk)])
+            walks = rng.normal(size=(len(ids), n_dates)).cumsum(axis=1)
+
+            timeseries.save(pd.DataFrame({
+                "header_id": np.repeat(ids, n_dates),
+                "obs_date": np.tile(dates, len(ids)),
+                "obs_value": walks.ravel()
+            }), chunksize=min(chunksize, 500000))
+
+    res = {"headers": len(ts_header_ids),
+           "rows": len(ts_header_ids) * n_dates,
+           "seconds": time.perf_counter() - t_start}
+
+    return res
+
+
+def main(argv=None):
+    """Command line entry: create a synthetic store."""
+    parser = argparse.ArgumentParser(
+        description="Create a synthetic datadough store.")
+    parser.add_argument("path", help="path to the (new) store")
+    parser.add_argument("--objects", type=int, default=100)
+    parser.add_argument("--types", type=int, default=10)
+    parser.add_argument("--versions", type=int, default=1)
+    parser.add_argument("--dates", type=int, default=1000)
+    parser.add_argument("--backend", default="hdf")
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+
+    hangar = DataHangar(args.path, backend=args.backend)
+    res = generate(hangar, n_objects=args.objects, n_types=args.types,
+                   n_versions=args.versions, n_dates=args.dates,
+                   seed=args.seed)
+    hangar.close()
+
+    print("{headers} series, {rows} observations in {seconds:.1f} s"
+          .format(**res))
+
+    return res
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import pandas as pd
+import numpy as np
+import unittest
+import asyncio
+import time
+import os
+
+from datadough.engine import DataBase, hangar
+from datadough.aio import AsyncDataBase
+
+
+class TestAsyncDataBase(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        data_version = pd.DataFrame({
+            "concept_header_id": [0],
+            "date_created": [pd.Timestamp("2018-01-01")],
+            "description": ["default"]
+        })
+
+        with pd.HDFStore(hangar.path_to_hdf, mode='w') as h:
+            h.put("data_version", data_version, format='t', data_columns=True)
+
+        self.data = pd.DataFrame(
+            data=np.random.normal(size=(60, 3)),
+            index=pd.date_range("2000-01-01", periods=60, freq='D'),
+            columns=[0, 1, 2])
+
+        self.header = pd.Series({"a": 0, "b": 1, "c": 2})
+        self.db = DataBase()
+
+    def tearDown(self):
+        """
+        """
+        hangar.close()
+        os.remove(hangar.path_to_hdf)
+
+    def test_read_write(self):
+        """
+        """
+        async def main():
+            async with AsyncDataBase(self.db, max_concurrency=2) as adb:
+                # writes are serialized, reads see them once done
+                await asyncio.gather(
+                    adb.save_data(self.data.iloc[:30]),
+                    adb.save_data(self.data.iloc[30:]))
+
+                res = await asyncio.gather(*[
+                    adb.get_data(self.header, "2000-01-01", "2000-03-31",
+                                 'D') for _ in range(4)])
+
+                batches = [p async for p in adb.iter_data(
+                    self.header, "2000-01-01", "2000-03-31", 'D',
+                    batch_size=2)]
+
+            return res, batches
+
+        res, batches = asyncio.run(main())
+
+        expected = self.data.copy()
+        expected.columns = self.header.index
+        for p in res:
+            self.assertTrue(np.allclose(p.values, expected.values))
+
+        self.assertEqual([p.shape[1] for p in batches], [2, 1])
+
+    def test_timeout(self):
+        """
+        """
+        def slow_get_data(*args, **kwargs):
+            time.sleep(0.5)
+            return pd.DataFrame()
+
+        self.db.get_data = slow_get_data
+
+        async def main():
+            async with AsyncDataBase(self.db, max_concurrency=1) as adb:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await adb.get_data(self.header, None, None, 'D',
+                                       timeout=0.05)
+
+                # the loop is not blocked meanwhile
+                t_start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                self.assertLess(time.perf_counter() - t_start, 0.2)
+
+        asyncio.run(main())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import pandas as pd
+import numpy as np
+import unittest
+import tempfile
+import shutil
+import os
+
+from datadough.engine import DataBase, hangar
+from datadough.hangar import DataHangar
+from datadough.cache import ResultCache
+
+
+class TestDataBase(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        data_version = pd.DataFrame({
+            "concept_header_id": [0],
+            "date_created": [pd.Timestamp("2018-01-01")],
+            "description": ["default"]
+        })
+
+        with pd.HDFStore(hangar.path_to_hdf, mode='w') as h:
+            h.put("data_version", data_version, format='t', data_columns=True)
+
+        data = pd.DataFrame(
+            data=np.random.normal(size=(120, 5)),
+            index=pd.date_range("2000-01-01", periods=120, freq='D'),
+            columns=[3, 1, 4, 0, 2])
+        data.iloc[:10, 1] = np.nan
+
+        self.db = DataBase()
+        self.db.save_data(data)
+
+        self.header = pd.Series({"c": 4, "a": 0, "b": 2, "d": 1})
+        self.data = data
+
+    def tearDown(self):
+        """
+        """
+        hangar.close()
+        os.remove(hangar.path_to_hdf)
+
+    def test_get_data(self):
+        """
+        """
+        res = self.db.get_data(self.header, "2000-01-15", "2000-03-31", 'MS')
+
+        expected = self.data.loc["2000-01-15":"2000-03-31",
+                                 self.header.values]
+        expected = expected.resample('MS').last()
+        expected.columns = self.header.index
+
+        self.assertTrue(np.allclose(res.values, expected.values,
+                                    equal_nan=True))
+        self.assertTrue(res.columns.equals(expected.columns))
+
+    def test_iter_data(self):
+        """
+        """
+        expected = self.db.get_data(self.header, "2000-01-15", "2000-03-31",
+                                    'MS')
+
+        batches = list(self.db.iter_data(self.header, "2000-01-15",
+                                         "2000-03-31", 'MS', batch_size=3))
+        self.assertEqual([b.shape[1] for b in batches], [3, 1])
+
+        res = pd.concat(batches, axis=1)
+        self.assertTrue(res.equals(expected))
+
+    def test_parallel(self):
+        """
+        """
+        expected = self.db.get_data(self.header, "2000-01-15", "2000-03-31",
+                                    'D')
+
+        try:
+            res = self.db.get_data(self.header, "2000-01-15", "2000-03-31",
+                                   'D', n_workers=2, batch_size=3)
+        finally:
+            self.db.close()
+
+        pd.testing.assert_frame_equal(res, expected)
+
+    def test_result_cache(self):
+        """
+        """
+        cache = ResultCache(max_bytes=10**6)
+        db = DataBase(result_cache=cache)
+
+        expected = self.db.get_data(self.header, "2000-01-01", "2000-04-29",
+                                    'MS')
+
+        # raw data
+        db.get_data(self.header, "2000-02-01", "2000-02-29", 'MS',
+                    rollups=False)
+        db.get_data(self.header, "2000-02-10", "2000-02-20", 'MS',
+                    rollups=False)
+        res = db.get_data(self.header, "2000-01-01", "2000-04-29", 'MS',
+                          rollups=False)
+
+        self.assertEqual(cache.stats,
+                         {"hits": 1, "partial_hits": 1, "misses": 1})
+        self.assertTrue(res.equals(expected))
+
+        # data read from rollups, for the interval asked for only
+        for date_to in ("2000-04-15", "2000-04-15", "2000-04-29"):
+            res = db.get_data(self.header, "2000-01-01", date_to, 'MS')
+            pd.testing.assert_frame_equal(
+                res, self.db.get_data(self.header, "2000-01-01", date_to,
+                                      'MS', rollups=False))
+
+        self.assertEqual(cache.stats,
+                         {"hits": 2, "partial_hits": 1, "misses": 3})
+
+        # writes invalidate
+        new = pd.DataFrame({4: [100.0]}, index=[pd.Timestamp("2000-04-30")])
+        db.save_data(new)
+        res = db.get_data(self.header, "2000-01-01", "2000-04-30", 'MS',
+                          rollups=False)
+
+        self.assertEqual(cache.misses, 4)
+        self.assertEqual(res.loc["2000-04-01", "c"], 100.0)
+
+    def test_own_hangar(self):
+        """
+        """
+        tmp_dir = tempfile.mkdtemp()
+        other = DataHangar(os.path.join(tmp_dir, "other.h5"))
+
+        try:
+            db = DataBase(hangar=other)
+            self.assertEqual(len(db._tables), 0)
+
+            db.save_data(self.data.iloc[:5, :2] * 2)
+            self.assertEqual(list(db._tables), ["timeseries"])
+
+            res = db.get_data(pd.Series({"a": 3}), None, None, 'D')
+            self.assertTrue(np.allclose(res["a"].values,
+                                        self.data.iloc[:5, 0].values * 2))
+
+            # the default store is left alone
+            self.assertEqual(hangar.nrows("timeseries"), 590)
+        finally:
+            other.close()
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
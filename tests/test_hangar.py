@@ -0,0 +1,129 @@
+import pandas as pd
+import numpy as np
+import unittest
+import tempfile
+import shutil
+import os
+
+from datadough.hangar import DataHangar, Backend
+
+
+class TestDataHangar(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "test_hangar.h5")
+
+        test_df = pd.DataFrame(data=np.eye(3), columns=["col_1", "col_2",
+                                                        "col_3"])
+
+        with pd.HDFStore(self.path, mode='w') as h:
+            h.put("test_table", test_df, format="table", data_columns=True)
+
+        self.test_df = test_df
+
+    def tearDown(self):
+        """
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def test_keep_open_reuses_handle(self):
+        """
+        """
+        hangar = DataHangar(self.path, keep_open=True)
+        hangar.select("test_table")
+        handle = hangar._handle
+        hangar.select("test_table", where="col_1 > 0")
+
+        self.assertIs(hangar._handle, handle)
+        hangar.close()
+        self.assertFalse(hangar.is_open)
+
+    def test_read_after_write(self):
+        """
+        """
+        hangar = DataHangar(self.path, keep_open=True)
+        self.assertEqual(len(hangar.select("test_table")), 3)
+
+        hangar.append("test_table", self.test_df.set_axis([3, 4, 5]))
+        self.assertEqual(len(hangar.select("test_table")), 6)
+        hangar.close()
+
+    def test_session(self):
+        """
+        """
+        hangar = DataHangar(self.path)
+
+        with hangar.session():
+            hangar.select("test_table")
+            hangar.append("test_table", self.test_df.set_axis([3, 4, 5]))
+            self.assertEqual(len(hangar.select("test_table")), 6)
+            self.assertTrue(hangar.is_open)
+
+        self.assertFalse(hangar.is_open)
+
+    def test_indexes(self):
+        """
+        """
+        hangar = DataHangar(self.path)
+        hangar.declare_index_columns("test_table", ("col_1", "col_2"))
+
+        res = hangar.verify_indexes()
+        self.assertEqual(res.index.get_level_values("column").tolist(),
+                         ["col_1", "col_2"])
+        self.assertFalse(res["ok"].any())
+
+        res = hangar.rebuild_indexes()
+        self.assertTrue(res["ok"].all())
+
+        # appends within the context leave indexes alone until the exit
+        with hangar.deferred_indexing():
+            for p in range(3):
+                hangar.append("test_table",
+                              self.test_df.set_axis([3 * p + 3, 3 * p + 4,
+                                                     3 * p + 5]))
+            self.assertFalse(
+                hangar._handle.get_storer("test_table").table.autoindex)
+
+        self.assertTrue(hangar.verify_indexes()["ok"].all())
+        self.assertEqual(len(hangar.select("test_table", "col_1 > 0")), 4)
+
+        # small appends to a large table extend its indexes instead
+        hangar.append("test_table", pd.DataFrame(
+            np.zeros((1000, 3)), columns=self.test_df.columns,
+            index=np.arange(1000) + 12))
+        hangar.rebuild_indexes()
+
+        rebuilt = []
+        create_csi = hangar.backend._create_csi
+        hangar.backend._create_csi = \
+            lambda h, key, **kwargs: rebuilt.append(key) or \
+            create_csi(h, key, **kwargs)
+
+        with hangar.deferred_indexing():
+            hangar.append("test_table", self.test_df.set_axis([1012, 1013,
+                                                               1014]))
+            self.assertTrue(
+                hangar._handle.get_storer("test_table").table.autoindex)
+
+        self.assertEqual(rebuilt, [])
+        self.assertFalse(hangar.verify_indexes()["dirty"].any())
+        self.assertEqual(len(hangar.select("test_table", "col_1 > 0")), 5)
+
+    def test_incomplete_backend(self):
+        """
+        """
+        class ReadOnly(Backend):
+            def select(self, key, where=None, columns=None, start=None,
+                       stop=None):
+                return pd.DataFrame()
+
+        with self.assertRaises(TypeError):
+            ReadOnly(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import pandas as pd
+import numpy as np
+import unittest
+import tempfile
+import shutil
+import os
+
+from datadough import engine
+from datadough.engine import ConceptHeader, DataVersion, TSHeader
+from datadough.hangar import DataHangar
+from datadough.synthetic import generate
+
+
+class TestConceptHeader(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        dimensions = {
+            "data_object": pd.DataFrame({"short_name": ["ois_1m_eur", "eur",
+                                                        "usd"]}),
+            "data_type": pd.DataFrame({"short_name": ["interest_rate",
+                                                      "p_close_mid"]}),
+            "data_provider": pd.DataFrame({"long_name": ["datastream"]}),
+            "currency": pd.DataFrame({"iso": ["eur", "usd"]}),
+        }
+
+        concept_header = pd.DataFrame(
+            columns=["data_object_id", "data_type_id", "data_provider_id",
+                     "currency_id"],
+            data=np.array([[0, 0, 0, 0]])
+        )
+
+        with pd.HDFStore("c:/temp/test_hdf.h5", mode='w') as hangar:
+            for k, v in dimensions.items():
+                hangar.put(k, v, format='t', data_columns=True)
+                hangar.root._v_attrs[k] = {
+                    "required_columns": tuple(v.columns),
+                    "default_column": v.columns[0]
+                }
+
+            hangar.put("concept_header", concept_header, format='t',
+                       data_columns=True)
+
+        self.header = ConceptHeader()
+
+    def tearDown(self):
+        """
+        """
+        os.remove("c:/temp/test_hdf.h5")
+
+    def test_get_id_single(self):
+        """
+        """
+        info = {"data_object_id": "ois_1m_eur", "data_type_id": 0,
+                "data_provider_id": "datastream", "currency_id": "eur"}
+
+        self.assertEqual(self.header.get_id(info), 0)
+
+        info["data_type_id"] = "p_close_mid"
+        self.assertEqual(self.header.get_id(info), [])
+        self.assertEqual(self.header.get_id(info, create=True), 1)
+
+    def test_get_id_multiindex(self):
+        """
+        """
+        columns = pd.MultiIndex.from_tuples(
+            [("ois_1m_eur", "interest_rate", "datastream", "eur"),
+             ("eur", "p_close_mid", "datastream", "usd"),
+             ("usd", "p_close_mid", "datastream", "eur"),
+             ("eur", "p_close_mid", "datastream", "usd")],
+            names=["data_object_id", "data_type_id", "data_provider_id",
+                   "currency_id"]
+        )
+
+        res = self.header.get_id(columns)
+        self.assertTrue(res.isnull().iloc[1:].all())
+
+        res = self.header.get_id(columns, create=True)
+        self.assertEqual(res.tolist(), [0, 1, 2, 1])
+        self.assertEqual(len(self.header.index), 3)
+
+    def test_get_id_unknown_label(self):
+        """
+        """
+        info = {"data_object_id": "gbp", "data_type_id": 0,
+                "data_provider_id": 0, "currency_id": 0}
+
+        with self.assertRaises(ValueError):
+            self.header.get_id(info, create=True)
+
+
+class TestDataVersion(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.hangar = DataHangar(os.path.join(self.tmp_dir, "versions.h5"))
+
+        # ts header id = 3 * concept header id + version id
+        generate(self.hangar, n_objects=3, n_types=2, n_versions=3,
+                 n_dates=5)
+
+        self.version = DataVersion(hangar=self.hangar)
+
+    def tearDown(self):
+        """
+        """
+        self.hangar.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_resolve(self):
+        """
+        """
+        res = self.version.resolve([5, 0, 99], "default")
+        self.assertEqual(res.iloc[:2].tolist(), [15, 0])
+        self.assertTrue(np.isnan(res.iloc[2]))
+
+        # versions created at the same time: the last one
+        res = self.version.resolve([5, 0], "newest")
+        self.assertEqual(res.tolist(), [17, 2])
+
+        res = self.version.resolve([5, 0], "pinned", "version_001")
+        self.assertEqual(res.tolist(), [16, 1])
+        res = self.version.resolve([5, 0, 5], "pinned", [0, "version_002", 1])
+        self.assertEqual(res.tolist(), [15, 2, 16])
+
+        self.assertEqual(self.version.get_newest(4), 2)
+        self.assertEqual(self.version.get_default([4, 1]).tolist(), [0, 0])
+
+    def test_ts_header_get_id(self):
+        """
+        """
+        info = {"data_object_id": "synthetic object 0000002",
+                "data_type_id": "type_0001",
+                "data_provider_id": 0, "currency_id": 2}
+        ts_header = TSHeader(hangar=self.hangar)
+
+        self.assertEqual(ts_header.get_id(info), 15)
+        self.assertEqual(ts_header.get_id(info, version="newest"), 17)
+        self.assertEqual(ts_header.get_id(dict(info, data_version_id=1)), 16)
+
+        header = pd.DataFrame({"a": info, "b": dict(info, data_type_id=0)})
+        data = engine.DataBase(hangar=self.hangar).get_data(
+            header, None, None, 'B', version="version_001")
+        expected = engine.Timeseries(hangar=self.hangar).get_data([16, 13])
+
+        self.assertTrue(np.array_equal(data.values, expected.values))
+
+
+if __name__ == "__main__":
+    unittest.main()
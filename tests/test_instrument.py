@@ -0,0 +1,88 @@
+import pandas as pd
+import unittest
+import tempfile
+import shutil
+import json
+import os
+
+from datadough import engine, instrument
+from datadough.hangar import DataHangar
+from datadough.synthetic import generate, using
+
+
+class TestInstrument(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.hangar = DataHangar(os.path.join(self.tmp_dir, "synthetic.h5"))
+        generate(self.hangar, n_objects=3, n_types=2, n_dates=10)
+
+    def tearDown(self):
+        """
+        """
+        instrument.disable()
+        self.hangar.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_records(self):
+        """
+        """
+        buffer = instrument.RingBuffer()
+        path = os.path.join(self.tmp_dir, "calls.jsonl")
+        instrument.enable(buffer, instrument.JSONLinesSink(path))
+
+        with using(self.hangar):
+            engine.ConceptHeader().columns["data_object_id"] == 2
+            engine.DataBase().get_data(pd.Series({"a": 0, "b": 5}),
+                                       None, None, 'B')
+
+        records = buffer.records
+
+        selects = [p for p in records
+                   if p["op"] == "select" and p["key"] == "concept_header"]
+        self.assertGreater(len(selects), 0)
+        self.assertEqual(selects[0]["caller"], "Table.filter")
+        self.assertEqual(selects[0]["where"], "data_object_id == 2")
+        self.assertEqual(selects[0]["shape"], "data_object_id == ?")
+        self.assertEqual(selects[0]["rows"], 2)
+        self.assertEqual(selects[0]["stack"], "Column.__eq__ > Table.filter")
+
+        reads = [p for p in records if p["key"] == "timeseries"]
+        self.assertGreater(len(reads), 0)
+        self.assertTrue(
+            all(p["stack"].startswith("DataBase.get_data") for p in reads))
+
+        report = buffer.summary(top=3)
+        self.assertLessEqual(len(report), 3)
+        self.assertTrue(report["seconds"].is_monotonic_decreasing)
+
+        # bytes of strings count in full
+        names = self.hangar.select("data_object")
+        self.assertGreater(buffer.records[-1]["bytes"],
+                           names["long_name"].str.len().sum())
+
+        # failing calls are recorded, too
+        with self.assertRaises(KeyError):
+            self.hangar.select("no_such_table")
+        self.assertTrue(buffer.records[-1]["error"].startswith("KeyError"))
+        self.assertIsNone(buffer.records[-1]["rows"])
+        self.assertEqual(buffer.summary(top=None)["errors"].sum(), 1)
+
+        records = buffer.records
+
+        instrument.disable()
+        with open(path) as f:
+            lines = [json.loads(p) for p in f]
+        self.assertEqual(len(lines), len(records))
+
+        # nothing recorded once disabled
+        with using(self.hangar):
+            engine.ConceptHeader().columns["data_object_id"] == 2
+        self.assertEqual(len(buffer.records), len(records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import pandas as pd
+import numpy as np
+import unittest
+import tempfile
+import shutil
+import os
+
+from datadough.engine import Timeseries, hangar
+from datadough.mmap_store import MmapStore
+
+
+class TestMmapStore(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = MmapStore(self.tmp_dir)
+
+        dates = pd.date_range("2000-01-01", periods=50, freq='D')
+        self.data = pd.DataFrame({
+            "header_id": np.repeat(np.arange(4), 50),
+            "obs_date": np.tile(dates.values, 4),
+            "obs_value": np.arange(200.)
+        })
+
+        self.ts = Timeseries(mmap_store=self.store)
+        self.ts.save(self.data)
+
+    def tearDown(self):
+        """
+        """
+        hangar.close()
+        os.remove(hangar.path_to_hdf)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_data(self):
+        """
+        """
+        expected = self.ts.get_data([3, 1], "2000-01-10", "2000-01-20")
+
+        res = self.store.refresh(self.ts, header=[1, 2])
+        self.assertEqual(res, {"headers": 2, "rows": 100})
+        self.assertEqual(self.store.covers([3, 1], self.ts).tolist(),
+                         [False, True])
+
+        # one series from the memory map, one from the store
+        res = self.ts.get_data([3, 1], "2000-01-10", "2000-01-20")
+        self.assertTrue(res.equals(expected))
+
+        one = self.store.get(2, "2000-01-10", "2000-01-10")
+        self.assertEqual(one.tolist(), [109.0])
+
+        # saving to other series leaves the copy be...
+        self.ts.save(self.data.iloc[:1])
+        self.assertEqual(self.store.covers([1, 2], self.ts).tolist(),
+                         [True, True])
+
+        # ...saving to one makes its copy stale
+        self.ts.save(self.data.iloc[50:51])
+        self.assertEqual(self.store.covers([1, 2], self.ts).tolist(),
+                         [False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import pandas as pd
+import numpy as np
+import unittest
+import tempfile
+import shutil
+import os
+
+from datadough.hangar import DataHangar
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class TestParquetBackend(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.hangar = DataHangar(os.path.join(self.tmp_dir, "store"),
+                                 backend="parquet")
+
+        dates = pd.date_range("1999-12-01", periods=90, freq='D')
+        self.timeseries = pd.DataFrame({
+            "header_id": np.repeat(np.arange(4, dtype=np.int32), 90),
+            "obs_date": np.tile(dates.values, 4),
+            "obs_value": np.arange(360.)
+        })
+
+    def tearDown(self):
+        """
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def test_select(self):
+        """
+        """
+        self.hangar.append("timeseries", self.timeseries.iloc[:200])
+        self.hangar.append("timeseries", self.timeseries.iloc[200:])
+
+        self.assertEqual(self.hangar.keys(), ["/timeseries"])
+        self.assertEqual(self.hangar.nrows("timeseries"), 360)
+
+        where = "(header_id == [1, 3]) & " \
+                "(obs_date >= Timestamp('2000-01-01')) & (obs_value < 300)"
+        res = self.hangar.select("timeseries", where=where,
+                                 columns=["obs_value"])
+
+        expected = self.timeseries.query(
+            "header_id in [1, 3] and obs_date >= '2000-01-01' and "
+            "obs_value < 300")
+
+        self.assertEqual(res.columns.tolist(), ["obs_value"])
+        self.assertEqual(sorted(res.index), expected.index.tolist())
+
+        # long value lists are filtered by the parquet reader
+        res = self.hangar.select_isin("timeseries", "header_id", [0, 2],
+                                      columns=["obs_value"])
+        self.assertEqual(res.columns.tolist(), ["obs_value"])
+        self.assertEqual(sorted(res.index), list(range(90)) +
+                         list(range(180, 270)))
+        self.assertEqual(len(self.hangar.select_isin(
+            "timeseries", "index", [5, 359, 400])), 2)
+
+        # the start/stop slice follows row ids
+        res = self.hangar.select("timeseries", start=195, stop=205)
+        self.assertEqual(res.index.tolist(), list(range(195, 205)))
+
+    def test_attrs_and_ids(self):
+        """
+        """
+        self.hangar.append("data_type",
+                           pd.DataFrame({"short_name": ["a", "b"]}))
+        self.hangar.set_attrs("data_type", {"default_column": "short_name"})
+
+        self.assertEqual(self.hangar.get_attrs("data_type"),
+                         {"default_column": "short_name"})
+        self.assertEqual(self.hangar.get_attrs("nothing", default={}), {})
+        self.assertEqual(self.hangar.reserve_ids("data_type", 2).tolist(),
+                         [2, 3])
+        self.assertEqual(
+            self.hangar.select("data_type", "short_name == 'b'").index[0], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import pandas as pd
+import numpy as np
+import unittest
+
+from datadough.query import TableQuery, parse, Term, In, Range, And, Raw
+
+
+class TestTableQuery(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        self.frame = pd.DataFrame({
+            "col_1": np.arange(10),
+            "col_2": list("abcdeabcde"),
+            "date": pd.date_range("2000-01-01", periods=10, freq='D')
+        })
+
+    def test_parse(self):
+        """
+        """
+        node = parse("(col_1 > 2) & ((col_2 == 'a') | (col_2 == 'b')) & "
+                     "(date <= Timestamp('2000-01-08'))")
+        self.assertIsInstance(node, And)
+        self.assertEqual(node.children[0], Term("col_1", ">", 2))
+        self.assertEqual(
+            node.render(),
+            "(col_1 > 2) & ((col_2 == 'a') | (col_2 == 'b')) & "
+            "(date <= Timestamp('2000-01-08 00:00:00'))")
+
+        self.assertEqual(parse("col_1 in [1, 2]"), In("col_1", [1, 2]))
+        self.assertIsInstance(parse("~(col_1 > 2)"), Raw)
+
+    def test_optimize(self):
+        """
+        """
+        qry = TableQuery("col_1 == 4").or_(TableQuery("col_1 == 2")) \
+            .or_(TableQuery("col_1 == 3")).or_(TableQuery("col_1 == 3"))
+        self.assertEqual(qry.optimize().node, Range("col_1", 2, 4))
+
+        qry = TableQuery("(col_2 == 'a') | (col_2 == 'c')")
+        self.assertEqual(qry.optimize().node, In("col_2", ['a', 'c']))
+
+        qry = TableQuery("(col_1 >= 2) & (col_1 <= 8) & (col_1 >= 4) & "
+                         "(col_2 != 'a') & (col_2 != 'a')")
+        self.assertEqual(qry.optimize().expression,
+                         "((col_1 >= 4) & (col_1 <= 8)) & (col_2 != 'a')")
+
+    def test_mask(self):
+        """
+        """
+        for expr in ("(col_1 > 2) & ((col_2 == 'a') | (col_2 == 'b'))",
+                     "(date <= Timestamp('2000-01-05')) | (index == [7, 8])",
+                     "col_2 == ['c', 'd'] and col_1 < 8"):
+            qry = TableQuery(expr)
+            expected = self.frame.query(
+                qry.expression
+                .replace("Timestamp('2000-01-05 00:00:00')", "'2000-01-05'")
+                .replace(" == [", " in ["))
+
+            res = self.frame.loc[qry.optimize().mask(self.frame)]
+            self.assertTrue(res.equals(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import unittest
+import tempfile
+import shutil
+import os
+
+from datadough import engine
+from datadough.cache import ResultCache
+from datadough.hangar import DataHangar
+from datadough.synthetic import generate
+from datadough.server import QueryServer, Client
+
+
+class TestServer(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.hangar = DataHangar(os.path.join(self.tmp_dir, "server.h5"),
+                                 keep_open=True)
+
+        # ts header id = 3 * concept header id + version id
+        generate(self.hangar, n_objects=3, n_types=2, n_versions=3,
+                 n_dates=50)
+
+        self.db = engine.DataBase(hangar=self.hangar)
+        self.server = QueryServer(
+            engine.DataBase(result_cache=ResultCache(), hangar=self.hangar),
+            os.path.join(self.tmp_dir, "server.sock"))
+        self.server.start()
+
+        self.client = Client(self.server.address, timeout=60)
+
+    def tearDown(self):
+        """
+        """
+        self.client.close()
+        self.server.close()
+        engine.disable_table_cache()
+        self.hangar.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_data(self):
+        """
+        """
+        header = pd.Series({"a": 0, "b": 7, "c": 16})
+
+        for freq in ('B', 'W'):
+            res = self.client.get_data(header, "1990-01-15", None, freq)
+            expected = self.db.get_data(header, "1990-01-15", None, freq)
+            pd.testing.assert_frame_equal(res, expected)
+
+        # headers resolved by the server
+        info = {"data_object_id": "synthetic object 0000002",
+                "data_type_id": "type_0001",
+                "data_provider_id": 0, "currency_id": 2}
+        header = pd.DataFrame({"a": info, "b": dict(info, data_type_id=0)})
+
+        res = self.client.header_id(header, version="newest")
+        self.assertEqual(res.tolist(), [17, 14])
+        self.assertEqual(res.index.tolist(), ["a", "b"])
+
+        res = pd.concat(self.client.iter_data(header, None, None, 'B',
+                                              batch_size=1), axis=1)
+        expected = self.db.get_data(header, None, None, 'B')
+        self.assertTrue(np.array_equal(res.values, expected.values,
+                                       equal_nan=True))
+
+        # hot series come from memory
+        self.client.get_data(pd.Series({"a": 0, "b": 7, "c": 16}),
+                             "1990-02-01", None, 'B')
+        self.assertGreater(self.client.stats()["result_cache"]["hits"], 0)
+
+        # errors travel back
+        with self.assertRaises(ValueError):
+            self.client.header_id(pd.DataFrame({"a": dict(info,
+                                                          currency_id=99)}))
+
+
+if __name__ == "__main__":
+    unittest.main()
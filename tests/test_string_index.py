@@ -0,0 +1,69 @@
+import pandas as pd
+import unittest
+import os
+
+from datadough import engine
+from datadough.engine import Table
+
+
+class TestStringIndex(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        schema = {
+            "required_columns": ("iso", "long_name"),
+            "default_column": "iso"
+        }
+
+        self.table = Table("currency", schema=schema)
+        self.table.add_new(pd.DataFrame({
+            "iso": ["usd", "eur", "chf", "gbp", "jpy"],
+            "long_name": ["us dollar", "euro", "swiss franc",
+                          "pound sterling", "japanese yen"]
+        }))
+
+    def tearDown(self):
+        """
+        """
+        engine.hangar.close()
+        engine.string_indexes.clear()
+        os.remove(engine.hangar.path_to_hdf)
+
+    def test_lookups(self):
+        """
+        """
+        index = self.table.string_index("long_name")
+
+        self.assertEqual(index.contains("an").tolist(), [2, 4])
+        self.assertEqual(index.contains("sterling").tolist(), [3])
+        self.assertEqual(index.contains("^(?:euro|us)").tolist(), [0, 1])
+        self.assertEqual(index.startswith("s").tolist(), [2])
+        self.assertEqual(index.equal(["euro", "ruble"]).tolist(), [1])
+        self.assertIn("/string_index/currency/long_name", engine.hangar.keys())
+
+        # new rows are indexed on the way in
+        self.table.add_new(pd.DataFrame({"iso": ["aud"],
+                                         "long_name": ["aussie dollar"]}))
+        self.assertEqual(index.contains("dollar").tolist(), [0, 5])
+
+        # rows written bypassing the index get it rebuilt
+        engine.hangar.append("currency", pd.DataFrame(
+            {"iso": ["cad"], "long_name": ["kiwi dollar"]}, index=[6]),
+            data_columns=True)
+        self.assertEqual(index.contains("dollar").tolist(), [0, 5, 6])
+
+    def test_column_operators(self):
+        """
+        """
+        qry = self.table.columns["iso"].in_(["chf", "gbp", "jpy"])
+        self.assertEqual(qry.expression,
+                         "(currency_id >= 2) & (currency_id <= 4)")
+
+        qry = self.table.columns["long_name"].like("o")
+        self.assertEqual(qry.expression, "currency_id == [0, 1, 3]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import pandas as pd
+import numpy as np
+import unittest
+import tempfile
+import shutil
+import os
+
+from datadough import engine
+from datadough.hangar import DataHangar
+from datadough.synthetic import generate, using
+
+
+class TestSynthetic(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.hangar = DataHangar(os.path.join(self.tmp_dir, "synthetic.h5"))
+
+    def tearDown(self):
+        """
+        """
+        self.hangar.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_generate(self):
+        """
+        """
+        res = generate(self.hangar, n_objects=3, n_types=2, n_versions=2,
+                       n_dates=10, chunksize=25)
+        self.assertEqual((res["headers"], res["rows"]), (12, 120))
+
+        self.assertEqual(self.hangar.nrows("concept_header"), 6)
+        self.assertEqual(self.hangar.nrows("timeseries"), 120)
+
+        with using(self.hangar):
+            header_id = engine.ConceptHeader().get_id(
+                {"data_object_id": "synthetic object 0000002",
+                 "data_type_id": "type_0001",
+                 "data_provider_id": 0, "currency_id": 2})
+            self.assertEqual(header_id, 5)
+
+            data = engine.DataBase().get_data(
+                pd.Series({"a": 0, "b": 11}), None, None, 'B')
+            self.assertEqual(data.shape, (10, 2))
+            self.assertFalse(np.isnan(data.values).any())
+
+
+if __name__ == "__main__":
+    unittest.main()
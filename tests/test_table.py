@@ -3,8 +3,11 @@ import numpy as np
 import unittest
 import os
 
+from datadough import engine
 from datadough.engine import Table
-from datadough.query import TableQuery
+from datadough.cache import TableCache
+from datadough.query import TableQuery, In, And, Range, Raw, Term, \
+    UnsupportedQuery
 
 
 class TestTable(unittest.TestCase):
@@ -79,6 +82,86 @@ class TestTable(unittest.TestCase):
         self.table.add_new(new=new_df)
         self.assertEqual(len(self.table.index), 6)
 
+    def test_add_new_ids(self):
+        """Test allocation of ids from the table's sequence."""
+        new_df = pd.DataFrame([[5.0, 5.0, 0.0], [6.0, 6.0, 0.0]],
+                              columns=self.req_cols + self.opt_cols)
+
+        self.assertEqual(self.table.add_new(new=new_df.iloc[:1]), [3])
+        self.assertEqual(
+            engine.hangar.get_attrs("id_sequences")["test_table"], 4)
+        self.assertEqual(self.table.add_new(new=new_df), [4])
+        self.assertEqual(self.table.index.tolist(), [0, 1, 2, 3, 4])
+
+    def test_rows_in_db(self):
+        """Test detection of rows already stored."""
+        rows = pd.DataFrame([[1.0, 0.0], [2.0, 0.0], [0.0, 0.0],
+                             [np.nan, 1.0]],
+                            columns=self.req_cols, index=list("abcd"))
+        res = self.table.rows_in_db(rows)
+
+        self.assertTrue(res.index.equals(rows.index))
+        self.assertEqual(res.tolist(), [True, False, True, False])
+
+    def test_construct_query_by_id(self):
+        """Test encoding of ids as ranges and literals."""
+        qry = self.table.construct_query_by_id(pd.Index([9, 0, 3, 1, 2, 7]))
+        self.assertEqual(qry.expression,
+                         "((test_table_id >= 0) & (test_table_id <= 3)) | "
+                         "(test_table_id == [7, 9])")
+
+        qry = self.table.construct_query_by_id(pd.Index([5]))
+        self.assertEqual(qry.expression, "test_table_id == 5")
+
+        # too many scattered ids for an expression
+        qry = self.table.construct_query_by_id(pd.Index(np.arange(0, 80, 2)))
+        self.assertIsInstance(qry.node, In)
+
+        # ...are fetched by row coordinates
+        qry = TableQuery(In("col_1", np.arange(1., 41.).tolist()))
+        self.assertEqual(self.table.filter(qry).index.tolist(), [0])
+
+        # ...also as part of a conjunction, the rest filtered in memory
+        qry = TableQuery(And(In("col_1", np.arange(0., 40.).tolist()),
+                             Range("col_2", 0., 0.)))
+        self.assertEqual(self.table.filter(qry).index.tolist(), [0, 2])
+
+    def test_table_cache(self):
+        """Test answering queries from the in-memory mirror."""
+        engine.enable_table_cache(max_rows=10)
+        self.table.cacheable = True
+
+        try:
+            qry = TableQuery(condition="col_1 > 0").or_(
+                TableQuery("col_2 > 0"))
+            self.assertEqual(len(self.table.filter(qry)), 2)
+            self.assertIn((engine.hangar.path_to_hdf, "test_table"),
+                          engine.table_cache)
+
+            new_df = pd.DataFrame([[5.0, 5.0, 0.0]], index=[3],
+                                  columns=self.req_cols + self.opt_cols)
+            self.table.add_new(new=new_df)
+            self.assertEqual(len(self.table.filter(qry)), 3)
+            self.assertEqual(len(self.table.index), 4)
+
+            # over the size limit: back to the store
+            new_df = pd.DataFrame(np.arange(30.).reshape(10, 3) + 10,
+                                  columns=self.req_cols + self.opt_cols)
+            self.table.add_new(new=new_df)
+            self.assertIsNone(self.table._cached_frame())
+            self.assertEqual(len(self.table.filter(qry)), 13)
+
+            # only what pandas cannot evaluate is left to the store
+            with self.assertRaises(UnsupportedQuery):
+                TableCache.filter(self.test_df, TableQuery(Raw("col_1 >")))
+
+            engine.enable_table_cache()
+            with self.assertRaises(KeyError):
+                self.table.filter(TableQuery(Term("col_9", "==", 1.)))
+
+        finally:
+            engine.disable_table_cache()
+
 
 if __name__ == "__main__":
     unittest.main()
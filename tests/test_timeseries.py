@@ -0,0 +1,218 @@
+import pandas as pd
+import numpy as np
+import unittest
+import os
+
+from datadough.engine import Timeseries, hangar
+
+
+class TestTimeseries(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        dates = pd.date_range("2000-12-31", periods=6, freq='D')
+
+        data = pd.DataFrame(data=np.arange(12.).reshape(6, 2),
+                            index=dates, columns=[2, 1])
+        data.iloc[0, 0] = np.nan
+        data.index.name = "obs_date"
+
+        self.long = data.reset_index().melt(id_vars="obs_date",
+                                            var_name="header_id",
+                                            value_name="obs_value")
+        self.data = data
+        self.timeseries = Timeseries()
+
+    def tearDown(self):
+        """
+        """
+        hangar.close()
+        if os.path.exists(hangar.path_to_hdf):
+            os.remove(hangar.path_to_hdf)
+
+    def test_save(self):
+        """
+        """
+        res = self.timeseries.save(self.long, chunksize=4)
+        self.assertEqual(res["rows"], 11)
+
+        stored = hangar.get("timeseries")
+        self.assertEqual(stored.index.tolist(), list(range(11)))
+        self.assertEqual(stored["header_id"].tolist(), [1] * 6 + [2] * 5)
+        self.assertTrue(stored.groupby("header_id")["obs_date"].apply(
+            lambda x: x.is_monotonic_increasing).all())
+        self.assertEqual(stored["header_id"].dtype, np.int32)
+
+        # appending continues the row ids (one missing value is dropped)
+        self.timeseries.save(self.long.iloc[:3])
+        self.assertEqual(hangar.select_column("timeseries", "index").max(),
+                         12)
+
+        # small saves into a large table do not rebuild its indexes...
+        dates = pd.date_range("2000-01-01", periods=100, freq='D')
+        self.timeseries.save(pd.DataFrame({
+            "header_id": np.repeat(np.arange(10, 60), len(dates)),
+            "obs_date": np.tile(dates, 50), "obs_value": 1.}))
+
+        rebuilt = []
+        create_csi = hangar.backend._create_csi
+        hangar.backend._create_csi = \
+            lambda h, key, **kwargs: rebuilt.append(key) or \
+            create_csi(h, key, **kwargs)
+
+        self.timeseries.save(pd.DataFrame({
+            "header_id": [10], "obs_date": [pd.Timestamp("2000-04-10")],
+            "obs_value": [2.]}))
+        del hangar.backend._create_csi
+
+        # nor those of the tables of batches and rollups
+        self.assertEqual(rebuilt, [])
+        self.assertFalse(hangar.verify_indexes(["timeseries"])["dirty"].any())
+
+    def test_get_data(self):
+        """
+        """
+        self.timeseries.save(self.long)
+
+        res = self.timeseries.get_data(pd.Series({"b": 1, "a": 2}),
+                                       "2001-01-01", "2001-01-03")
+        expected = self.data.loc["2001-01-01":"2001-01-03", [1, 2]]
+
+        self.assertTrue(np.array_equal(res.values, expected.values))
+        self.assertEqual(res.columns.tolist(), [1, 2])
+
+        # one date given twice in a save: the value given last is read
+        twice = pd.DataFrame({
+            "header_id": [3, 3, 3],
+            "obs_date": pd.to_datetime(["2001-01-02", "2001-01-01",
+                                        "2001-01-02"]),
+            "obs_value": [1., 2., 3.]})
+        self.timeseries.save(twice)
+
+        self.assertIn(3, self.timeseries.revised())
+        self.assertEqual(self.timeseries.get_data([3])[3].tolist(), [2., 3.])
+
+    def test_as_of(self):
+        """
+        """
+        first = self.long.assign(date_inserted=pd.Timestamp("2020-01-01"))
+        self.timeseries.save(first)
+
+        # revise two values of header 1, extend header 2
+        revision = pd.DataFrame({
+            "header_id": [1, 1, 2],
+            "obs_date": pd.to_datetime(["2001-01-01", "2001-01-02",
+                                        "2001-01-06"]),
+            "obs_value": [100., 101., 102.],
+            "date_inserted": pd.Timestamp("2021-01-01")})
+        self.timeseries.save(revision)
+
+        self.assertEqual(self.timeseries.revised().tolist(), [1])
+
+        latest = self.timeseries.get_data([1, 2])
+        self.assertEqual(latest.loc["2001-01-01":"2001-01-03", 1].tolist(),
+                         [100., 101., 7.])
+        self.assertEqual(latest.loc["2001-01-06", 2], 102.)
+
+        before = self.timeseries.get_data([1, 2], as_of="2020-06-30")
+        expected = self.data.loc[:, [1, 2]]
+        self.assertTrue(np.array_equal(before.values, expected.values,
+                                       equal_nan=True))
+
+        self.assertEqual(
+            self.timeseries.get_data([1, 2], as_of="2019-12-31").shape[0], 0)
+
+    def test_rollups(self):
+        """
+        """
+        dates = pd.date_range("2000-01-01", "2001-06-30", freq='D')
+        long = pd.DataFrame({
+            "header_id": np.repeat([1, 2], len(dates)),
+            "obs_date": np.tile(dates.values, 2),
+            "obs_value": np.arange(2. * len(dates))})
+
+        self.timeseries.save(long.iloc[::2])
+        self.timeseries.save(long.iloc[1::2])
+        self.assertEqual(self.timeseries.rollups(), ["W", "ME", "QE"])
+
+        # revise a month end
+        self.timeseries.save(pd.DataFrame({
+            "header_id": [2], "obs_date": [pd.Timestamp("2000-03-31")],
+            "obs_value": [-1.]}))
+
+        def compare(freq, date_from, date_to, header=(2, 1)):
+            res = self.timeseries.get_rollup(list(header), freq, date_from,
+                                             date_to).resample(freq).last()
+            expected = self.timeseries.get_data(list(header), date_from,
+                                                date_to) \
+                .resample(freq).last()
+            pd.testing.assert_frame_equal(res, expected, check_freq=False)
+
+        for date_from, date_to in ((None, None),
+                                   ("2000-02-10", "2000-11-15"),
+                                   ("2000-03-31", "2000-03-31")):
+            for freq in ("ME", "QE", "YE", "MS", "W"):
+                compare(freq, date_from, date_to)
+
+        self.assertEqual(self.timeseries.get_rollup([2], "ME")
+                         .loc["2000-03-31", 2], -1.)
+        self.assertIsNone(self.timeseries.get_rollup([1], 'D'))
+
+        # intraday observations on the last day of a period
+        self.timeseries.save(pd.DataFrame({
+            "header_id": [3, 3],
+            "obs_date": [pd.Timestamp("2000-01-15"),
+                         pd.Timestamp("2000-01-31 12:00")],
+            "obs_value": [1., 2.]}))
+        res = self.timeseries.get_rollup([3], "ME")
+        self.assertEqual(res[3].tolist(), [2.])
+        self.assertEqual(res.index.tolist(), [pd.Timestamp("2000-01-31")])
+
+        # loaded day by day: one row per closed period, none for open ones
+        for day in pd.date_range("2002-01-01", "2002-02-10", freq='D'):
+            self.timeseries.save(pd.DataFrame({
+                "header_id": [4], "obs_date": [day], "obs_value": [1.]}))
+        stored = hangar.get("timeseries_rollup_ME")
+        self.assertEqual(stored.loc[stored["header_id"] == 4, "obs_date"]
+                         .tolist(), [pd.Timestamp("2002-01-31")])
+        compare("ME", "2002-01-15", None, header=(4, ))
+
+        self.timeseries.build_rollups(freqs=["ME"])
+        self.assertEqual(self.timeseries.rollups(), ["ME"])
+        self.assertNotIn("timeseries_rollup_W", hangar)
+        compare("QE", "2000-02-10", "2000-11-15")
+
+    def test_migrate_layout(self):
+        """
+        """
+        self.timeseries.save(self.long)
+        expected = self.timeseries.get_data([2, 1])
+
+        # to the current layout: nothing moves, nothing is lost
+        res = self.timeseries.migrate_layout(kind="flat")
+        self.assertEqual(res["rows"], 0)
+        self.assertTrue(self.timeseries.get_data([2, 1]).equals(expected))
+
+        for kind in ("header", "flat", "bucket"):
+            res = self.timeseries.migrate_layout(kind=kind, n_buckets=3)
+            self.assertEqual(res["rows"], 11)
+            self.assertEqual(self.timeseries.layout["kind"], kind)
+            self.assertTrue(self.timeseries.get_data([2, 1]).equals(expected))
+
+        res = self.timeseries.migrate_layout(kind="bucket", n_buckets=3)
+        self.assertEqual(res["rows"], 0)
+
+        self.assertEqual(
+            sorted(self.timeseries._nodes()),
+            ["timeseries_part/b1", "timeseries_part/b2"])
+
+        # routed writes keep row ids unique
+        self.timeseries.save(self.long.iloc[:3])
+        self.assertEqual(hangar.get_attrs("id_sequences")["timeseries"], 13)
+        self.assertEqual(len(hangar.get("timeseries_part/b2")), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import unittest
+import tempfile
+import shutil
+import os
+
+from datadough import engine
+from datadough.hangar import DataHangar
+from datadough.synthetic import generate
+from datadough.writer import WriteQueue, Writer, start_writer, _locked
+
+
+class TestWriter(unittest.TestCase):
+    """
+    """
+    def setUp(self):
+        """
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "synthetic.h5")
+        self.spool_dir = os.path.join(self.tmp_dir, "spool")
+
+        self.hangar = DataHangar(self.path)
+        generate(self.hangar, n_objects=3, n_types=2, n_dates=10)
+
+        self.queue = WriteQueue(self.spool_dir)
+        self.dates = pd.date_range("2001-01-01", periods=5, freq='D')
+
+    def tearDown(self):
+        """
+        """
+        self.hangar.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def data(self, header_id):
+        return pd.DataFrame({"header_id": header_id, "obs_date": self.dates,
+                             "obs_value": np.arange(5.0) + header_id})
+
+    def test_drain(self):
+        """
+        """
+        tickets = [self.queue.save(self.data(p)) for p in (100, 101, 102)]
+        new = pd.DataFrame({"long_name": ["queued object"]})
+        ticket = self.queue.add_new("data_object", new)
+        self.assertEqual(self.queue.pending(), 4)
+
+        writer = Writer(self.hangar, self.spool_dir)
+        self.assertEqual(writer.drain(), 4)
+        self.assertEqual(self.queue.pending(), 0)
+
+        # the saves were coalesced into one
+        self.assertEqual(writer.stats["batches"], 2)
+        res = [self.queue.result(p, timeout=0) for p in tickets]
+        self.assertTrue(all(p["jobs"] == 3 for p in res))
+        self.assertEqual(res[0]["rows"], 15)
+
+        ids = self.queue.result(ticket, timeout=0)
+        self.assertEqual(len(ids), 1)
+        stored = self.hangar.select("data_object")
+        self.assertEqual(
+            list(stored.index[stored["long_name"] == "queued object"]), ids)
+
+        ts = engine.Timeseries(hangar=self.hangar)
+        for p in (100, 101, 102):
+            pd.testing.assert_series_equal(
+                ts.get_data(p).iloc[:, 0],
+                self.data(p).set_index("obs_date")["obs_value"],
+                check_names=False, check_freq=False,
+                check_index_type=False)
+
+        # failures are reported to the producer
+        ticket = self.queue.save(pd.DataFrame({"header_id": [1]}))
+        writer.drain()
+        with self.assertRaises(RuntimeError):
+            self.queue.result(ticket, timeout=0)
+
+        # bad jobs in a batch are rejected before the others are saved
+        bad = self.data(103).assign(obs_value="not a number")
+        tickets = [self.queue.save(p) for p in
+                   (self.data(103), bad, self.data(104))]
+        writer.drain()
+
+        with self.assertRaises(RuntimeError):
+            self.queue.result(tickets[1], timeout=0)
+        for p in (tickets[0], tickets[2]):
+            self.assertEqual(self.queue.result(p, timeout=0)["jobs"], 2)
+        self.assertEqual(len(ts.get_data(103)), 5)
+
+    def test_single_writer(self):
+        """
+        """
+        with _locked(os.path.join(self.spool_dir, "writer.lock")):
+            with self.assertRaises(RuntimeError):
+                Writer(self.hangar, self.spool_dir).run()
+
+    def test_process(self):
+        """
+        """
+        writer = start_writer(self.path, self.spool_dir, poll=0.01)
+
+        ticket = self.queue.save(self.data(200))
+        self.queue.stop()
+
+        self.assertEqual(self.queue.result(ticket, timeout=60)["rows"], 5)
+        writer.join(60)
+        self.assertEqual(writer.exitcode, 0)
+
+        ts = engine.Timeseries(hangar=self.hangar)
+        self.assertEqual(len(ts.get_data(200)), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,533 @@
+"""Single-writer queue of appends to a store.
+
+HDF5 files do not survive concurrent writers. Instead of writing
+themselves, producers submit frames for `Table.add_new()` and
+`Timeseries.save()` to a spool directory (`WriteQueue`), which one writer
+process (`Writer`, see `start_writer()`) drains in the order of
+submission, coalescing consecutive small saves into large ones. Ids are
+thereby only ever allocated by the writer.
+
+The spool directory holds two lock files: 'writer.lock', held by the
+writer for as long as it runs, so that a second one refuses to start, and
+'store.lock', held exclusively by the writer while it applies a batch.
+Readers keep reading through their own read-only handles; those wanting
+to never see a batch half-applied read within `reading()`, which shares
+the latter lock.
+
+Jobs are removed once their result is written, so a writer killed midway
+through a batch applies it again on restart (saves then come out as
+revisions of identical values, see `Timeseries.revised()`).
+"""
+import os
+import time
+import pickle
+import argparse
+import itertools
+import multiprocessing
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    # windows
+    fcntl = None
+    import msvcrt
+
+# engine classes of the tables with schemas of their own, by key
+TABLE_CLASSES = {"data_object": "DataObject", "data_type": "DataType",
+                 "data_provider": "DataProvider", "currency": "Currency",
+                 "data_version": "DataVersion",
+                 "concept_header": "ConceptHeader", "ts_header": "TSHeader"}
+
+
+@contextmanager
+def _locked(path, shared=False, blocking=True):
+    """Hold a lock on file `path`, released on exit.
+
+    Locks are advisory and per open file: they exclude other processes as
+    well as other `_locked()` calls of the same one. Without fcntl (on
+    windows) every lock is exclusive.
+
+    Raises
+    ------
+    BlockingIOError
+        if not `blocking` and the lock is held elsewhere
+
+    """
+    with open(path, 'a+') as f:
+        if fcntl is not None:
+            flag = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            if not blocking:
+                flag |= fcntl.LOCK_NB
+            fcntl.flock(f.fileno(), flag)
+        else:
+            f.seek(0)
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking
+                               else msvcrt.LK_NBLCK, 1)
+            except OSError:
+                raise BlockingIOError("{} is locked".format(path))
+
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def reading(spool_dir):
+    """Context in which no batch of the writer of `spool_dir` is applied.
+
+    Parameters
+    ----------
+    spool_dir : str
+
+    Returns
+    -------
+    context manager
+
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+
+    return _locked(os.path.join(spool_dir, "store.lock"), shared=True)
+
+
+class WriteQueue(object):
+    """Producer end of the queue: submit writes, collect their results.
+
+    Every submission is pickled into a file of its own in 'jobs/', written
+    under a temporary name and renamed, so that the writer never sees it
+    half-written; file names sort in the order of submission. The result
+    is put into 'results/' under the name of the job, its ticket.
+
+    Parameters
+    ----------
+    spool_dir : str
+        directory shared with the writer, created if missing
+
+    """
+    def __init__(self, spool_dir):
+        """
+        """
+        self.spool_dir = spool_dir
+
+        self.jobs_dir = os.path.join(spool_dir, "jobs")
+        self.results_dir = os.path.join(spool_dir, "results")
+
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+
+        self._counter = itertools.count()
+
+    def submit(self, kind, **job):
+        """Put a job into the queue.
+
+        Parameters
+        ----------
+        kind : str
+            'add_new', 'save' or 'stop'
+        job
+            arguments of the job, see `add_new()` and `save()`
+
+        Returns
+        -------
+        ticket : str
+            to collect the result by, see `result()`
+
+        """
+        ticket = "{:020d}-{:07d}-{:09d}".format(
+            time.time_ns(), os.getpid(), next(self._counter))
+
+        job = dict(job, kind=kind, ticket=ticket)
+
+        path = os.path.join(self.jobs_dir, ticket)
+        with open(path + ".tmp", 'wb') as f:
+            pickle.dump(job, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path + ".job")
+
+        return ticket
+
+    def add_new(self, key, new, schema=None):
+        """Queue `Table(key, schema).add_new(new)`.
+
+        Parameters
+        ----------
+        key : str
+            of the table; engine tables (e.g. 'concept_header') use their
+            own schemas
+        new : pandas.DataFrame or pandas.Series
+        schema : dict or None
+            of other tables; None to read it from the store
+
+        Returns
+        -------
+        ticket : str
+            the result of which is the list of ids of the rows added
+
+        """
+        return self.submit("add_new", key=key, data=new, schema=schema)
+
+    def save(self, data, **kwargs):
+        """Queue `Timeseries.save(data, **kwargs)`.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            in long format, as taken by Timeseries.save()
+        kwargs
+            keyword arguments to Timeseries.save()
+
+        Returns
+        -------
+        ticket : str
+            the result of which is that of Timeseries.save() of the batch
+            the data was saved in, with the number of jobs in it, 'jobs'
+
+        """
+        return self.submit("save", data=data, kwargs=kwargs)
+
+    def stop(self):
+        """Queue stopping the writer, once done with the jobs before."""
+        return self.submit("stop")
+
+    def pending(self):
+        """Number of jobs not yet applied."""
+        return len([p for p in os.listdir(self.jobs_dir)
+                    if p.endswith(".job")])
+
+    def result(self, ticket, timeout=None, poll=0.05):
+        """Wait for and collect the result of job `ticket`.
+
+        Parameters
+        ----------
+        ticket : str
+        timeout : float or None
+            seconds; None to wait for as long as it takes
+        poll : float
+            seconds between looks for the result
+
+        Returns
+        -------
+        res
+            what the job returned
+
+        Raises
+        ------
+        TimeoutError
+            if not done within `timeout`
+        RuntimeError
+            if the job failed
+
+        """
+        path = os.path.join(self.results_dir, ticket + ".res")
+        t_start = time.perf_counter()
+
+        while not os.path.exists(path):
+            if (timeout is not None) and \
+                    (time.perf_counter() - t_start > timeout):
+                raise TimeoutError("Job {} not done in {}s!"
+                                   .format(ticket, timeout))
+            time.sleep(poll)
+
+        with open(path, 'rb') as f:
+            res = pickle.load(f)
+        os.remove(path)
+
+        if res["error"] is not None:
+            raise RuntimeError("Job {} failed: {}"
+                               .format(ticket, res["error"]))
+
+        return res["result"]
+
+
+class Writer(object):
+    """Consumer end of the queue: the one process applying the writes.
+
+    Jobs are applied in the order of submission. Runs of consecutive saves
+    with the same arguments and columns are concatenated, up to
+    `batch_rows` rows, and saved at once; additions of rows to tables,
+    whose results are the ids of the rows of every job, are applied one
+    by one. Everything drained at once is applied in one session of the
+    store, with 'store.lock' held.
+
+    Parameters
+    ----------
+    hangar : DataHangar
+        store to write to
+    spool_dir : str
+        directory of the queue, see WriteQueue
+    batch_rows : int
+        rows beyond which no more saves are added to a batch
+    poll : float
+        seconds to sleep between looks for new jobs in `run()`
+
+    """
+    def __init__(self, hangar, spool_dir, batch_rows=1000000, poll=0.1):
+        """
+        """
+        self.hangar = hangar
+        self.queue = WriteQueue(spool_dir)
+        self.batch_rows = batch_rows
+        self.poll = poll
+
+        self.stopped = False
+
+        # counts of what has been applied so far
+        self.stats = {"jobs": 0, "batches": 0, "rows": 0}
+
+    def _jobs(self):
+        """Paths of the jobs pending, in the order of submission."""
+        names = sorted(p for p in os.listdir(self.queue.jobs_dir)
+                       if p.endswith(".job"))
+
+        return [os.path.join(self.queue.jobs_dir, p) for p in names]
+
+    @staticmethod
+    def _load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _done(self, path, job, result=None, error=None):
+        """Write the result of `job`, then remove it from the queue."""
+        res_path = os.path.join(self.queue.results_dir, job["ticket"])
+        with open(res_path + ".tmp", 'wb') as f:
+            pickle.dump({"result": result, "error": error}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(res_path + ".tmp", res_path + ".res")
+
+        os.remove(path)
+
+        self.stats["jobs"] += 1
+
+    def _table(self, key, schema):
+        from datadough import engine
+
+        if (schema is None) and (key in TABLE_CLASSES):
+            return getattr(engine, TABLE_CLASSES[key])(hangar=self.hangar)
+
+        return engine.Table(key, schema=schema, hangar=self.hangar)
+
+    def _add_new(self, path, job):
+        try:
+            ids = self._table(job["key"], job["schema"]).add_new(job["data"])
+        except Exception as e:
+            self._done(path, job, error=repr(e))
+        else:
+            self._done(path, job, result=ids)
+
+        self.stats["batches"] += 1
+        self.stats["rows"] += len(job["data"])
+
+    @staticmethod
+    def _validate(timeseries, data, dtypes):
+        """Raise if Timeseries.save() would reject `data`.
+
+        Parameters
+        ----------
+        timeseries : Timeseries
+        data : pandas.DataFrame
+        dtypes : pandas.Series
+            of the stored columns, see Timeseries._dtypes()
+
+        """
+        missing = [c for c in timeseries._required_columns
+                   if c not in data.columns]
+        if len(missing) > 0:
+            raise ValueError("The following required columns are missing: " +
+                             ", ".join("'{}'".format(c) for c in missing))
+
+        columns = [c for c in timeseries._required_columns +
+                   timeseries._optional_columns if c in data.columns]
+        data.loc[:, columns].dropna(subset=["obs_value"]) \
+            .astype(dtypes.reindex(columns).to_dict())
+
+    def _save(self, batch):
+        """Save the data of the jobs in `batch` at once.
+
+        Jobs with data that cannot be saved are rejected up front. If the
+        save of the others fails nonetheless, some of their data may have
+        been written: all of them fail, to be submitted again (see the
+        module docs on saving twice).
+
+        Parameters
+        ----------
+        batch : list
+            of (path, job)
+
+        """
+        from datadough import engine
+
+        timeseries = engine.Timeseries(hangar=self.hangar)
+        kwargs = batch[0][1]["kwargs"]
+
+        dtypes = timeseries._dtypes(kwargs.get("value_dtype", "float64"))
+
+        valid = []
+        for path, job in batch:
+            try:
+                self._validate(timeseries, job["data"], dtypes)
+            except Exception as e:
+                self._done(path, job, error=repr(e))
+            else:
+                valid.append((path, job))
+
+        self.stats["batches"] += 1
+
+        if len(valid) < 1:
+            return
+
+        data = pd.concat([job["data"] for _, job in valid],
+                         ignore_index=True) \
+            if len(valid) > 1 else valid[0][1]["data"]
+
+        try:
+            res = timeseries.save(data, **kwargs)
+        except Exception as e:
+            for path, job in valid:
+                self._done(path, job, error="batch of {} jobs failed, "
+                           "possibly partly saved: {!r}"
+                           .format(len(valid), e))
+            return
+
+        res = dict(res, jobs=len(valid))
+        for path, job in valid:
+            self._done(path, job, result=res)
+
+        self.stats["rows"] += res["rows"]
+
+    def drain(self):
+        """Apply the jobs pending, up to the first request to stop.
+
+        Returns
+        -------
+        int
+            number of jobs applied
+
+        """
+        paths = self._jobs()
+
+        if len(paths) < 1:
+            return 0
+
+        n_jobs = self.stats["jobs"]
+        lock = os.path.join(self.queue.spool_dir, "store.lock")
+
+        with _locked(lock), self.hangar.session():
+            batch, rows = [], 0
+
+            for path in paths:
+                job = self._load(path)
+
+                fits = (len(batch) > 0) and (job["kind"] == "save") and \
+                    (rows < self.batch_rows) and \
+                    (job["kwargs"] == batch[0][1]["kwargs"]) and \
+                    job["data"].columns.equals(batch[0][1]["data"].columns)
+
+                if (len(batch) > 0) and not fits:
+                    self._save(batch)
+                    batch, rows = [], 0
+
+                if job["kind"] == "save":
+                    batch.append((path, job))
+                    rows += len(job["data"])
+                elif job["kind"] == "add_new":
+                    self._add_new(path, job)
+                elif job["kind"] == "stop":
+                    self._done(path, job)
+                    self.stopped = True
+                    break
+                else:
+                    self._done(path, job, error="unknown kind of job {!r}"
+                               .format(job["kind"]))
+
+            if len(batch) > 0:
+                self._save(batch)
+
+        # readers must not find a handle open for writing
+        self.hangar.close()
+
+        return self.stats["jobs"] - n_jobs
+
+    def run(self):
+        """Drain the queue until asked to stop, see WriteQueue.stop().
+
+        Raises
+        ------
+        RuntimeError
+            if another writer is running on the same queue
+
+        """
+        lock = os.path.join(self.queue.spool_dir, "writer.lock")
+
+        try:
+            with _locked(lock, blocking=False):
+                self.stopped = False
+
+                while not self.stopped:
+                    if self.drain() < 1:
+                        time.sleep(self.poll)
+
+        except BlockingIOError:
+            raise RuntimeError("Another writer is running on {}!"
+                               .format(self.queue.spool_dir))
+
+
+def _run_writer(path_to_hdf, backend, spool_dir, kwargs):
+    """Run a writer in a freshly started process."""
+    from datadough.hangar import DataHangar
+
+    hangar = DataHangar(path_to_hdf, backend=backend)
+    Writer(hangar, spool_dir, **kwargs).run()
+
+
+def start_writer(path_to_hdf, spool_dir, backend="hdf", **kwargs):
+    """Start a writer process on the store at `path_to_hdf`.
+
+    The process is started with 'spawn', as HDF5 handles do not survive a
+    fork, and runs until stopped with WriteQueue.stop().
+
+    Parameters
+    ----------
+    path_to_hdf : str
+    spool_dir : str
+    backend : str
+        name of the backend of the store
+    kwargs
+        keyword arguments to Writer
+
+    Returns
+    -------
+    multiprocessing.Process
+
+    """
+    res = multiprocessing.get_context("spawn").Process(
+        target=_run_writer, args=(path_to_hdf, backend, spool_dir, kwargs))
+    res.start()
+
+    return res
+
+
+def main(argv=None):
+    """Command line entry: run a writer in the foreground."""
+    from datadough.hangar import DataHangar
+
+    parser = argparse.ArgumentParser(
+        description="Apply the writes queued to a datadough store.")
+    parser.add_argument("path", help="store to write to")
+    parser.add_argument("spool_dir", help="directory of the queue")
+    parser.add_argument("--backend", default="hdf")
+    parser.add_argument("--batch-rows", type=int, default=1000000)
+
+    args = parser.parse_args(argv)
+
+    hangar = DataHangar(args.path, backend=args.backend)
+    Writer(hangar, args.spool_dir, batch_rows=args.batch_rows).run()
+
+
+if __name__ == "__main__":
+    main()